@@ -13,6 +13,10 @@ import zipfile
 import plotly.io as pio
 from datetime import datetime
 
+from src.session_loader import load_columns, vm_session_row, extract_attack_type_from_meta, format_events_summary
+from src.session_manager import session_dirs
+from src import admission, sqlite_store, segment_store
+
 try:
     from src.attack_recommendations import get_recommendations, format_action_for_display
 except ImportError:
@@ -26,6 +30,8 @@ ROOT = Path(__file__).parent
 OUT_CSV = ROOT / "output" / "honeypot_sessions.csv"
 MERGE_SCRIPT = ROOT / "merge_sessions.py"
 SESSIONS_ROOT = ROOT / "data" / "sessions"
+# orchestrator output: admission_stats*.json (rejected connections never become sessions)
+REPORT_DIR = Path(os.environ.get("HONEYPOT_REPORT_DIR") or ROOT / "out")
 
 # Attack advice mapping
 ATTACK_ADVICE = {
@@ -485,94 +491,38 @@ def normalize_honeypot_data(df):
 # Load data from VM sessions
 # ---------------------
 
-def extract_attack_type_from_meta(events_list):
-    """Extract attack type from events list by looking for [CLASS]= marker."""
-    if not isinstance(events_list, list):
-        return 'unknown'
-    
-    for event in events_list:
-        if isinstance(event, dict):
-            text = event.get('text', '').lower()
-            if '[class]=' in text:
-                # Extract: [CLASS]=recon|0.6|ENG=HIGH → recon
-                import re
-                m = re.search(r'\[class\]=([a-z_]+)', text)
-                if m:
-                    return m.group(1)
-    return 'unknown'
-
-def format_events_summary(events_list):
-    """Format events as readable summary lines."""
-    if not isinstance(events_list, list):
-        return 'No events'
-    
-    summaries = []
-    for event in events_list:
-        if isinstance(event, dict):
-            text = event.get('text', '').strip()
-            # Skip structural/noise events, keep actionable ones
-            if any(skip in text for skip in ['[STRUCT_EVENT]', '[PAYLOAD_SAVED]', '[ACTION]=', '[HIGH_ENGAGEMENT]=', '[CLASS]=']):
-                continue
-            if text and not text.startswith('['):
-                # Clean up and truncate
-                if text.startswith('ATTACKER_CMD:'):
-                    text = text.replace('ATTACKER_CMD: ', '🔴 CMD: ')
-                summaries.append(text[:60])
-    
-    return ' | '.join(summaries[:3]) if summaries else 'Connection events only'
+def use_sqlite():
+    """True when the orchestrator writes to the SQLite backend (HONEYPOT_STORAGE_BACKEND=sqlite)."""
+    return sqlite_store.backend() == "sqlite" and sqlite_store.DB_PATH.exists()
 
 def load_vm_sessions(root_dir: Path = SESSIONS_ROOT):
     """Load JSON meta files from VM session directories and normalize to standard schema."""
-    dfs = []
+    if use_sqlite():
+        # one indexed query instead of parsing a file per session
+        conn = sqlite_store.connect()
+        try:
+            df = pd.read_sql_query(sqlite_store.DASHBOARD_QUERY, conn)
+        finally:
+            conn.close()
+        return df if len(df) else None
+    if segment_store.available() and st.sidebar.checkbox("Read compacted Parquet segments", value=True):
+        # only the dashboard's columns and the chosen days are read from disk
+        days = st.sidebar.number_input("Days to load", min_value=1, max_value=3650, value=30)
+        df = segment_store.sessions_frame(
+            ["session_id", "src_ip", "src_port", "dst_port", "instance", "attack_type", "event_count"], days=int(days))
+        df["events"] = df.pop("event_count").astype(str) + " events"
+        return df.drop(columns=["start_ts"]) if len(df) else None
     if not root_dir.exists():
         return None
     
-    # Collect meta.json files from each session directory
-    for session_dir in sorted(root_dir.glob("S-*")):
-        meta_file = session_dir / "meta.json"
-        if meta_file.exists():
-            try:
-                with open(meta_file, 'r', encoding='utf-8') as f:
-                    obj = json.load(f)
-                    if isinstance(obj, dict):
-                        events = obj.get('events', [])
-                        # Normalize VM meta structure to standard honeypot schema
-                        row = {
-                            'session_id': obj.get('session_id', ''),
-                            'src_ip': obj.get('src_ip', '127.0.0.1'),
-                            'src_port': obj.get('src_port', None),
-                            'timestamp': obj.get('end_time') or obj.get('start_ts'),
-                            'events': format_events_summary(events),  # Human-readable summary
-                            'dst_port': 2222,  # VM honeypot default port
-                            'instance': obj.get('instance', 'default'),
-                            'attack_type': extract_attack_type_from_meta(events),  # Extract from [CLASS]=
-                        }
-                        dfs.append(pd.DataFrame([row]))
-                    elif isinstance(obj, list):
-                        # If it's a list of objects, normalize each
-                        rows = []
-                        for item in obj:
-                            if isinstance(item, dict):
-                                events = item.get('events', [])
-                                row = {
-                                    'session_id': item.get('session_id', ''),
-                                    'src_ip': item.get('src_ip', '127.0.0.1'),
-                                    'src_port': item.get('src_port', None),
-                                    'timestamp': item.get('end_time') or item.get('start_ts'),
-                                    'events': format_events_summary(events),
-                                    'dst_port': 2222,
-                                    'instance': item.get('instance', 'default'),
-                                    'attack_type': extract_attack_type_from_meta(events),
-                                }
-                                rows.append(row)
-                        if rows:
-                            dfs.append(pd.DataFrame(rows))
-            except Exception as e:
-                st.sidebar.warning(f"Failed to load {meta_file}: {e}")
-                continue
+    # Parse session directories in parallel straight into columns
+    errors = []
+    columns = load_columns(session_dirs(root_dir), vm_session_row, errors=errors)
+    for sdir, err in errors:
+        st.sidebar.warning(f"Failed to load {Path(sdir) / 'meta.json'}: {err}")
     
-    if dfs:
-        return pd.concat(dfs, ignore_index=True)
+    if columns:
+        return pd.DataFrame(columns)
     return None
 
 # Load data from VM sessions or CSV aggregator
@@ -746,6 +696,31 @@ with tabs[2]:
             st.plotly_chart(px.line(ts, x="timestamp", y="count", title="Sessions per hour"), use_container_width=True)
         else:
             st.info("No valid timestamp data for time-series")
+    if use_sqlite() and uploaded is None:
+        # aggregated in SQLite; only the per-hour counts reach pandas
+        conn = sqlite_store.connect()
+        try:
+            by_hour = pd.DataFrame(sqlite_store.attacks_by_hour(conn), columns=["hour", "attack_type", "count"])
+            ips = pd.DataFrame(sqlite_store.top_ips(conn, limit=10), columns=["src_ip", "count"])
+        finally:
+            conn.close()
+        if len(by_hour):
+            st.plotly_chart(px.bar(by_hour, x="hour", y="count", color="attack_type",
+                                   title="Attacks per hour (UTC)"), use_container_width=True)
+        if len(ips):
+            st.plotly_chart(px.bar(ips, x="src_ip", y="count", title="Top source IPs"), use_container_width=True)
+    flood = admission.load_stats(REPORT_DIR)
+    if flood["admitted"] or flood["rejected_total"]:
+        st.markdown("#### Admission control")
+        a1, a2, a3 = st.columns(3)
+        a1.metric("Admitted", f"{flood['admitted']:,}")
+        a2.metric("Rejected", f"{flood['rejected_total']:,}",
+                  help=", ".join(f"{k}: {v:,}" for k, v in flood["rejected"].items()))
+        a3.metric("Active now", f"{flood['active']:,}")
+        if flood["top_rejected"]:
+            rej = pd.DataFrame(flood["top_rejected"][:20], columns=["src_ip", "rejected"])
+            st.plotly_chart(px.bar(rej, x="src_ip", y="rejected", title="Most rejected sources"),
+                            use_container_width=True)
 with tabs[3]:
     if "src_country" in df.columns and df["src_country"].notna().any():
         s = df['src_country'].fillna("UNKNOWN").value_counts().reset_index()
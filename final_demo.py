@@ -71,7 +71,9 @@ def main():
         print("[!] No sessions directory found")
         return
     
-    sessions = sorted([p for p in sessions_dir.iterdir() if p.is_dir()], key=lambda p: p.name)
+    from src.session_manager import load_session, session_dirs
+    from src.events import EventType, decode_all
+    sessions = session_dirs(sessions_dir)
     if not sessions:
         print("[!] No sessions captured")
         return
@@ -83,18 +85,17 @@ def main():
         print(f"[!] No meta.json in {latest}")
         return
     
-    with open(meta_file, 'r', encoding='utf-8') as f:
-        session_data = json.load(f)
+    session_data = load_session(latest)
     
     print(f"\nSession ID: {latest.name}")
     print(json.dumps(session_data, indent=2))
     
-    # List any payload files
-    payloads = list(latest.glob("payload*.bin"))
+    # List any payload files (stored by hash in the payload store, not in the session dir)
+    payloads = [ev for ev in decode_all(session_data.get("events", [])) if ev["type"] == EventType.PAYLOAD_SAVED]
     if payloads:
         print("\n[*] Payload files captured:")
         for p in payloads:
-            print(f"    - {p.name} ({p.stat().st_size} bytes)")
+            print(f"    - {p.get('file')} ({p.get('size')} bytes) -> {p.get('path')}")
 
 if __name__ == "__main__":
     main()
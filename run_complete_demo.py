@@ -80,7 +80,9 @@ def display_session_evidence():
         print("[!] No sessions directory")
         return
     
-    sessions = sorted([p for p in sessions_dir.iterdir() if p.is_dir()], key=lambda p: p.name)
+    from src.session_manager import load_session, session_dirs
+    from src.events import EventType, decode_all
+    sessions = session_dirs(sessions_dir)
     if not sessions:
         print("[!] No sessions captured")
         return
@@ -92,8 +94,7 @@ def display_session_evidence():
         print(f"[!] No meta.json in {latest}")
         return
     
-    with open(meta_file, 'r', encoding='utf-8') as f:
-        session_data = json.load(f)
+    session_data = load_session(latest)
     
     print(f"\nSession ID: {latest.name}")
     print(f"Source IP: {session_data.get('src_ip', 'N/A')}")
@@ -102,12 +103,12 @@ def display_session_evidence():
     print("\nFull Session Data:")
     print(json.dumps(session_data, indent=2))
     
-    # Show payloads
-    payloads = list(latest.glob("*.bin"))
+    # Show payloads (stored by hash in the payload store, not in the session dir)
+    payloads = [ev for ev in decode_all(session_data.get("events", [])) if ev["type"] == EventType.PAYLOAD_SAVED]
     if payloads:
         print(f"\n[+] Captured Payloads:")
         for p in payloads:
-            print(f"    - {p.name}: {p.stat().st_size} bytes")
+            print(f"    - {p.get('file')}: {p.get('size')} bytes ({p.get('path')})")
 
 def main():
     print_header("HONEYPOT COMPLETE SETUP GUIDE - PHASE 6 EXECUTION")
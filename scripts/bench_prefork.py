@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""bench_prefork.py - Sessions/sec for 1..N pre-forked orchestrator workers.
+
+For each worker count starts `python -m src.orchestrator_runner` with
+HONEYPOT_WORKERS=<n> and drives it from several client processes, each
+running threads that open a session, send a command, wait for the shell
+prompt, send `exit` and close, for --seconds. Reports completed sessions/sec;
+with CPU-bound classification it should scale with cores up to the number of
+cores the machine has (os.cpu_count() is printed alongside).
+
+Usage:
+  python scripts/bench_prefork.py --workers 1 2 4 --clients 4 --threads 32 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def wait_for_port(host, port, timeout=15.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def one_session(host, port):
+    with socket.create_connection((host, port), timeout=10) as s:
+        s.recv(256)  # banner
+        s.sendall(b"uname -a\n")
+        buf = b""
+        while not buf.endswith(b"# "):
+            chunk = s.recv(4096)
+            if not chunk:
+                return False
+            buf += chunk
+        s.sendall(b"exit\n")
+        while s.recv(4096):
+            pass
+    return True
+
+
+def client(host, port, threads, seconds, out):
+    done = [0] * threads
+    end = time.monotonic() + seconds
+
+    def loop(i):
+        while time.monotonic() < end:
+            try:
+                if one_session(host, port):
+                    done[i] += 1
+            except OSError:
+                time.sleep(0.05)
+
+    workers = [threading.Thread(target=loop, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    out.put(sum(done))
+
+
+def run(workers, args, port):
+    host = "127.0.0.1"
+    with tempfile.TemporaryDirectory(prefix="bench_prefork_") as tmp:
+        env = dict(os.environ, HONEYPOT_WORKERS=str(workers), HONEYPOT_HOST=host, HONEYPOT_PORT=str(port),
+                   HONEYPOT_OUTPUT_DIR=str(Path(tmp) / "sessions"), HONEYPOT_REPORT_DIR=str(Path(tmp) / "out"),
+                   HONEYPOT_PAYLOAD_DIR=str(Path(tmp) / "payloads"))
+        proc = subprocess.Popen([sys.executable, "-m", "src.orchestrator_runner"], cwd=str(ROOT), env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_for_port(host, port):
+                raise RuntimeError(f"orchestrator ({workers} workers) did not start on port {port}")
+            out = multiprocessing.Queue()
+            clients = [multiprocessing.Process(target=client, args=(host, port, args.threads, args.seconds, out))
+                       for _ in range(args.clients)]
+            t0 = time.perf_counter()
+            for c in clients:
+                c.start()
+            total = sum(out.get() for _ in clients)
+            elapsed = time.perf_counter() - t0
+            for c in clients:
+                c.join()
+        finally:
+            proc.terminate()
+            proc.wait(30)
+    return total / elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--clients", type=int, default=4, help="client processes")
+    ap.add_argument("--threads", type=int, default=32, help="concurrent sessions per client process")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--port", type=int, default=22320)
+    args = ap.parse_args()
+
+    print(f"cpu_count={os.cpu_count()}")
+    base = None
+    for i, n in enumerate(args.workers):
+        rate = run(n, args, args.port + i)
+        base = base or rate
+        print(f"workers={n:<3} sessions/s={rate:8.1f}  speedup={rate / base:4.2f}x")
+
+
+if __name__ == "__main__":
+    main()
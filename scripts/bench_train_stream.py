@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""bench_train_stream.py - Time and memory of the streaming trainer on a synthetic corpus.
+
+Generates --sessions sessions lazily (src.train_stream.synthetic_metas), so
+the corpus itself never sits in memory, and trains StreamingTrainer on them
+in --chunk-size chunks. Reports wall time, sessions/sec, resident memory
+after imports and at peak, and held-out accuracy. With --chunk-size varied
+the peak RSS should stay flat while the session count grows.
+
+Usage:
+  python scripts/bench_train_stream.py --sessions 1000000
+  python scripts/bench_train_stream.py --sessions 100000 --chunk-size 1000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.train_stream import CHUNK_SIZE, StreamingTrainer, iter_chunks, peak_rss_mb, synthetic_metas
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, default=1000000)
+    ap.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    ap.add_argument("--progress", type=int, default=100000, help="print a line every N sessions")
+    args = ap.parse_args()
+
+    baseline = peak_rss_mb()
+    trainer = StreamingTrainer()
+    t0 = time.perf_counter()
+    done = 0
+    for chunk in iter_chunks(synthetic_metas(args.sessions), args.chunk_size):
+        trainer.partial_fit(chunk)
+        before, done = done, done + len(chunk)
+        if args.progress and done // args.progress != before // args.progress:
+            print(f"  {done:>9} sessions  {time.perf_counter() - t0:7.1f}s  peak rss {peak_rss_mb()} MB")
+    trainer.seconds = time.perf_counter() - t0
+    report = trainer.evaluate()
+
+    print(f"sessions        {report['sessions']}")
+    print(f"chunk size      {args.chunk_size}")
+    print(f"train time      {report['seconds']:.1f} s ({report['sessions_per_sec']} sessions/s)")
+    print(f"rss after import {baseline} MB, peak {report['peak_rss_mb']} MB")
+    print(f"held-out        {report['evaluated']} sessions, accuracy {report.get('accuracy')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""convert_legacy_events.py - Rewrite text-encoded session events as typed events.
+
+Older sessions log every event as {"ts", "text"}, with the type packed into a
+prefix ("[CLASS]=...", "[STRUCT_EVENT]=<json>", "[PAYLOAD_SAVED]=<dict repr>")
+and classifications/payloads logged twice. This decodes each session's events
+with src.events.decode_all (dropping the [STRUCT_EVENT] duplicates) and writes
+them back to events.jsonl as typed records; inline "events" are removed from
+meta.json. Sessions that are already typed are left alone. Readers accept both
+forms, so this is optional; stop the orchestrator first.
+
+Usage:
+  python scripts/convert_legacy_events.py [--sessions-dir data/sessions] [--dry-run]
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.events import decode_all
+from src.session_manager import BASE, EVENTS_FILE, META_FILE, encode_event, read_events, session_dirs
+
+
+def convert(sdir, dry_run=False):
+    """Convert one session; returns (events before, events after) or None if nothing to do."""
+    p = sdir / META_FILE
+    meta = json.loads(p.read_text(encoding="utf-8"))
+    if not isinstance(meta, dict):
+        return None
+    legacy = [e for e in list(meta.get("events", [])) + read_events(sdir) if isinstance(e, dict)]
+    if "events" not in meta and all("type" in e for e in legacy):
+        return None
+    typed = decode_all(legacy)
+    if dry_run:
+        return len(legacy), len(typed)
+    events_file = sdir / EVENTS_FILE
+    tmp = events_file.with_name(EVENTS_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for ev in typed:
+            f.write(encode_event(ev) + "\n")
+    os.replace(tmp, events_file)
+    if "events" in meta:
+        del meta["events"]
+        tmp = p.with_name(META_FILE + ".tmp")
+        tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        os.replace(tmp, p)
+    return len(legacy), len(typed)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions-dir", default=str(BASE))
+    ap.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = ap.parse_args()
+
+    converted = before = after = 0
+    for sdir in session_dirs(Path(args.sessions_dir)):
+        if not (sdir / META_FILE).exists():
+            continue
+        try:
+            res = convert(sdir, args.dry_run)
+        except (OSError, ValueError) as e:
+            print(f"SKIP {sdir.name}: {e}")
+            continue
+        if res is None:
+            continue
+        converted += 1
+        before += res[0]
+        after += res[1]
+    verb = "Would convert" if args.dry_run else "Converted"
+    print(f"{verb} {converted} sessions: {before} legacy events -> {after} typed events")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 # fix_payload_metadata.py
 import json, pathlib, hashlib, sys, time
 
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from src.session_manager import session_dirs
+
 DATA = pathlib.Path("data/sessions")
 if not DATA.exists():
     print("No data/sessions folder found.")
@@ -17,7 +20,7 @@ def sha256_file(p):
     return h.hexdigest()
 
 fixed = 0
-for s in sorted(DATA.iterdir(), key=lambda p: p.stat().st_mtime):
+for s in session_dirs(DATA):
     meta_file = s / "meta.json"
     if not meta_file.exists():
         continue
@@ -12,6 +12,7 @@ Outputs:
 
 import argparse
 import os
+import sys
 from pathlib import Path
 import pandas as pd
 import numpy as np
@@ -244,17 +245,29 @@ def build_excel_bytes(df):
 # Main runner
 # ----------------------------
 
-def generate_reports(input_csv, outdir, top_n_ips=25, time_freq='H'):
-    input_csv = Path(input_csv)
+# columns the reports below use; segment reads decode only these
+REPORT_COLUMNS = ['session_id', 'src_ip', 'dst_port', 'attack_type', 'success', 'bytes_in', 'bytes_out',
+                  'username', 'password', 'transcript']
+
+def load_segments(segment_dir, days=None):
+    """Sessions from the Parquet segment store (see src/segment_store.py)."""
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from src import segment_store
+    return segment_store.sessions_frame(REPORT_COLUMNS, days=days, segment_dir=segment_dir)
+
+def generate_reports(input_csv, outdir, top_n_ips=25, time_freq='H', segment_dir=None, days=None):
     outdir = Path(outdir)
     ensure_dir(outdir)
     graphs_dir = outdir / 'graphs'
     ensure_dir(graphs_dir)
 
-    if not input_csv.exists():
-        raise FileNotFoundError(f"Input CSV not found: {input_csv}")
-
-    df = pd.read_csv(input_csv, parse_dates=['timestamp'], infer_datetime_format=True)
+    if segment_dir is not None:
+        df = load_segments(segment_dir, days=days)
+    else:
+        input_csv = Path(input_csv)
+        if not input_csv.exists():
+            raise FileNotFoundError(f"Input CSV not found: {input_csv}")
+        df = pd.read_csv(input_csv, parse_dates=['timestamp'], infer_datetime_format=True)
     df = safe_parse_df(df)
     # Produce graphs
     figs = []
@@ -309,7 +322,10 @@ if __name__ == '__main__':
     p.add_argument('--outdir', '-o', type=str, default=r"C:\project\out", help="Output directory")
     p.add_argument('--top-n-ips', type=int, default=25)
     p.add_argument('--time-freq', type=str, default='H')
+    p.add_argument('--segments', type=str, default=None, help="Read the Parquet segment store in this directory instead of --input")
+    p.add_argument('--days', type=int, default=None, help="With --segments: only the last N days")
     args = p.parse_args()
-    print("Reading:", args.input)
-    out = generate_reports(args.input, args.outdir, top_n_ips=args.top_n_ips, time_freq=args.time_freq)
+    print("Reading:", args.segments or args.input)
+    out = generate_reports(args.input, args.outdir, top_n_ips=args.top_n_ips, time_freq=args.time_freq,
+                           segment_dir=args.segments, days=args.days)
     print("Generated:", out)
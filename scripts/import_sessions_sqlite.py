@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""import_sessions_sqlite.py - Load a JSON session tree into the SQLite store.
+
+Reads every session listed by the manifest (meta.json + events.jsonl, either
+layout) plus its payload_*.bin files and writes them to the database used by
+HONEYPOT_STORAGE_BACKEND=sqlite. Re-running replaces sessions already
+imported, so it is safe to repeat.
+
+Usage:
+  python scripts/import_sessions_sqlite.py [--sessions-dir data/sessions] [--db data/honeypot.db]
+"""
+import argparse
+import hashlib
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.session_manager import BASE, load_session, session_dirs
+from src.sqlite_store import DB_PATH, import_session, init_db
+
+
+def payload_files(sdir):
+    for p in sorted(sdir.glob("*.bin")):
+        data = p.read_bytes()
+        yield ({"file": p.name, "sha256": hashlib.sha256(data).hexdigest(), "size": len(data),
+                "saved_ts": p.stat().st_mtime}, data)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions-dir", default=str(BASE))
+    ap.add_argument("--db", default=str(DB_PATH))
+    ap.add_argument("--batch", type=int, default=500, help="sessions per transaction")
+    args = ap.parse_args()
+
+    base = Path(args.sessions_dir)
+    conn = init_db(args.db)
+    imported = failed = 0
+    for sdir in session_dirs(base):
+        try:
+            meta = load_session(sdir)
+            if not isinstance(meta, dict):
+                raise ValueError("meta.json is not an object")
+            import_session(conn, meta, dir=sdir.relative_to(base).as_posix(), payloads=payload_files(sdir))
+            imported += 1
+        except (OSError, ValueError) as e:
+            print(f"  Skipping {sdir}: {e}")
+            failed += 1
+            continue
+        if imported % args.batch == 0:
+            conn.commit()
+    conn.commit()
+    conn.close()
+    print(f"Imported {imported} sessions into {args.db} ({failed} skipped)")
+
+
+if __name__ == "__main__":
+    main()
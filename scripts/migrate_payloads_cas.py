@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""migrate_payloads_cas.py - Move per-session payload files into the payload store.
+
+Older versions saved every captured payload as a .bin file inside its session
+directory, so a dropper pushed a thousand times was stored a thousand times.
+This moves each session's *.bin files into the content-addressed store
+(data/payloads/ab/cd/<sha256>, see src/payload_store.py), deleting copies the
+store already has, records a reference per session and points the payload
+paths in meta.json / events.jsonl at the stored blob. Stop the orchestrator
+first.
+
+Usage:
+  python scripts/migrate_payloads_cas.py [--sessions-dir data/sessions] [--payload-dir data/payloads] [--dry-run]
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.payload_store import PAYLOAD_DIR, PayloadStore
+from src.session_manager import BASE, EVENTS_FILE, META_FILE, session_dirs
+
+
+def rewrite_paths(sdir, moves):
+    """Replace old payload paths with blob paths in the session's JSON files."""
+    pairs = {}
+    for old, new in moves:
+        pairs[old] = new
+        pairs[json.dumps(old)[1:-1]] = json.dumps(new)[1:-1]
+    for name in (META_FILE, EVENTS_FILE):
+        p = sdir / name
+        if not p.exists():
+            continue
+        text = p.read_text(encoding="utf-8")
+        updated = text
+        for a, b in pairs.items():
+            updated = updated.replace(a, b)
+        if updated != text:
+            tmp = p.with_name(p.name + ".tmp")
+            tmp.write_text(updated, encoding="utf-8")
+            os.replace(tmp, p)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions-dir", default=str(BASE))
+    ap.add_argument("--payload-dir", default=str(PAYLOAD_DIR))
+    ap.add_argument("--dry-run", action="store_true", help="list the files without moving them")
+    args = ap.parse_args()
+
+    store = PayloadStore(args.payload_dir)
+    files = stored = nbytes = 0
+    for sdir in session_dirs(Path(args.sessions_dir)):
+        bins = sorted(sdir.glob("*.bin"))
+        if not bins:
+            continue
+        moves = []
+        for f in bins:
+            files += 1
+            if args.dry_run:
+                print(f"{f} -> {args.payload_dir}")
+                continue
+            size = f.stat().st_size
+            meta = store.add_file(f, sdir.name, move=True)
+            if not meta["seen_before"]:
+                stored += 1
+            else:
+                nbytes += size
+            moves.append((str(f.resolve()), meta["path"]))
+        if moves:
+            rewrite_paths(sdir, moves)
+
+    if args.dry_run:
+        print(f"Would move {files} payload files")
+    else:
+        print(f"Moved {files} payload files: {stored} unique blobs, {files - stored} duplicates "
+              f"({nbytes} bytes freed)")
+
+
+if __name__ == "__main__":
+    main()
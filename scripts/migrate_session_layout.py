@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""migrate_session_layout.py - Move flat data/sessions/S-* dirs into hour shards.
+
+Older versions wrote every session to data/sessions/S-<epoch>. This moves each
+one to data/sessions/YYYY/MM/DD/HH/S-<epoch> (UTC, from the epoch in the name
+or the meta.json mtime), rewrites payload paths recorded in meta.json /
+events.jsonl to the new location, and rebuilds the manifest. Session IDs are
+kept as they are so exported CSVs still join. Stop the orchestrator first.
+
+Usage:
+  python scripts/migrate_session_layout.py [--sessions-dir data/sessions] [--dry-run]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.session_manager import BASE, EVENTS_FILE, META_FILE, rebuild_index, shard_for
+
+LEGACY_ID = re.compile(r"^S-(\d{9,11})$")
+
+
+def start_ts(sdir):
+    m = LEGACY_ID.match(sdir.name)
+    return int(m.group(1)) if m else (sdir / META_FILE).stat().st_mtime
+
+
+def rewrite_paths(sdir, old, new):
+    """Point absolute payload paths that still name the old directory at the new one."""
+    pairs = {str(old): str(new), json.dumps(str(old))[1:-1]: json.dumps(str(new))[1:-1]}
+    for name in (META_FILE, EVENTS_FILE):
+        p = sdir / name
+        if not p.exists():
+            continue
+        text = p.read_text(encoding="utf-8")
+        updated = text
+        for a, b in pairs.items():
+            updated = updated.replace(a, b)
+        if updated != text:
+            tmp = p.with_name(p.name + ".tmp")
+            tmp.write_text(updated, encoding="utf-8")
+            os.replace(tmp, p)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions-dir", default=str(BASE))
+    ap.add_argument("--dry-run", action="store_true", help="print the moves without doing them")
+    args = ap.parse_args()
+
+    base = Path(args.sessions_dir).resolve()
+    moved = skipped = 0
+    for meta_file in sorted(base.glob(f"S-*/{META_FILE}")):
+        old = meta_file.parent
+        new = base / shard_for(start_ts(old)) / old.name
+        if new.exists():
+            print(f"SKIP {old.name}: {new} already exists")
+            skipped += 1
+            continue
+        print(f"{old.relative_to(base)} -> {new.relative_to(base)}")
+        if args.dry_run:
+            continue
+        new.parent.mkdir(parents=True, exist_ok=True)
+        os.rename(old, new)
+        rewrite_paths(new, old, new)
+        moved += 1
+
+    if not args.dry_run:
+        n = rebuild_index(base)
+        print(f"Moved {moved} sessions ({skipped} skipped); manifest now lists {n} sessions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""rebuild_session_index.py - Regenerate data/sessions/_index.jsonl from disk.
+
+The orchestrator appends to the manifest as sessions open and close, and
+backfills it automatically the first time it runs against a tree without one.
+Run this by hand after copying sessions in from another host, or if the
+manifest was deleted. Stop the orchestrator first.
+
+Usage:
+  python scripts/rebuild_session_index.py [--sessions-dir data/sessions]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.session_manager import BASE, index_path, rebuild_index
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions-dir", default=str(BASE))
+    args = ap.parse_args()
+    n = rebuild_index(args.sessions_dir)
+    print(f"Indexed {n} sessions -> {index_path(args.sessions_dir)}")
+
+
+if __name__ == "__main__":
+    main()
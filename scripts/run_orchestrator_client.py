@@ -9,6 +9,7 @@ from threading import Thread
 from pathlib import Path
 
 from src.orchestrator import Orchestrator
+from src.session_manager import load_session, session_dirs
 
 
 def start_orchestrator():
@@ -59,7 +60,7 @@ def print_latest_session():
     if not base.exists():
         print('No sessions directory found:', base)
         return
-    sessions = sorted([p for p in base.iterdir() if p.is_dir()], key=lambda p: p.name)
+    sessions = session_dirs(base)
     if not sessions:
         print('No sessions found in', base)
         return
@@ -69,7 +70,7 @@ def print_latest_session():
         print('No meta.json in', last)
         return
     print('\n--- Latest session meta.json ---')
-    print(json.dumps(json.load(open(meta, 'r', encoding='utf-8')), indent=2))
+    print(json.dumps(load_session(last), indent=2))
 
 
 def main():
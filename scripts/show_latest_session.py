@@ -1,7 +1,10 @@
 # show_latest_session.py
 # Utility to show the most recent honeypot session log (meta.json)
 
-import pathlib, json
+import pathlib, json, sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from src.session_manager import session_dirs
 
 data_dir = pathlib.Path("data/sessions")
 
@@ -9,7 +12,7 @@ if not data_dir.exists():
     print("No sessions folder found.")
     raise SystemExit
 
-sessions = sorted(data_dir.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)
+sessions = session_dirs(data_dir, newest_first=True)
 if not sessions:
     print("No sessions yet.")
     raise SystemExit
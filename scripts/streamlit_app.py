@@ -1,7 +1,11 @@
 ﻿import streamlit as st
-import pathlib, json, time
+import pathlib, json, time, sys
 from datetime import datetime
 
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from src.events import EventType, decode_all, text_of
+from src.session_manager import load_session, IndexTail, session_dirs
+
 DATA = pathlib.Path("data/sessions")
 
 st.set_page_config(page_title="Honeypot Dashboard", layout="wide")
@@ -25,18 +29,27 @@ setTimeout(()=>window.location.reload(), {refresh_interval*1000});
 
 # Sidebar: session selection
 st.sidebar.header("Controls")
+@st.cache_resource
+def index_tail():
+    # shared across reruns: each refresh only reads manifest entries added since the last one
+    return IndexTail(DATA)
+
 all_sessions = []
-if DATA.exists() and any(DATA.iterdir()):
-    all_sessions = sorted(DATA.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)
-else:
+if DATA.exists():
+    tail = index_tail()
+    tail.poll()
+    all_sessions = tail.session_dirs(newest_first=True) or session_dirs(DATA, newest_first=True)
+if not all_sessions:
     st.sidebar.write("No sessions yet (run the honeypot & test client).")
 
-selected = st.sidebar.selectbox("Pick session", ["(latest)"] + [p.name for p in all_sessions])
+# sessions live under DATA/YYYY/MM/DD/HH/, so keep the full paths behind the names
+by_name = {p.name: p for p in all_sessions}
+selected = st.sidebar.selectbox("Pick session", ["(latest)"] + list(by_name))
 
 if selected == "(latest)":
     session_path = all_sessions[0] if all_sessions else None
 else:
-    session_path = DATA / selected
+    session_path = by_name.get(selected)
 
 if not session_path:
     st.info("No session available. Start honeypot and run test client to generate a session.")
@@ -47,7 +60,7 @@ if not meta_file.exists():
     st.error(f"meta.json not found for session: {session_path}")
     st.stop()
 
-meta = json.loads(meta_file.read_text(encoding="utf-8"))
+meta = load_session(session_path)
 
 col1, col2, col3, col4 = st.columns([1,1,1,2])
 col1.metric("Session ID", meta.get("session_id", "N/A"))
@@ -58,40 +71,25 @@ col4.metric("Recorded", meta.get("end_time", "running"))
 left, right = st.columns([2.5,1.5])
 with left:
     st.subheader("Event timeline")
-    for ev in meta.get("events", []):
+    for ev in decode_all(meta.get("events", [])):
         ts = human_time(ev.get("ts", 0))
-        txt = ev.get("text", "")
-        if txt.startswith("[STRUCT_EVENT]"):
-            try:
-                payload = json.loads(txt.split("=",1)[1])
-                st.markdown(f"**{ts}** — **{payload.get('type','STRUCT')}**: {payload.get('summary', payload)}")
-            except Exception:
-                st.markdown(f"**{ts}** — {txt}")
-        elif txt.startswith("[CLASS]") or txt.startswith("[ACTION]") or txt.startswith("[PAYLOAD_SAVED]"):
+        txt = text_of(ev)
+        if ev["type"] == EventType.CLASSIFICATION and ev.get("vector"):
+            st.markdown(f"**{ts}** — **classification**: {ev['label'].upper()} ({ev['vector']}) — "
+                        f"conf {float(ev.get('confidence') or 0):.2f}, ENG={ev.get('engagement')}")
+        elif ev["type"] in (EventType.CLASSIFICATION, EventType.ACTION, EventType.PAYLOAD_SAVED):
             st.markdown(f"**{ts}** — {txt}")
         else:
             st.markdown(f"{ts} — {txt}")
 
 with right:
     st.subheader("Payloads & Metadata")
-    payloads = []
-    for ev in meta.get("events", []):
-        t = ev.get("text","")
-        if t.startswith("[PAYLOAD_SAVED]") or t.startswith("[STRUCT_EVENT]") and '"payload_saved"' in t:
-            payloads.append(t)
+    payloads = [ev for ev in decode_all(meta.get("events", [])) if ev["type"] == EventType.PAYLOAD_SAVED]
     if not payloads:
         st.info("No payloads captured in this session.")
     else:
-        for idx, ptxt in enumerate(payloads):
+        for idx, pm in enumerate(payloads):
             st.markdown(f"**Payload {idx+1}**")
-            try:
-                if ptxt.startswith("[STRUCT_EVENT]"):
-                    raw = ptxt.split("=",1)[1]
-                    pm = json.loads(raw.replace("'", '"'))
-                else:
-                    pm = json.loads(ptxt.split("=",1)[1].replace("'", '"'))
-            except Exception:
-                pm = {"path": ptxt}
             ppath = pathlib.Path(pm.get("path", ""))
             st.write("Filename:", pm.get("file", ppath.name))
             st.write("Path:", str(ppath))
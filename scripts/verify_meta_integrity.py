@@ -1,6 +1,10 @@
 # verify_meta_integrity.py
 import hashlib, json, pathlib, sys
 
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from src.events import EventType, decode_all
+from src.session_manager import load_session, session_dirs
+
 DATA = pathlib.Path("data/sessions")
 if not DATA.exists():
     print("No data/sessions folder found.")
@@ -17,30 +21,21 @@ def sha256_file(p):
     return h.hexdigest()
 
 issues = []
-for s in sorted(DATA.iterdir(), key=lambda p: p.stat().st_mtime):
+for s in session_dirs(DATA):
     meta_file = s / "meta.json"
     if not meta_file.exists():
         continue
-    meta = json.loads(meta_file.read_text(encoding="utf-8"))
-    for ev in meta.get("events", []):
-        txt = ev.get("text","")
-        if txt.startswith("[PAYLOAD_SAVED]="):
+    meta = load_session(s)
+    for ev in decode_all(meta.get("events", [])):
+        if ev["type"] == EventType.PAYLOAD_SAVED:
             try:
-                payload_meta = txt.split("=",1)[1]
-                # evaluate dict safely-ish by replacing single quotes
-                if payload_meta.strip().startswith("{"):
-                    payload_meta = payload_meta.replace("'", '"')
-                    pm = json.loads(payload_meta)
-                else:
-                    # fallback: treat as string path
-                    pm = {"path": payload_meta}
-                p = pathlib.Path(pm.get("path") or pm.get("file"))
+                p = pathlib.Path(ev.get("path") or ev.get("file"))
                 if not p.exists():
                     issues.append((s.name, "file_missing", str(p)))
                     continue
                 actual_sha = sha256_file(p)
-                if pm.get("sha256") != actual_sha:
-                    issues.append((s.name, "sha_mismatch", str(p), pm.get("sha256"), actual_sha))
+                if ev.get("sha256") != actual_sha:
+                    issues.append((s.name, "sha_mismatch", str(p), ev.get("sha256"), actual_sha))
             except Exception as e:
                 issues.append((s.name, "parse_error", str(e)))
 if not issues:
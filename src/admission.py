@@ -0,0 +1,152 @@
+# src/admission.py
+"""Per-source admission control in front of the connection handlers.
+
+Every accepted connection used to get a session, a handler and disk writes,
+so one noisy source could tie up all of them. AdmissionControl decides
+before any of that happens:
+
+  - each source IP has a token bucket: HONEYPOT_ADMIT_RATE new sessions per
+    second with bursts of HONEYPOT_ADMIT_BURST;
+  - each source IP may hold HONEYPOT_MAX_PER_IP sessions at once;
+  - the whole process holds at most HONEYPOT_MAX_SESSIONS sessions.
+
+Per-IP state lives in a fixed-size table (HONEYPOT_ADMIT_TABLE entries) that
+evicts the least recently seen source, so memory stays bounded however many
+addresses a scan uses. A source that was evicted while it still had
+sessions loses its count, so the per-IP cap is only approximate for it.
+
+Rejected connections are shed cheaply -- the banner and a close, or with
+HONEYPOT_SHED=tarpit a slow drip -- and never get a session directory. They
+are still counted: stats() totals them per reason and lists the top rejected
+sources, and the orchestrator writes that to <out>/admission_stats.json
+(admission_stats-<worker>.json for pre-forked workers) for the dashboard.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+ADMIT_RATE = float(os.environ.get("HONEYPOT_ADMIT_RATE", "2"))
+ADMIT_BURST = float(os.environ.get("HONEYPOT_ADMIT_BURST", "20"))
+MAX_PER_IP = int(os.environ.get("HONEYPOT_MAX_PER_IP", "32"))
+MAX_SESSIONS = int(os.environ.get("HONEYPOT_MAX_SESSIONS", "2000"))
+TABLE_SIZE = int(os.environ.get("HONEYPOT_ADMIT_TABLE", "65536"))
+SHED = os.environ.get("HONEYPOT_SHED", "banner").lower()
+STATS_INTERVAL = float(os.environ.get("HONEYPOT_ADMIT_STATS_INTERVAL", "10"))
+STATS_FILE = "admission_stats.json"
+TOP_REJECTED = 20
+
+# rejection reasons
+RATE, PER_IP, GLOBAL = "rate", "per_ip", "global"
+
+
+class _Source:
+    __slots__ = ("tokens", "last", "active", "rejected")
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.last = now
+        self.active = 0
+        self.rejected = 0
+
+
+class AdmissionControl:
+    def __init__(self, rate=None, burst=None, per_ip=None, max_sessions=None, table_size=None,
+                 clock=time.monotonic):
+        self.rate = ADMIT_RATE if rate is None else rate
+        self.burst = ADMIT_BURST if burst is None else burst
+        self.per_ip = MAX_PER_IP if per_ip is None else per_ip
+        self.max_sessions = MAX_SESSIONS if max_sessions is None else max_sessions
+        self.table_size = TABLE_SIZE if table_size is None else table_size
+        self.clock = clock
+        self.active = 0
+        self.admitted = 0
+        self.rejected = {RATE: 0, PER_IP: 0, GLOBAL: 0}
+        self.evicted = 0
+        self._table = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _source(self, ip, now):
+        src = self._table.get(ip)
+        if src is None:
+            if len(self._table) >= self.table_size:
+                self._table.popitem(last=False)
+                self.evicted += 1
+            src = self._table[ip] = _Source(self.burst, now)
+        else:
+            self._table.move_to_end(ip)
+            # refill for the time since this source was last seen
+            src.tokens = min(self.burst, src.tokens + (now - src.last) * self.rate)
+            src.last = now
+        return src
+
+    def admit(self, ip):
+        """Return None if a session from ip may start (call release() when it ends),
+        else the rejection reason."""
+        with self._lock:
+            src = self._source(ip, self.clock())
+            if self.max_sessions and self.active >= self.max_sessions:
+                reason = GLOBAL
+            elif self.per_ip and src.active >= self.per_ip:
+                reason = PER_IP
+            elif self.rate and src.tokens < 1:
+                reason = RATE
+            else:
+                src.tokens -= 1
+                src.active += 1
+                self.active += 1
+                self.admitted += 1
+                return None
+            src.rejected += 1
+            self.rejected[reason] += 1
+            return reason
+
+    def release(self, ip):
+        with self._lock:
+            self.active -= 1
+            src = self._table.get(ip)
+            if src is not None and src.active:
+                src.active -= 1
+
+    def stats(self):
+        with self._lock:
+            top = sorted(((s.rejected, ip) for ip, s in self._table.items() if s.rejected), reverse=True)
+            return {"ts": time.time(), "active": self.active, "admitted": self.admitted,
+                    "rejected": dict(self.rejected), "rejected_total": sum(self.rejected.values()),
+                    "tracked_sources": len(self._table), "evicted_sources": self.evicted,
+                    "top_rejected": [{"src_ip": ip, "rejected": n} for n, ip in top[:TOP_REJECTED]]}
+
+    def dump(self, path):
+        """Write stats() to path atomically."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.stats(), f, indent=2)
+        os.replace(tmp, path)
+
+
+def stats_path(out_dir):
+    worker = os.environ.get("HONEYPOT_WORKER")
+    return Path(out_dir) / (STATS_FILE if worker is None else f"admission_stats-{worker}.json")
+
+
+def load_stats(out_dir):
+    """Sum every admission_stats*.json in out_dir (one per worker) for display."""
+    total = {"active": 0, "admitted": 0, "rejected_total": 0, "rejected": {}, "top_rejected": {}}
+    for p in sorted(Path(out_dir).glob("admission_stats*.json")):
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                s = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for key in ("active", "admitted", "rejected_total"):
+            total[key] += s.get(key, 0)
+        for reason, n in s.get("rejected", {}).items():
+            total["rejected"][reason] = total["rejected"].get(reason, 0) + n
+        for row in s.get("top_rejected", []):
+            total["top_rejected"][row["src_ip"]] = total["top_rejected"].get(row["src_ip"], 0) + row["rejected"]
+    total["top_rejected"] = sorted(total["top_rejected"].items(), key=lambda kv: kv[1], reverse=True)
+    return total
@@ -1,11 +1,107 @@
 # src/classifier.py
-from .model import load_model
+import os
+import threading
+from collections import OrderedDict
 
-clf, inv_label_map = load_model()
+import numpy as np
+
+from .model import get_registry
+
+FEATURES = ("wget", "failed_login", "num_commands")
+CACHE_SIZE = int(os.environ.get("HONEYPOT_CLASSIFY_CACHE", "4096"))
+
+
+class LRUMemo:
+    """Bounded (model version, feature tuple) -> (label, conf) memo.
+
+    The features are small integers, so scanners running the same script
+    produce the same vectors over and over; a hit costs one dict lookup
+    instead of a pass over the forest. Entries of an older model version are
+    dropped when the registry swaps in a new one."""
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, count_miss=True):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                if count_miss:
+                    self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+
+memo = LRUMemo()
+# the model is loaded on the first classification (src/model.py)
+get_registry().on_swap(lambda model: memo.clear())
+
+
+def reload_model():
+    """Load the model files again; returns the new version or None on failure."""
+    return get_registry().reload()
+
+def _rules(wget, failed_login, num_commands):
+    # fallback rules (existing)
+    if wget==1 and num_commands>2:
+        return ("exploit", 0.9)
+    if failed_login>3:
+        return ("bruteforce", 0.85)
+    if num_commands<=2:
+        return ("recon", 0.6)
+    return ("unknown", 0.5)
 
 def classify(features):
     # features: dict with keys: wget, failed_login, num_commands
-    fv = [features.get("wget",0), features.get("failed_login",0), features.get("num_commands",0)]
+    fv = tuple(features.get(name,0) for name in FEATURES)
+    # one snapshot per call, so a reload never mixes two models
+    model = get_registry().current()
+    key = (model.version, fv)
+    result = memo.get(key)
+    if result is None:
+        result = _classify_vector(model, fv)
+        memo.put(key, result)
+    return result
+
+def classify_cached(features):
+    """The memoised (label, conf) for features under the current model, or None.
+
+    A miss is not counted here: the caller goes on to classify() or
+    classify_batch(), which count it."""
+    fv = tuple(features.get(name,0) for name in FEATURES)
+    return memo.get((get_registry().current().version, fv), count_miss=False)
+
+def _classify_vector(model, fv):
+    forest, clf, inv_label_map = model.forest, model.clf, model.inv_label_map
+    if forest is not None:
+        # label and probability from one pass over the trees
+        idx, conf = forest.predict_one(fv)
+        return inv_label_map.get(forest.classes[idx], "unknown"), conf
     if clf:
         pred = clf.predict([fv])[0]
         label = inv_label_map.get(pred, "unknown")
@@ -15,11 +111,40 @@ def classify(features):
         except Exception:
             conf = 0.8
         return label, conf
-    # fallback rules (existing)
-    if features.get("wget",0)==1 and features.get("num_commands",0)>2:
-        return ("exploit", 0.9)
-    if features.get("failed_login",0)>3:
-        return ("bruteforce", 0.85)
-    if features.get("num_commands",0)<=2:
-        return ("recon", 0.6)
-    return ("unknown", 0.5)
+    return _rules(*fv)
+
+def _classify_rows(model, X):
+    forest, clf, inv_label_map = model.forest, model.clf, model.inv_label_map
+    if forest is not None:
+        proba = forest.predict_proba(X)
+        idx = proba.argmax(axis=1)
+        conf = proba[np.arange(len(X)), idx]
+        return [(inv_label_map.get(c, "unknown"), float(p)) for c, p in zip(forest.classes[idx], conf)]
+    if clf:
+        try:
+            proba = clf.predict_proba(X)
+        except Exception:
+            return [(inv_label_map.get(pred, "unknown"), 0.8) for pred in clf.predict(X)]
+        idx = proba.argmax(axis=1)
+        return [(inv_label_map.get(clf.classes_[i], "unknown"), float(proba[row, i]))
+                for row, i in enumerate(idx)]
+    return [_rules(*row) for row in X.tolist()]
+
+def classify_batch(features_list):
+    """classify() for many vectors at once: a list of feature dicts or a 2-D
+    array with one row per vector (columns in FEATURES order). Returns a list
+    of (label, conf); the vectors the memo does not know get one model pass."""
+    if len(features_list) and isinstance(features_list[0], dict):
+        rows = [tuple(f.get(name,0) for name in FEATURES) for f in features_list]
+    else:
+        rows = [tuple(r) for r in np.asarray(features_list).reshape(-1, len(FEATURES)).tolist()]
+    model = get_registry().current()
+    version = model.version
+    results = [memo.get((version, fv)) for fv in rows]
+    missing = list({fv: None for fv, r in zip(rows, results) if r is None})
+    if missing:
+        computed = dict(zip(missing, _classify_rows(model, np.array(missing, dtype=float))))
+        for fv in missing:
+            memo.put((version, fv), computed[fv])
+        results = [r if r is not None else computed[fv] for fv, r in zip(rows, results)]
+    return results
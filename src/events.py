@@ -0,0 +1,204 @@
+# src/events.py
+"""Typed session events and the one decoder every reader goes through.
+
+Events are written once, as flat JSON records with a numeric `ts`, an enum
+`type` and that type's fields:
+
+  {"ts": 1730000000.12, "type": "input", "line": "uname -a"}
+  {"ts": 1730000000.13, "type": "classification", "label": "recon",
+   "confidence": 0.6, "engagement": "LOW", "vector": "command"}
+  {"ts": 1730000000.20, "type": "payload_saved", "file": "...", "path": "...",
+   "sha256": "...", "size": 42, "saved_ts": 1730000000.2}
+
+Older sessions hold {"ts", "text"} records with the type packed into a text
+prefix ("[CLASS]=recon|0.6|ENG=LOW", "[STRUCT_EVENT]=<json>",
+"[PAYLOAD_SAVED]=<python dict repr>", "ATTACKER_CMD: ls", ...). decode()
+turns either form into a typed record, so exporters and dashboards parse
+one shape; text_of() renders a record back to the legacy one-line text for
+display and substring search. scripts/convert_legacy_events.py rewrites old
+sessions in the typed form.
+"""
+import ast
+import json
+import time
+from enum import Enum
+
+
+class EventType(str, Enum):
+    INPUT = "input"                        # raw line from the low-interaction front end
+    CLASSIFICATION = "classification"
+    PAYLOAD_DETECTED = "payload_detected"
+    PAYLOAD_SAVED = "payload_saved"
+    ACTION = "action"
+    SHELL_CMD = "shell_cmd"                # command typed into the high-engagement shell
+    HIGH_ENGAGEMENT = "high_engagement"    # shell lifecycle: START, END, TIMEOUT_CLOSING, ...
+    ERROR = "error"
+    TEXT = "text"                          # legacy text that matches no known prefix
+
+
+_TYPES = {t.value: t for t in EventType}
+
+
+def make(kind, ts=None, **data):
+    """A typed event record; values that JSON cannot encode are stored as str."""
+    for k, v in data.items():
+        if not isinstance(v, (str, int, float, bool)) and v is not None:
+            try:
+                json.dumps(v)
+            except (TypeError, ValueError):
+                data[k] = str(v)
+    return {"ts": time.time() if ts is None else float(ts), "type": EventType(kind).value, **data}
+
+
+def input_line(line, ts=None):
+    return make(EventType.INPUT, ts, line=line)
+
+
+def classification(label, confidence, engagement, vector=None, ts=None):
+    return make(EventType.CLASSIFICATION, ts, label=label, confidence=float(confidence),
+                engagement=engagement, vector=vector)
+
+
+def payload_detected(url, ts=None):
+    return make(EventType.PAYLOAD_DETECTED, ts, url=url)
+
+
+def payload_saved(meta, ts=None):
+    """Event for a payload meta dict as returned by evidence_store."""
+    return make(EventType.PAYLOAD_SAVED, ts, **{k: v for k, v in meta.items() if k not in ("ts", "type")})
+
+
+def action(name, ts=None):
+    return make(EventType.ACTION, ts, action=name)
+
+
+def shell_cmd(cmd, ts=None):
+    return make(EventType.SHELL_CMD, ts, cmd=cmd)
+
+
+def high_engagement(state, ts=None):
+    return make(EventType.HIGH_ENGAGEMENT, ts, state=state)
+
+
+def error(code, message="", ts=None):
+    return make(EventType.ERROR, ts, code=code, message=str(message))
+
+
+# ---------------------
+# Legacy text decoding
+# ---------------------
+
+def _literal(value):
+    """Parse a legacy dict value: JSON, or the Python repr older writers used."""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return ast.literal_eval(value)
+
+
+def _class(ts, value):
+    parts = value.split("|")
+    eng = parts[2].split("=", 1)[-1] if len(parts) > 2 else None
+    return classification(parts[0], float(parts[1]) if len(parts) > 1 else 0.0, eng, ts=ts)
+
+
+def _payload(ts, value):
+    value = value.strip()
+    meta = _literal(value) if value.startswith("{") else {"path": value}
+    return payload_saved(meta, ts)
+
+
+def _error(ts, value):
+    code, _, message = value.partition("|")
+    return error(code, message, ts) if message else error("", value, ts)
+
+
+_LEGACY = {
+    "CLASS": _class,
+    "PAYLOAD_SAVED": _payload,
+    "PAYLOAD_DETECTED": lambda ts, v: payload_detected(v, ts),
+    "ACTION": lambda ts, v: action(v, ts),
+    "HIGH_ENGAGEMENT": lambda ts, v: high_engagement(v, ts),
+    "ERROR": _error,
+    "HIGH_ENGAGEMENT_ERROR": lambda ts, v: error("HIGH_ENGAGEMENT_ERROR", v, ts),
+    "HIGH_ENGAGEMENT_ERROR_INIT": lambda ts, v: error("HIGH_ENGAGEMENT_ERROR_INIT", v, ts),
+}
+
+# Legacy writers logged classifications and handoff payloads twice, as a
+# [STRUCT_EVENT] and as the [CLASS]/[PAYLOAD_SAVED] line right after it.
+# decode() returns None for those struct copies so each fact is seen once.
+_STRUCT_TWINS = {"classification", "payload_saved"}
+
+
+def _decode_text(ts, text):
+    if text.startswith("ATTACKER_CMD: "):
+        return shell_cmd(text[14:], ts)
+    if not text.startswith("["):
+        return input_line(text, ts)
+    end = text.find("]=")
+    tag = text[1:end] if end > 0 else None
+    try:
+        if tag == "STRUCT_EVENT":
+            struct = json.loads(text[end + 2:])
+            kind = struct.pop("type", None)
+            if kind in _STRUCT_TWINS:
+                return None
+            struct.pop("ts", None)
+            if kind in _TYPES:
+                return make(kind, ts, **struct)
+            return make(EventType.TEXT, ts, text=text)
+        handler = _LEGACY.get(tag)
+        if handler is not None:
+            return handler(ts, text[end + 2:])
+    except (ValueError, SyntaxError, TypeError):
+        pass
+    return make(EventType.TEXT, ts, text=text)
+
+
+def decode(event):
+    """Typed record for a stored event (typed or legacy), or None to skip it."""
+    if "type" in event:
+        return event
+    ts = event.get("ts")
+    return _decode_text(ts if isinstance(ts, (int, float)) else 0.0, str(event.get("text", "")))
+
+
+def decode_all(events):
+    """Decode a session's event list, dropping legacy duplicates and non-dicts."""
+    out = []
+    for e in events:
+        if isinstance(e, dict):
+            ev = decode(e)
+            if ev is not None:
+                out.append(ev)
+    return out
+
+
+def fields(event):
+    """The type-specific fields of a typed record (everything but ts/type)."""
+    return {k: v for k, v in event.items() if k not in ("ts", "type")}
+
+
+def text_of(event):
+    """One-line legacy-style text for a stored event (typed or legacy)."""
+    kind = event.get("type")
+    if kind is None:
+        return str(event.get("text", ""))
+    if kind == EventType.INPUT:
+        return event.get("line", "")
+    if kind == EventType.SHELL_CMD:
+        return f"ATTACKER_CMD: {event.get('cmd', '')}"
+    if kind == EventType.CLASSIFICATION:
+        return f"[CLASS]={event.get('label')}|{event.get('confidence')}|ENG={event.get('engagement')}"
+    if kind == EventType.PAYLOAD_SAVED:
+        return f"[PAYLOAD_SAVED]={json.dumps(fields(event))}"
+    if kind == EventType.PAYLOAD_DETECTED:
+        return f"[PAYLOAD_DETECTED]={event.get('url')}"
+    if kind == EventType.ACTION:
+        return f"[ACTION]={event.get('action')}"
+    if kind == EventType.HIGH_ENGAGEMENT:
+        return f"[HIGH_ENGAGEMENT]={event.get('state')}"
+    if kind == EventType.ERROR:
+        code = event.get("code")
+        return f"[ERROR]={code}|{event.get('message', '')}" if code else f"[ERROR]={event.get('message', '')}"
+    return str(event.get("text", ""))
@@ -2,8 +2,9 @@
 from pathlib import Path
 import hashlib, time, json, os
 from .append_session_csv import append_session_csv
-
-MAX_PAYLOAD_BYTES = 5 * 1024 * 1024  # 5 MB
+from .storage_writer import get_writer
+from .sqlite_store import get_store
+from .payload_store import MAX_PAYLOAD_BYTES, PayloadSink, get_payload_store
 
 def sha256_bytes(b: bytes) -> str:
     h = hashlib.sha256()
@@ -12,28 +13,53 @@ def sha256_bytes(b: bytes) -> str:
 
 
 def save_payload_to_session_dir(sdir, data: bytes, name=None):
-    """Save payload bytes into the session dir and return rich metadata dict.
+    """Store payload bytes for a session and return rich metadata dict.
 
-    Truncates to MAX_PAYLOAD_BYTES to avoid huge files. Returns metadata:
-    {file, path, sha256, size, saved_ts}
+    Truncates to MAX_PAYLOAD_BYTES (and the payload quotas) to avoid huge
+    files. The bytes go to the content-addressed payload store (see
+    payload_store), so a payload already captured by another session costs a
+    hash and a reference line, not a copy. Returns metadata:
+    {file, path, sha256, size, saved_ts, seen_before, truncated}
+    For payloads that arrive in pieces use open_payload_sink instead.
     """
     sdir = Path(sdir)
-    sdir.mkdir(parents=True, exist_ok=True)
     if name is None:
         name = f"payload_{int(time.time())}.bin"
     content = data[:MAX_PAYLOAD_BYTES] if data is not None else b''
-    p = sdir / name
-    with open(p, "wb") as f:
-        f.write(content)
-    sha = sha256_bytes(content)
-    meta = {
-        "file": name,
-        "path": str(p.resolve()),
-        "sha256": sha,
-        "size": len(content),
-        "saved_ts": time.time()
-    }
-    return meta
+    store = get_store()
+    if store is not None:
+        # SQLite backend: bytes go into the payloads table, no session dir
+        sha = sha256_bytes(content)
+        meta = {"file": name, "path": store.payload_uri(sha), "sha256": sha,
+                "size": len(content), "saved_ts": time.time()}
+        store.save_payload(sdir.name, meta, bytes(content))
+        return meta
+    return get_payload_store().add(bytes(content), sdir.name, name)
+
+
+def open_payload_sink(sdir, name=None, note=None):
+    """Start a streamed capture (uploads, transfers) for a session.
+
+    Returns a payload_store.PayloadSink: write() chunks as they arrive, then
+    finalize() for the same metadata as save_payload_to_session_dir plus
+    entropy/received, or abort(). Only one chunk is held in memory.
+    """
+    sdir = Path(sdir)
+    if name is None:
+        name = f"payload_{int(time.time())}.bin"
+    store = get_store()
+    if store is None:
+        return get_payload_store().open_sink(sdir.name, name, note)
+
+    def commit(tmp, sha, size):
+        # SQLite backend: the (capped) temp file becomes one payloads row
+        meta = {"file": name, "path": store.payload_uri(sha), "sha256": sha, "size": size, "saved_ts": time.time()}
+        store.save_payload(sdir.name, meta, tmp.read_bytes())
+        tmp.unlink()
+        return meta
+
+    return PayloadSink(get_payload_store().tmp_path(), commit,
+                       lambda n, already: max(0, min(n, MAX_PAYLOAD_BYTES - already)), lambda n: None, name, note)
 
 
 def save_payload(sdir, data, name="payload.bin"):
@@ -53,8 +79,19 @@ def save_session_data(session_dir: str, session_data: dict):
         session_data: Dictionary containing session metadata
     """
     session_dir = Path(session_dir)
+    store = get_store()
+    if store is not None:
+        store.update_session(session_dir.name, session_data)
+        return
     session_dir.mkdir(parents=True, exist_ok=True)
-    
+    writer = get_writer()
+    if writer is not None:
+        writer.call(_write_session_data, session_dir, dict(session_data))
+    else:
+        _write_session_data(session_dir, session_data)
+
+
+def _write_session_data(session_dir, session_data):
     # Save as JSON
     meta_path = session_dir / "meta.json"
     with open(meta_path, 'w', encoding='utf-8') as f:
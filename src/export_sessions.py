@@ -4,12 +4,17 @@ import json
 from pathlib import Path
 import pandas as pd
 import time
+from .session_manager import load_session, session_dirs as list_session_dirs
+from .session_loader import load_columns, export_row, SOURCE_COLUMN
+from . import sqlite_store
+from .events import EventType, decode_all
 
 def extract_session_info(meta_path):
-    """Extract key fields from a session meta.json file."""
-    with open(meta_path, "r", encoding="utf-8") as f:
-        meta = json.load(f)
+    """Extract key fields from a session meta.json file (and its events.jsonl)."""
+    return session_info(load_session(Path(meta_path).parent))
 
+def session_info(meta):
+    """Build the CSV row for one session from its legacy meta dict."""
     events = meta.get("events", [])
     # Extract key fields
     info = {
@@ -29,76 +34,203 @@ def extract_session_info(meta_path):
 
     # Parse events for key info
     cmds = []
-    for ev in events:
-        text = ev.get("text", "")
+    for ev in decode_all(events):
         ts = pd.to_datetime(time.ctime(ev.get("ts", 0)))
         info["timestamp"] = min(info["timestamp"], ts)  # use earliest event time
+        kind = ev["type"]
 
-        if "[CLASS]=" in text:
-            parts = text.split("=")[1].split("|")
-            if len(parts) >= 2:
-                info["attack_type"] = parts[0]
-                info["success"] = 1 if "success" in parts[0].lower() else 0
+        if kind == EventType.CLASSIFICATION:
+            info["attack_type"] = ev.get("label", info["attack_type"])
+            info["success"] = 1 if "success" in str(ev.get("label", "")).lower() else 0
 
-        elif "[STRUCT_EVENT]=" in text:
-            try:
-                struct = json.loads(text.split("=", 1)[1])
-                if struct.get("type") == "classification":
-                    info["attack_type"] = struct.get("label", info["attack_type"])
-                    info["success"] = 1 if "success" in str(struct.get("label", "")).lower() else 0
-                    if "vector" in struct:
-                        info["attack_type"] = f"{info['attack_type']}_{struct['vector']}"
-            except:
-                pass
-
-        elif "[PAYLOAD_SAVED]=" in text:
+        elif kind == EventType.PAYLOAD_SAVED:
             info["success"] = 1  # if payload captured, mark as successful
             try:
-                payload = json.loads(text.split("=", 1)[1])
-                info["bytes_in"] += int(payload.get("size", 0))
-            except:
+                info["bytes_in"] += int(ev.get("size") or 0)
+            except (TypeError, ValueError):
                 pass
 
-        elif not text.startswith("["):  # capture raw command transcript
-            cmds.append(text)
+        elif kind == EventType.INPUT:  # capture raw command transcript
+            cmds.append(ev.get("line", ""))
 
     info["transcript"] = "\n".join(cmds)
+    # traffic counted by the connection's LineFramer, when recorded
+    for key in ("bytes_in", "bytes_out"):
+        if isinstance(meta.get(key), int):
+            info[key] = meta[key]
     return info
 
-def sessions_to_csv(sessions_dir, output_csv):
-    """Convert all session meta.json files under sessions_dir into a single CSV."""
-    sessions_dir = Path(sessions_dir)
-    rows = []
+# --- incremental export ---------------------------------------------------
+# <output_csv>.checkpoint.json records, per session directory, the mtime it
+# had when its row was written. Unchanged sessions are never parsed again;
+# new ones are appended to the CSV, and the CSV is only rewritten when an
+# already-exported session changed (e.g. it was still open last time).
 
-    # Find all meta.json files
-    for meta in sessions_dir.glob("*/meta.json"):
-        try:
-            info = extract_session_info(meta)
-            rows.append(info)
-        except Exception as e:
-            print(f"Error processing {meta}: {e}")
+def _checkpoint_path(output_csv):
+    return Path(str(output_csv) + ".checkpoint.json")
 
-    if not rows:
-        print("No sessions found!")
-        return False
+def _load_checkpoint(output_csv):
+    try:
+        with open(_checkpoint_path(output_csv), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-    # Convert to DataFrame and save
-    df = pd.DataFrame(rows)
-    # Ensure output directory exists
+def _save_checkpoint(output_csv, checkpoint):
+    p = _checkpoint_path(output_csv)
+    tmp = p.with_name(p.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    tmp.replace(p)
+
+def _session_mtime(sdir):
+    """Latest mtime (ns) of the files a session's row is derived from."""
+    latest = 0
+    for name in ("meta.json", "events.jsonl"):
+        try:
+            latest = max(latest, (Path(sdir) / name).stat().st_mtime_ns)
+        except OSError:
+            pass
+    return latest
+
+def _write_csv_atomic(df, output_csv):
     Path(output_csv).parent.mkdir(parents=True, exist_ok=True)
-    # Write to temp then rename for atomic operation
     tmp_path = str(output_csv) + ".tmp"
     df.to_csv(tmp_path, index=False)
-    Path(tmp_path).rename(output_csv)
+    Path(tmp_path).replace(output_csv)
+
+def _export_dirs(session_dirs, output_csv, full_rebuild=False):
+    """Parse new/changed sessions among session_dirs and merge them into output_csv.
+
+    Returns the number of session rows written.
+    """
+    output_csv = Path(output_csv)
+    rebuild = full_rebuild or not output_csv.exists()
+    checkpoint = None if rebuild else _load_checkpoint(output_csv)
+    # an existing CSV without a checkpoint can't be appended to blindly:
+    # upsert every row by session_id instead
+    trusted = checkpoint is not None
+    checkpoint = checkpoint or {}
+    seen = checkpoint.setdefault("sessions", {})
+
+    to_parse, mtimes, is_new = [], {}, {}
+    for sdir in session_dirs:
+        sdir = Path(sdir)
+        mtime = _session_mtime(sdir)
+        if not mtime or not (sdir / "meta.json").exists():
+            continue
+        prev = seen.get(sdir.name)
+        if prev is not None and prev["mtime"] == mtime:
+            continue
+        to_parse.append(sdir)
+        mtimes[sdir.name] = mtime
+        is_new[sdir.name] = prev is None and (trusted or rebuild)
+
+    # parse in parallel (process pool for large backlogs)
+    errors = []
+    columns = load_columns(to_parse, export_row, with_source=True, errors=errors)
+    for sdir, err in errors:
+        print(f"Error processing {Path(sdir) / 'meta.json'}: {err}")
+    new_rows, changed_rows = [], []
+    if columns:
+        parsed = pd.DataFrame(columns)
+        sources = parsed.pop(SOURCE_COLUMN)
+        for name, sid in zip(sources, parsed["session_id"]):
+            seen[name] = {"mtime": mtimes[name], "session_id": sid}
+        mask = sources.map(is_new).astype(bool)
+        new_rows, changed_rows = parsed[mask], parsed[~mask]
+
+    if rebuild:
+        if not len(new_rows):
+            return 0
+        _write_csv_atomic(new_rows, output_csv)
+    elif len(changed_rows):
+        # rewrite only when an exported row changed
+        df = pd.read_csv(output_csv)
+        changed = pd.concat([changed_rows, new_rows], ignore_index=True)
+        if "session_id" in df.columns:
+            df = df[~df["session_id"].isin(changed["session_id"])]
+        _write_csv_atomic(pd.concat([df, changed], ignore_index=True), output_csv)
+    elif len(new_rows):
+        # append-only fast path, in the existing column order
+        with open(output_csv, "r", encoding="utf-8") as f:
+            header = f.readline().strip().split(",")
+        new_rows.reindex(columns=header).to_csv(output_csv, mode="a", header=False, index=False)
+    else:
+        return 0
+
+    _save_checkpoint(output_csv, checkpoint)
+    return len(new_rows) + len(changed_rows)
+
+def _export_sqlite(output_csv, session_ids=None):
+    """SQLite backend: build rows straight from the database.
+
+    With session_ids, upserts just those rows into output_csv; otherwise
+    rewrites it with every session. Returns the number of rows written.
+    """
+    output_csv = Path(output_csv)
+    conn = sqlite_store.connect()
+    try:
+        ids = sqlite_store.session_ids(conn) if session_ids is None else session_ids
+        metas = (sqlite_store.load_session(conn, sid) for sid in ids)
+        rows = pd.DataFrame([session_info(m) for m in metas if m])
+    finally:
+        conn.close()
+    n = len(rows)
+    if not n:
+        return 0
+    if session_ids is not None and output_csv.exists():
+        df = pd.read_csv(output_csv)
+        if "session_id" in df.columns:
+            df = df[~df["session_id"].isin(rows["session_id"])]
+        rows = pd.concat([df, rows], ignore_index=True)
+    _write_csv_atomic(rows, output_csv)
+    return n
+
+def sessions_to_csv(sessions_dir, output_csv, full_rebuild=False):
+    """Export every session under sessions_dir into a single CSV.
+
+    Incremental: only sessions that are new or changed since the last export
+    are parsed (see the checkpoint notes above). Pass full_rebuild=True to
+    ignore the checkpoint and regenerate the CSV from scratch. With
+    HONEYPOT_STORAGE_BACKEND=sqlite the rows are read from the database.
+    """
+    if sqlite_store.backend() == "sqlite":
+        return _export_sqlite(output_csv) > 0
+    _export_dirs(list_session_dirs(sessions_dir), output_csv, full_rebuild=full_rebuild)
+    if not Path(output_csv).exists():
+        print("No sessions found!")
+        return False
     return True
 
+def update_sessions_csv(session_dirs, output_csv, sessions_dir=None):
+    """Merge just the given session directories into output_csv.
+
+    Used by the export worker for sessions it knows have closed; only those
+    are parsed. If output_csv (or its checkpoint) is missing, e.g. right after
+    an upgrade, every session in the manifest under sessions_dir (default: the
+    session store) is exported first, so history is not dropped from the CSV.
+    Returns the number of sessions written.
+    """
+    output_csv = Path(output_csv)
+    if sqlite_store.backend() == "sqlite":
+        if not output_csv.exists():
+            return _export_sqlite(output_csv)
+        return _export_sqlite(output_csv, [Path(d).name for d in session_dirs])
+    n = 0
+    if not output_csv.exists() or _load_checkpoint(output_csv) is None:
+        n = _export_dirs(list_session_dirs(sessions_dir), output_csv)
+    return n + _export_dirs(session_dirs, output_csv)
+
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) != 3:
-        print("Usage: python export_sessions.py <sessions_dir> <output_csv>")
-        sys.exit(1)
-    if sessions_to_csv(sys.argv[1], sys.argv[2]):
-        print(f"Wrote CSV: {sys.argv[2]}")
+    import argparse
+    ap = argparse.ArgumentParser(description="Export honeypot sessions to a normalized CSV.")
+    ap.add_argument("sessions_dir")
+    ap.add_argument("output_csv")
+    ap.add_argument("--full-rebuild", action="store_true", help="ignore the checkpoint and rebuild the CSV from scratch")
+    args = ap.parse_args()
+    if sessions_to_csv(args.sessions_dir, args.output_csv, full_rebuild=args.full_rebuild):
+        print(f"Wrote CSV: {args.output_csv}")
     else:
         print("Failed to create CSV (no sessions found)")
-        sys.exit(1)
\ No newline at end of file
+        raise SystemExit(1)
@@ -0,0 +1,238 @@
+# src/export_worker.py
+"""Background export + report pipeline for closed sessions.
+
+Closing a session used to re-export every session on disk and spawn a fresh
+generate_reports.py run. The ExportWorker instead receives "session closed"
+notifications, coalesces them over a window (HONEYPOT_EXPORT_WINDOW seconds)
+and then runs one incremental CSV update for just those sessions plus one
+report build.
+
+Pending sessions survive a restart instead of forcing a rescan of history:
+notify_closed() appends the session dir to <out_dir>/.export_worker_pending
+(one short line, no rewrite on the connection thread) and each run saves
+<out_dir>/.export_worker_state.json and trims the log to what is still
+pending. A failed export is retried after RETRY_DELAY seconds, doubling up to
+MAX_RETRY_DELAY; after MAX_RETRIES failures in a row the batch is dropped and
+listed under "failed" in the state file.
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from .export_sessions import update_sessions_csv
+from .storage_writer import get_writer
+from .sqlite_store import get_store
+from . import segment_store
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+REPORT_SCRIPT = BASE_DIR / "scripts" / "generate_reports.py"
+STATE_FILE = ".export_worker_state.json"
+PENDING_LOG = ".export_worker_pending"
+RETRY_DELAY = 5.0
+MAX_RETRY_DELAY = 300.0
+MAX_RETRIES = 5
+MAX_FAILED = 1000          # failed session dirs kept in the state file
+
+logger = logging.getLogger("orchestrator")
+
+
+def run_report_generator(input_path, out_dir, max_retries=2):
+    """Run generate_reports.py to completion using the current interpreter.
+
+    Writes logs to out_dir/report_run_<timestamp>.log and avoids concurrent runs
+    (e.g. from several orchestrator processes) with a lock file.
+    """
+    lockfile = Path(out_dir) / ".generate_reports.lock"
+    # simple lock to prevent parallel runs
+    if lockfile.exists():
+        logger.info("generate_reports: lockfile exists, skipping new run.")
+        return False
+    try:
+        lockfile.write_text(str(time.time()))
+        timestamp = int(time.time())
+        logfile = Path(out_dir) / f"report_run_{timestamp}.log"
+        cmd = [
+            sys.executable,
+            str(REPORT_SCRIPT),
+            "--input", str(input_path),
+            "--outdir", str(out_dir)
+        ]
+        logger.info("Starting generate_reports: %s", " ".join(cmd))
+        attempt = 0
+        while attempt <= max_retries:
+            attempt += 1
+            try:
+                with open(logfile, "ab") as lf:
+                    ret = subprocess.call(cmd, stdout=lf, stderr=lf)
+                if ret == 0:
+                    logger.info("generate_reports completed successfully (attempt %d). log=%s", attempt, logfile)
+                    return True
+                logger.warning("generate_reports returned code %s on attempt %d. Will retry.", ret, attempt)
+                time.sleep(2)
+            except Exception as e:
+                logger.exception("Exception running generate_reports (attempt %d): %s", attempt, e)
+                time.sleep(2)
+        logger.error("generate_reports failed after %d attempts. Check %s", max_retries, logfile)
+        return False
+    finally:
+        try:
+            if lockfile.exists():
+                lockfile.unlink()
+        except Exception:
+            pass
+
+
+class ExportWorker:
+    def __init__(self, out_dir, window=None, reports=True):
+        self.out_dir = Path(out_dir)
+        self.window = float(os.environ.get("HONEYPOT_EXPORT_WINDOW", "10")) if window is None else window
+        self.reports = reports
+        self.csv_path = self.out_dir / "sessions_latest.csv"
+        self.state_path = self.out_dir / STATE_FILE
+        self.pending_log = self.out_dir / PENDING_LOG
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._first_pending = None
+        self._thread = None
+        self._stop = False
+        self.failures = 0
+        self.state = {"pending": [], "exported_sessions": 0, "runs": 0, "last_run_ts": None, "failed": []}
+        self._load_state()
+
+    # --- state persistence -------------------------------------------------
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.state.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        for sdir in self.state.get("pending", []):
+            self._pending[sdir] = None
+        try:
+            with open(self.pending_log, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._pending[line.rstrip("\n")] = None
+        except OSError:
+            pass
+        self.state["pending"] = list(self._pending)
+        if self._pending:
+            self._first_pending = time.monotonic()
+
+    def _save_state(self):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.state["pending"] = list(self._pending)
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_path)
+        # everything still pending is in the state file now
+        self.pending_log.unlink(missing_ok=True)
+
+    # --- producer side -----------------------------------------------------
+
+    def notify_closed(self, sdir):
+        with self._cond:
+            if not self._pending:
+                self._first_pending = time.monotonic()
+            if str(sdir) not in self._pending:
+                self._pending[str(sdir)] = None
+                self.out_dir.mkdir(parents=True, exist_ok=True)
+                with open(self.pending_log, "a", encoding="utf-8") as f:
+                    f.write(f"{sdir}\n")
+            self._cond.notify()
+
+    def start(self):
+        if self._thread is None:
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="export-worker", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=30.0):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # --- worker thread -----------------------------------------------------
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stop:
+                    self._cond.wait()
+                # coalesce: wait out the rest of the window unless stopping
+                while not self._stop:
+                    remaining = self._first_pending + self.window - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stop and not self._pending:
+                    return
+                batch = list(self._pending)
+            ok = self.run_once(batch)
+            if self._stop:
+                with self._cond:
+                    # a failed batch stays pending for the next start
+                    if not ok or not self._pending:
+                        return
+
+    def run_once(self, session_dirs=None):
+        """Export the given (default: all pending) sessions and rebuild reports once."""
+        with self._cond:
+            batch = list(self._pending) if session_dirs is None else list(session_dirs)
+        if not batch:
+            return False
+        for pending_writes in (get_writer(), get_store()):
+            if pending_writes is not None:
+                pending_writes.flush(timeout=10.0)
+        try:
+            n = update_sessions_csv(batch, self.csv_path)
+        except Exception:
+            logger.exception("Incremental export failed for %d sessions", len(batch))
+            self._export_failed(batch)
+            return False
+        with self._cond:
+            self.failures = 0
+            for sdir in batch:
+                self._pending.pop(sdir, None)
+            if self._pending:
+                self._first_pending = time.monotonic()
+            self.state["exported_sessions"] += n
+            self.state["runs"] += 1
+            self.state["last_run_ts"] = time.time()
+            self._save_state()
+        logger.info("Exported %d closed sessions to %s", n, self.csv_path)
+        if segment_store.enabled():
+            try:
+                compacted = segment_store.compact_new()
+                logger.info("Compacted %d closed sessions into Parquet segments", compacted)
+            except Exception:
+                logger.exception("Segment compaction failed")
+        if self.reports and n:
+            run_report_generator(self.csv_path, self.out_dir)
+        return True
+
+    def _export_failed(self, batch):
+        with self._cond:
+            self.failures += 1
+            if self.failures >= MAX_RETRIES:
+                logger.error("Giving up on %d sessions after %d failed exports", len(batch), self.failures)
+                for sdir in batch:
+                    self._pending.pop(sdir, None)
+                self.state["failed"] = (self.state.get("failed", []) + batch)[-MAX_FAILED:]
+                self.failures = 0
+                self._save_state()
+            if self._pending:
+                # back off: the window restarts after the retry delay
+                delay = min(RETRY_DELAY * 2 ** max(self.failures - 1, 0), MAX_RETRY_DELAY)
+                self._first_pending = time.monotonic() + delay
@@ -1,3 +1,52 @@
+from .events import EventType, text_of
+
+# events that carry what the attacker sent; the rest are the sensor's own records
+_ATTACKER_TYPES = (EventType.INPUT, EventType.SHELL_CMD)
+
+
+def _from_attacker(event):
+    kind = event.get("type")
+    if kind is None:
+        # legacy tagged records ("[ERROR]=...", "[HIGH_ENGAGEMENT]=...") are the sensor's
+        return not str(event.get("text", "")).startswith("[")
+    return kind in _ATTACKER_TYPES
+
+
+class FeatureState:
+    """Running feature vector for one session, updated in O(1) per event.
+
+    Keeps the orchestrator's hot path off disk: instead of re-reading every
+    event and re-joining their text on each attacker line, the session holds
+    one of these and feeds it each event as it is logged.
+    """
+    __slots__ = ("wget", "failed_login", "num_commands")
+
+    def __init__(self):
+        self.wget = 0
+        self.failed_login = 0
+        self.num_commands = 0
+
+    def update(self, event):
+        """Fold in one stored event (typed or legacy text, see src.events).
+
+        Called once per logged event, as extract_features() does over a
+        stored session, so runtime and offline features agree.
+        """
+        text = text_of(event).lower()
+        if "wget" in text or "curl" in text:
+            self.wget = 1
+        # error codes like PAYLOAD_SAVE_FAILED are not failed logins
+        if _from_attacker(event):
+            self.failed_login += text.count("failed")
+        self.num_commands += 1
+        return self
+
+    def as_dict(self):
+        return {"wget": self.wget, "failed_login": self.failed_login, "num_commands": self.num_commands}
+
+
 def extract_features(events):
-    text = " ".join(e.get("text", "") for e in events).lower()
-    return {"wget": 1 if "wget" in text or "curl" in text else 0, "num_commands": len(events)}
+    state = FeatureState()
+    for e in events:
+        state.update(e)
+    return state.as_dict()
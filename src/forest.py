@@ -0,0 +1,112 @@
+# src/forest.py
+"""Flat-array inference for the classifier's random forest.
+
+classify() used to call clf.predict([fv]) and then clf.predict_proba([fv]) on
+the sklearn RandomForestClassifier for every attacker line: two full passes
+over 100 trees, each behind sklearn's input validation, for a 3-feature
+vector. FlatForest holds the same trees as a few NumPy arrays, concatenated
+across trees:
+
+    feature[n], threshold[n]   split of node n
+    left[n], right[n]          children of node n (leaves point at themselves)
+    value[n]                   class probabilities at node n
+    roots[t]                   first node of tree t
+
+and walks all trees at once, one depth level per step, so a prediction is
+max_depth rounds of fancy indexing and a mean, returning the label index and
+its probability from one pass:
+
+    forest = FlatForest.from_sklearn(clf)
+    idx, conf = forest.predict_one([wget, failed_login, num_commands])
+    label = forest.classes[idx]
+
+Results match sklearn: X is rounded to float32 before comparing with the
+thresholds, as sklearn's trees do. save()/load() keep the arrays in an
+uncompressed joblib file next to the pickled model; load() memory-maps it
+(mmap_mode="r"), so every process that loads the same file shares its
+pages instead of unpickling a private copy. save() replaces the file
+atomically, so a forest mapped from the old file stays intact.
+scripts/bench_classifier.py compares per-call latency.
+"""
+import os
+
+import joblib
+import numpy as np
+
+_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots", "classes")
+
+
+class FlatForest:
+    def __init__(self, feature, threshold, left, right, value, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        self.max_depth = int(max_depth)
+        self.n_trees = len(roots)
+
+    @classmethod
+    def from_sklearn(cls, clf):
+        """Flatten a fitted RandomForestClassifier / ExtraTreesClassifier."""
+        trees = [est.tree_ for est in getattr(clf, "estimators_", ())]
+        if not trees or getattr(clf, "n_outputs_", 1) != 1:
+            raise TypeError(f"cannot flatten {type(clf).__name__}: need a single-output tree ensemble")
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            n = tree.node_count
+            ids = np.arange(n, dtype=np.int32)
+            leaf = tree.children_left == -1
+            roots.append(offset)
+            # leaves loop back to themselves so every tree can take max_depth steps
+            feature.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+            threshold.append(np.where(leaf, np.inf, tree.threshold))
+            left.append(np.where(leaf, ids, tree.children_left).astype(np.int32) + offset)
+            right.append(np.where(leaf, ids, tree.children_right).astype(np.int32) + offset)
+            counts = tree.value[:, 0, :]
+            value.append(counts / counts.sum(axis=1, keepdims=True))
+            offset += n
+        return cls(np.concatenate(feature), np.concatenate(threshold), np.concatenate(left),
+                   np.concatenate(right), np.concatenate(value), np.asarray(roots, dtype=np.int32),
+                   np.asarray(clf.classes_), max(t.max_depth for t in trees))
+
+    def predict_proba(self, X):
+        """Class probabilities for each row of X, shape (n_samples, n_classes)."""
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes].mean(axis=1)
+
+    def predict_one(self, fv):
+        """(class index, probability) of the most likely class for one feature vector."""
+        x = np.asarray(fv, dtype=np.float32).astype(np.float64)
+        nodes = self.roots
+        for _ in range(self.max_depth):
+            go_left = x[self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        proba = self.value[nodes].mean(axis=0)
+        idx = int(proba.argmax())
+        return idx, float(proba[idx])
+
+    def predict(self, X):
+        return self.classes[self.predict_proba(X).argmax(axis=1)]
+
+    def save(self, path):
+        data = {name: np.ascontiguousarray(getattr(self, name)) for name in _ARRAYS}
+        data["max_depth"] = self.max_depth
+        # per-process temp name: pre-forked workers may flatten the same model at once
+        tmp = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(data, tmp)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        data = joblib.load(path, mmap_mode=mmap_mode)
+        # plain ndarray views over the mapping; np.memmap wraps every result and is slower
+        return cls(*(data[name].view(np.ndarray) for name in _ARRAYS), max_depth=data["max_depth"])
@@ -1,12 +1,15 @@
 ﻿# src/high_engagement.py (patched to ignore socket.timeout)
-import time, random, hashlib, errno, socket
+import time, random, hashlib, errno, socket, asyncio, re
 from pathlib import Path
 from .session_manager import append_event
-from .evidence_store import save_payload
+from . import events
+from .line_framer import LineFramer
+from .tarpit import get_paced_writer
+from .timer_wheel import SessionDeadlines
+from .evidence_store import MAX_PAYLOAD_BYTES, open_payload_sink, save_payload_to_session_dir
 
 MAX_SESSION_SECONDS = 60 * 20
 INACTIVITY_TIMEOUT = 60 * 3
-MAX_PAYLOAD_BYTES = 5 * 1024 * 1024
 
 FAKE_FILES = {
     "/etc/passwd": "root:x:0:0:root:/root:/bin/bash\nadmin:x:1000:1000:Admin:/home/admin:/bin/bash\n",
@@ -19,21 +22,22 @@ FAKE_FILES = {
 def now_ts():
     return time.time()
 
-def chunked_send(conn, text, delay_min=0.02, delay_max=0.12, chunk_size=240):
+def chunked_send(conn, text, delay_min=0.02, delay_max=0.12, chunk_size=240, framer=None, pause=0.0):
+    """Queue text on the paced writer, chunk_size bytes at a time with a random
+    delay between chunks (the first after `pause` seconds). Returns at once;
+    False once an earlier write found the client gone."""
     if not text:
         return True
-    try:
-        b = text.encode(errors="ignore")
-        for i in range(0, len(b), chunk_size):
-            conn.sendall(b[i:i+chunk_size])
-            time.sleep(random.uniform(delay_min, delay_max))
-        return True
-    except (ConnectionResetError, BrokenPipeError, ConnectionAbortedError):
-        return False
-    except OSError as oe:
-        if getattr(oe, "winerror", None) == 10053 or getattr(oe, "errno", None) == errno.ECONNABORTED:
+    writer = get_paced_writer()
+    b = text.encode(errors="ignore")
+    delay = pause
+    for i in range(0, len(b), chunk_size):
+        if not writer.write(conn, b[i:i+chunk_size], delay):
             return False
-        raise
+        if framer is not None:
+            framer.sent(len(b[i:i+chunk_size]))
+        delay = random.uniform(delay_min, delay_max)
+    return True
 
 def compute_sha256_bytes(b):
     h = hashlib.sha256()
@@ -46,12 +50,11 @@ def save_placeholder_payload(sdir, source_hint, data_bytes):
     else:
         content = data_bytes[:MAX_PAYLOAD_BYTES]
     filename = f"payload_{int(time.time())}.bin"
-    p = save_payload(sdir, content, name=filename)
-    sha256 = compute_sha256_bytes(content)
-    meta = {"file": filename, "path": str(p), "sha256": sha256, "note": source_hint}
+    meta = save_payload_to_session_dir(sdir, content, name=filename)
+    meta["note"] = source_hint
     return meta
 
-def handle_ls(conn, sdir, cwd, args):
+def ls_output(cwd):
     lines = []
     lines.append("drwxr-xr-x 3 root root 4096 Nov  1 10:01 .")
     for path in FAKE_FILES:
@@ -62,27 +65,21 @@ def handle_ls(conn, sdir, cwd, args):
                 lines.append(f"-rw-r--r-- 1 root root {size} Nov  1 10:01 {name}")
     if not lines:
         lines = ["total 0"]
-    return chunked_send(conn, "\n".join(lines) + "\n")
+    return "\n".join(lines) + "\n"
 
-def handle_cat(conn, sdir, target):
+def cat_output(target):
     content = FAKE_FILES.get(target)
     if content is None:
-        return chunked_send(conn, f"cat: {target}: No such file or directory\n")
-    return chunked_send(conn, content)
-
-def handle_uname(conn):
-    return chunked_send(conn, "Linux fakehost 4.15.0-99-generic #100~16.04.1 SMP Tue Nov 2 12:34:56 UTC 2021 x86_64 GNU/Linux\n")
-
-def handle_whoami(conn):
-    return chunked_send(conn, "root\n")
+        return f"cat: {target}: No such file or directory\n"
+    return content
 
-def handle_ps(conn):
-    out = ("USER       PID %CPU %MEM    VSZ   RSS TTY      STAT START   TIME COMMAND\n"
-           "root         1  0.0  0.1  22568  4100 ?        Ss   Nov01   0:01 /sbin/init\n"
-           "root      2345  0.1  0.3 123456 10344 ?        Ssl  Nov01   0:12 /usr/bin/fake-service\n")
-    return chunked_send(conn, out)
+UNAME_OUTPUT = "Linux fakehost 4.15.0-99-generic #100~16.04.1 SMP Tue Nov 2 12:34:56 UTC 2021 x86_64 GNU/Linux\n"
+WHOAMI_OUTPUT = "root\n"
+PS_OUTPUT = ("USER       PID %CPU %MEM    VSZ   RSS TTY      STAT START   TIME COMMAND\n"
+             "root         1  0.0  0.1  22568  4100 ?        Ss   Nov01   0:01 /sbin/init\n"
+             "root      2345  0.1  0.3 123456 10344 ?        Ssl  Nov01   0:12 /usr/bin/fake-service\n")
 
-def handle_download(conn, sdir, command_text):
+def handle_download(sdir, command_text):
     parts = command_text.split()
     url = None
     for p in parts:
@@ -90,110 +87,321 @@ def handle_download(conn, sdir, command_text):
             url = p
             break
     # log detection immediately (guarantee)
-    append_event(sdir, {"ts": now_ts(), "text": f"[PAYLOAD_DETECTED]={url}"})
+    append_event(sdir, events.payload_detected(url))
     meta = save_placeholder_payload(sdir, source_hint=f"download:{url}", data_bytes=(url or "").encode())
-    append_event(sdir, {"ts": now_ts(), "text": f"[PAYLOAD_SAVED]={meta}"})
-    return chunked_send(conn, f"Attempted download from {url} (placeholder saved)\n")
+    append_event(sdir, events.payload_saved(meta))
+    return f"Attempted download from {url} (placeholder saved)\n"
+
+# `cat > file` / `cat >> file`: everything typed up to Ctrl-D (EOT) is an upload
+UPLOAD_RE = re.compile(r"^cat\s*>>?\s*(\S+)$")
+EOT = b"\x04"
+
+
+def upload_target(cmd_text):
+    m = UPLOAD_RE.match(cmd_text)
+    return m.group(1) if m else None
+
+
+class Upload:
+    """Streams one `cat > file` upload into the evidence store until Ctrl-D.
+
+    Bytes go straight from the socket buffer to a payload sink, so memory use
+    does not depend on the upload size; the shells stop line-splitting input
+    while an upload is open.
+    """
+
+    def __init__(self, sdir, target):
+        self.sdir = sdir
+        self.sink = open_payload_sink(sdir, name=Path(target).name or "upload.bin", note=f"upload:{target}")
+
+    def feed(self, data):
+        """Write data; once Ctrl-D arrives return the input after it, else None."""
+        end = data.find(EOT)
+        if end < 0:
+            self.sink.write(data)
+            return None
+        self.sink.write(data[:end])
+        return data[end + 1:]
+
+    def finish(self):
+        try:
+            append_event(self.sdir, events.payload_saved(self.sink.finalize()))
+        except Exception as e:
+            self.sink.abort()
+            append_event(self.sdir, events.error("PAYLOAD_SAVE_FAILED", e))
 
-def start_fake_shell(conn, sdir):
+
+def shell_response(sdir, cwd, cmd_text):
+    """Log one attacker command and return (output_text, exit_requested).
+
+    Shared by the threaded and asyncio shells so both emulate the same host.
+    """
+    append_event(sdir, events.shell_cmd(cmd_text))
+    lower = cmd_text.lower()
+    if lower.startswith("ls"):
+        return ls_output(cwd), False
+    if lower.startswith("cat "):
+        target = cmd_text[4:].strip()
+        if not target.startswith("/"):
+            target = cwd.rstrip("/") + "/" + target
+        return cat_output(target), False
+    if lower.startswith("uname"):
+        return UNAME_OUTPUT, False
+    if lower.startswith("whoami") or lower.startswith("id"):
+        return WHOAMI_OUTPUT, False
+    if "ps aux" in lower or lower.startswith("ps"):
+        return PS_OUTPUT, False
+    if "wget" in lower or "curl" in lower:
+        return handle_download(sdir, cmd_text), False
+    if lower.startswith("exit") or lower.startswith("logout"):
+        return "logout\n", True
+    return f"-bash: {cmd_text}: command not found\n", False
+
+def start_fake_shell(conn, sdir, framer=None):
+    # the timer wheel ends the session; recv never has to wake up to check the clock
+    deadlines = SessionDeadlines(lambda reason: shutdown_read(conn), MAX_SESSION_SECONDS, INACTIVITY_TIMEOUT)
+    try:
+        _fake_shell(conn, sdir, framer, deadlines)
+    finally:
+        deadlines.cancel()
+        # let the paced writer drain queued output before the caller closes conn
+        get_paced_writer().close(conn)
+
+def shutdown_read(conn):
+    # a recv blocked on conn returns b"" and the shell loop ends
+    try:
+        conn.shutdown(socket.SHUT_RD)
+    except OSError:
+        pass
+
+def _fake_shell(conn, sdir, framer, deadlines):
     start_time = now_ts()
-    append_event(sdir, {"ts": start_time, "text": "[HIGH_ENGAGEMENT]=START"})
+    append_event(sdir, events.high_engagement("START", ts=start_time))
     cwd = "/root"
-    last_activity = now_ts()
 
     # send welcome and prompt
     try:
-        if not chunked_send(conn, "Welcome to Ubuntu 16.04.7 LTS (GNU/Linux 4.15.0-99)\n"):
-            append_event(sdir, {"ts": now_ts(), "text": "[HIGH_ENGAGEMENT]=CLIENT_CLOSED_BEFORE_START"})
-            append_event(sdir, {"ts": now_ts(), "text": "[HIGH_ENGAGEMENT]=END"})
+        if not chunked_send(conn, "Welcome to Ubuntu 16.04.7 LTS (GNU/Linux 4.15.0-99)\n", framer=framer):
+            append_event(sdir, events.high_engagement("CLIENT_CLOSED_BEFORE_START"))
+            append_event(sdir, events.high_engagement("END"))
             return
-        if not chunked_send(conn, "root@fakehost:~# "):
-            append_event(sdir, {"ts": now_ts(), "text": "[HIGH_ENGAGEMENT]=CLIENT_CLOSED_BEFORE_PROMPT"})
-            append_event(sdir, {"ts": now_ts(), "text": "[HIGH_ENGAGEMENT]=END"})
+        if not chunked_send(conn, "root@fakehost:~# ", framer=framer):
+            append_event(sdir, events.high_engagement("CLIENT_CLOSED_BEFORE_PROMPT"))
+            append_event(sdir, events.high_engagement("END"))
             return
     except Exception as e:
-        append_event(sdir, {"ts": now_ts(), "text": f"[HIGH_ENGAGEMENT_ERROR_INIT]={e}"})
-        append_event(sdir, {"ts": now_ts(), "text": "[HIGH_ENGAGEMENT]=END"})
+        append_event(sdir, events.error("HIGH_ENGAGEMENT_ERROR_INIT", e))
+        append_event(sdir, events.high_engagement("END"))
         return
 
-    buffer = b""
-    conn.settimeout(1.0)
+    framer = framer or LineFramer()
+    # lines the orchestrator read past the handoff are handled before the first recv
+    handoff = framer.pending() > 0
+    upload = None
+    conn.settimeout(None)
 
     while True:
-        # enforce max session time
-        if now_ts() - start_time > MAX_SESSION_SECONDS:
-            append_event(sdir, {"ts": now_ts(), "text": "[HIGH_ENGAGEMENT]=TIMEOUT_CLOSING"})
-            break
-        # enforce inactivity timeout
-        if now_ts() - last_activity > INACTIVITY_TIMEOUT:
-            append_event(sdir, {"ts": now_ts(), "text": "[HIGH_ENGAGEMENT]=INACTIVITY_CLOSING"})
-            break
-
         try:
-            chunk = conn.recv(4096)
-            if not chunk:
-                # remote closed connection
-                break
-            buffer += chunk
-            if b"\n" in buffer:
-                parts = buffer.split(b"\n")
-                for cmd_bytes in parts[:-1]:
-                    cmd_text = cmd_bytes.decode(errors="ignore").strip()
-                    last_activity = now_ts()
-                    append_event(sdir, {"ts": now_ts(), "text": f"ATTACKER_CMD: {cmd_text}"})
-
-                    lower = cmd_text.lower()
-                    ok = True
-                    if lower.startswith("ls"):
-                        ok = handle_ls(conn, sdir, cwd, cmd_text)
-                    elif lower.startswith("cat "):
-                        target = cmd_text[4:].strip()
-                        if not target.startswith("/"):
-                            target = cwd.rstrip("/") + "/" + target
-                        ok = handle_cat(conn, sdir, target)
-                    elif lower.startswith("uname"):
-                        ok = handle_uname(conn)
-                    elif lower.startswith("whoami") or lower.startswith("id"):
-                        ok = handle_whoami(conn)
-                    elif "ps aux" in lower or lower.startswith("ps"):
-                        ok = handle_ps(conn)
-                    elif "wget" in lower or "curl" in lower:
-                        ok = handle_download(conn, sdir, cmd_text)
-                    elif lower.startswith("exit") or lower.startswith("logout"):
-                        chunked_send(conn, "logout\n")
-                        append_event(sdir, {"ts": now_ts(), "text": "[HIGH_ENGAGEMENT]=ATTACKER_EXIT"})
-                        return
-                    else:
-                        ok = chunked_send(conn, f"-bash: {cmd_text}: command not found\n")
-
-                    if not ok:
-                        append_event(sdir, {"ts": now_ts(), "text": "[HIGH_ENGAGEMENT]=CLIENT_DISCONNECTED"})
-                        append_event(sdir, {"ts": now_ts(), "text": "[HIGH_ENGAGEMENT]=END"})
+            if handoff:
+                handoff = False
+            else:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    # remote closed connection, or a deadline shut the read side
+                    break
+                if not framer.push(chunk):
+                    append_event(sdir, events.error("CONN_BYTE_BUDGET", f"{framer.bytes_in} bytes received"))
+                    break
+            while framer.pending():
+                if upload is not None:
+                    deadlines.touch()
+                    rest = upload.feed(framer.take())
+                    if rest is None:
+                        break
+                    upload.finish()
+                    upload = None
+                    framer.unread(rest)
+                    if not chunked_send(conn, "root@fakehost:~# ", framer=framer):
+                        append_event(sdir, events.high_engagement("CLIENT_DISCONNECTED_AFTER_PROMPT"))
+                        append_event(sdir, events.high_engagement("END"))
                         return
+                    continue
+                raw_cmd = framer.pop_line()
+                if raw_cmd is None:
+                    break
+                cmd_text = raw_cmd.decode(errors="ignore").strip()
+                deadlines.touch()
+                target = upload_target(cmd_text)
+                if target:
+                    append_event(sdir, events.shell_cmd(cmd_text))
+                    upload = Upload(sdir, target)
+                    continue
+                output, exit_requested = shell_response(sdir, cwd, cmd_text)
+                if exit_requested:
+                    chunked_send(conn, output, framer=framer)
+                    append_event(sdir, events.high_engagement("ATTACKER_EXIT"))
+                    return
 
-                    time.sleep(random.uniform(0.2, 0.7))
-                    if not chunked_send(conn, "root@fakehost:~# "):
-                        append_event(sdir, {"ts": now_ts(), "text": "[HIGH_ENGAGEMENT]=CLIENT_DISCONNECTED_AFTER_PROMPT"})
-                        append_event(sdir, {"ts": now_ts(), "text": "[HIGH_ENGAGEMENT]=END"})
-                        return
+                if not chunked_send(conn, output, framer=framer):
+                    append_event(sdir, events.high_engagement("CLIENT_DISCONNECTED"))
+                    append_event(sdir, events.high_engagement("END"))
+                    return
 
-                buffer = parts[-1]
-        except socket.timeout:
-            # No data received this cycle — continue waiting
-            continue
+                if not chunked_send(conn, "root@fakehost:~# ", framer=framer, pause=random.uniform(0.2, 0.7)):
+                    append_event(sdir, events.high_engagement("CLIENT_DISCONNECTED_AFTER_PROMPT"))
+                    append_event(sdir, events.high_engagement("END"))
+                    return
         except ConnectionResetError:
             break
         except OSError as oe:
             if getattr(oe, "winerror", None) == 10053 or getattr(oe, "errno", None) == errno.ECONNABORTED:
                 break
-            append_event(sdir, {"ts": now_ts(), "text": f"[HIGH_ENGAGEMENT_ERROR]={oe}"})
+            append_event(sdir, events.error("HIGH_ENGAGEMENT_ERROR", oe))
+            break
+        except Exception as e:
+            append_event(sdir, events.error("HIGH_ENGAGEMENT_ERROR", e))
             break
+
+    if deadlines.expired:
+        append_event(sdir, events.high_engagement(deadlines.expired))
+    if upload is not None:
+        upload.finish()  # keep what arrived before the connection ended
+    append_event(sdir, events.high_engagement("END"))
+    try:
+        chunked_send(conn, "\nConnection closed by remote host.\n", framer=framer)
+    except Exception:
+        pass
+
+
+# --- asyncio variants -------------------------------------------------
+# Same emulation as above, but paced with asyncio.sleep and driven by a
+# StreamReader/StreamWriter pair so no thread is pinned per attacker. Event
+# logging and payload writes touch the disk, so they run in the loop's
+# default executor instead of stalling every other connection.
+
+def _append_all(sdir, evs):
+    for ev in evs:
+        append_event(sdir, ev)
+
+
+async def _alog(sdir, *evs):
+    await asyncio.to_thread(_append_all, sdir, evs)
+
+
+async def async_chunked_send(writer, text, delay_min=0.02, delay_max=0.12, chunk_size=240, framer=None):
+    if not text:
+        return True
+    try:
+        b = text.encode(errors="ignore")
+        for i in range(0, len(b), chunk_size):
+            writer.write(b[i:i+chunk_size])
+            await writer.drain()
+            if framer is not None:
+                framer.sent(len(b[i:i+chunk_size]))
+            await asyncio.sleep(random.uniform(delay_min, delay_max))
+        return True
+    except (ConnectionResetError, BrokenPipeError, ConnectionAbortedError):
+        return False
+    except OSError as oe:
+        if getattr(oe, "winerror", None) == 10053 or getattr(oe, "errno", None) == errno.ECONNABORTED:
+            return False
+        raise
+
+async def async_start_fake_shell(reader, writer, sdir, framer=None):
+    start_time = now_ts()
+    await _alog(sdir, events.high_engagement("START", ts=start_time))
+    cwd = "/root"
+    last_activity = start_time
+
+    try:
+        if not await async_chunked_send(writer, "Welcome to Ubuntu 16.04.7 LTS (GNU/Linux 4.15.0-99)\n", framer=framer):
+            await _alog(sdir, events.high_engagement("CLIENT_CLOSED_BEFORE_START"), events.high_engagement("END"))
+            return
+        if not await async_chunked_send(writer, "root@fakehost:~# ", framer=framer):
+            await _alog(sdir, events.high_engagement("CLIENT_CLOSED_BEFORE_PROMPT"), events.high_engagement("END"))
+            return
+    except Exception as e:
+        await _alog(sdir, events.error("HIGH_ENGAGEMENT_ERROR_INIT", e), events.high_engagement("END"))
+        return
+
+    framer = framer or LineFramer()
+    # lines the orchestrator read past the handoff are handled before the first recv
+    handoff = framer.pending() > 0
+    upload = None
+    while True:
+        if handoff:
+            handoff = False
+        else:
+            # sleep until data arrives or the nearest deadline passes; no polling
+            now = now_ts()
+            session_left = MAX_SESSION_SECONDS - (now - start_time)
+            idle_left = INACTIVITY_TIMEOUT - (now - last_activity)
+            try:
+                chunk = await asyncio.wait_for(reader.read(4096), timeout=max(0.0, min(session_left, idle_left)))
+            except asyncio.TimeoutError:
+                if now_ts() - start_time > MAX_SESSION_SECONDS:
+                    await _alog(sdir, events.high_engagement("TIMEOUT_CLOSING"))
+                else:
+                    await _alog(sdir, events.high_engagement("INACTIVITY_CLOSING"))
+                break
+            except ConnectionResetError:
+                break
+            except OSError as oe:
+                if getattr(oe, "winerror", None) == 10053 or getattr(oe, "errno", None) == errno.ECONNABORTED:
+                    break
+                await _alog(sdir, events.error("HIGH_ENGAGEMENT_ERROR", oe))
+                break
+            if not chunk:
+                break
+            if not framer.push(chunk):
+                await _alog(sdir, events.error("CONN_BYTE_BUDGET", f"{framer.bytes_in} bytes received"))
+                break
+        try:
+            while framer.pending():
+                if upload is not None:
+                    last_activity = now_ts()
+                    rest = await asyncio.to_thread(upload.feed, framer.take())
+                    if rest is None:
+                        break
+                    await asyncio.to_thread(upload.finish)
+                    upload = None
+                    framer.unread(rest)
+                    if not await async_chunked_send(writer, "root@fakehost:~# ", framer=framer):
+                        await _alog(sdir, events.high_engagement("CLIENT_DISCONNECTED_AFTER_PROMPT"), events.high_engagement("END"))
+                        return
+                    continue
+                raw_cmd = framer.pop_line()
+                if raw_cmd is None:
+                    break
+                cmd_text = raw_cmd.decode(errors="ignore").strip()
+                last_activity = now_ts()
+                target = upload_target(cmd_text)
+                if target:
+                    await _alog(sdir, events.shell_cmd(cmd_text))
+                    upload = await asyncio.to_thread(Upload, sdir, target)
+                    continue
+                output, exit_requested = await asyncio.to_thread(shell_response, sdir, cwd, cmd_text)
+                if exit_requested:
+                    await async_chunked_send(writer, output, framer=framer)
+                    await _alog(sdir, events.high_engagement("ATTACKER_EXIT"))
+                    return
+
+                if not await async_chunked_send(writer, output, framer=framer):
+                    await _alog(sdir, events.high_engagement("CLIENT_DISCONNECTED"), events.high_engagement("END"))
+                    return
+
+                await asyncio.sleep(random.uniform(0.2, 0.7))
+                if not await async_chunked_send(writer, "root@fakehost:~# ", framer=framer):
+                    await _alog(sdir, events.high_engagement("CLIENT_DISCONNECTED_AFTER_PROMPT"), events.high_engagement("END"))
+                    return
         except Exception as e:
-            append_event(sdir, {"ts": now_ts(), "text": f"[HIGH_ENGAGEMENT_ERROR]={e}"})
+            await _alog(sdir, events.error("HIGH_ENGAGEMENT_ERROR", e))
             break
 
-    append_event(sdir, {"ts": now_ts(), "text": "[HIGH_ENGAGEMENT]=END"})
+    if upload is not None:
+        await asyncio.to_thread(upload.finish)  # keep what arrived before the connection ended
+    await _alog(sdir, events.high_engagement("END"))
     try:
-        chunked_send(conn, "\nConnection closed by remote host.\n")
+        await async_chunked_send(writer, "\nConnection closed by remote host.\n", framer=framer)
     except Exception:
         pass
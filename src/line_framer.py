@@ -0,0 +1,118 @@
+# src/line_framer.py
+"""Length-bounded line framing for attacker connections.
+
+The connection loops used to do `buffer += chunk` and `buffer.split(b"\\n")`
+on every recv, which copies the whole buffer each time (quadratic for long
+lines) and lets a client that never sends a newline grow it without limit.
+LineFramer keeps input in one bytearray and only scans bytes it has not
+looked at yet:
+
+    framer = LineFramer()
+    framer.push(chunk)
+    while (line := framer.pop_line()) is not None:
+        ...
+
+A line longer than max_line is cut at max_line bytes, returned once, and
+the rest of it is discarded up to the next newline. Once more than `budget`
+bytes have arrived on the connection `exhausted` is set and the caller
+should hang up. bytes_in/bytes_out count the session's traffic (callers
+report what they send with sent()).
+
+Limits come from HONEYPOT_MAX_LINE (default 8 KiB) and
+HONEYPOT_CONN_BYTE_BUDGET (default 32 MiB; 0 disables the budget).
+scripts/bench_line_framer.py compares it with the old split loop.
+"""
+import os
+
+MAX_LINE = int(os.environ.get("HONEYPOT_MAX_LINE", "8192"))
+CONN_BYTE_BUDGET = int(os.environ.get("HONEYPOT_CONN_BYTE_BUDGET", str(32 * 1024 * 1024)))
+
+
+class LineFramer:
+    __slots__ = ("max_line", "budget", "bytes_in", "bytes_out", "truncated_lines", "dropped",
+                 "exhausted", "_buf", "_scan", "_discarding")
+
+    def __init__(self, max_line=None, budget=None):
+        self.max_line = MAX_LINE if max_line is None else max_line
+        self.budget = CONN_BYTE_BUDGET if budget is None else budget
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.truncated_lines = 0
+        self.dropped = 0           # bytes discarded from over-long lines
+        self.exhausted = False
+        self._buf = bytearray()
+        self._scan = 0             # bytes of _buf already searched for a newline
+        self._discarding = False   # inside the tail of an over-long line
+
+    def push(self, data):
+        """Add received bytes; returns False once the connection's byte budget is used up."""
+        self.bytes_in += len(data)
+        if self.budget and self.bytes_in > self.budget:
+            self.exhausted = True
+        if self._discarding:
+            nl = data.find(b"\n")
+            if nl < 0:
+                self.dropped += len(data)
+                return not self.exhausted
+            self.dropped += nl
+            self._discarding = False
+            data = memoryview(data)[nl + 1:]
+        self._buf += data
+        return not self.exhausted
+
+    def pop_line(self):
+        """Next complete line without its newline (bytes), or None if none is buffered."""
+        buf = self._buf
+        nl = buf.find(b"\n", self._scan)
+        if nl < 0:
+            if len(buf) > self.max_line:
+                line = bytes(buf[:self.max_line])
+                self.dropped += len(buf) - self.max_line
+                buf.clear()
+                self._scan = 0
+                self._discarding = True
+                self.truncated_lines += 1
+                return line
+            self._scan = len(buf)
+            return None
+        if nl > self.max_line:
+            line = bytes(buf[:self.max_line])
+            self.dropped += nl - self.max_line
+            self.truncated_lines += 1
+        else:
+            line = bytes(buf[:nl])
+        # deleting from the front of a bytearray is amortised O(1)
+        del buf[:nl + 1]
+        self._scan = 0
+        return line
+
+    def lines(self, data):
+        """push(data) and return every complete line."""
+        self.push(data)
+        out = []
+        while (line := self.pop_line()) is not None:
+            out.append(line)
+        return out
+
+    def take(self):
+        """Remove and return whatever is buffered (raw bytes, e.g. for an upload)."""
+        data = bytes(self._buf)
+        self._buf.clear()
+        self._scan = 0
+        self._discarding = False
+        return data
+
+    def unread(self, data):
+        """Put bytes back in front of the buffer without counting them again."""
+        self._buf[:0] = data
+        self._scan = 0
+
+    def pending(self):
+        return len(self._buf)
+
+    def sent(self, n):
+        self.bytes_out += n
+
+    def stats(self):
+        return {"bytes_in": self.bytes_in, "bytes_out": self.bytes_out,
+                "truncated_lines": self.truncated_lines, "dropped_bytes": self.dropped}
@@ -0,0 +1,101 @@
+# src/micro_batcher.py
+"""Micro-batching of classifier calls across concurrent sessions.
+
+Each connection thread used to classify its own feature vector, so the
+model cost grew with the number of connections. MicroBatcher lets them
+share model passes: a thread submits its vector and waits on a future; one
+batcher thread takes the first pending vector, gathers whatever else arrives
+within HONEYPOT_CLASSIFY_BATCH_MS milliseconds (up to max_batch), classifies
+them together with classify_batch() and resolves every future:
+
+    batcher = get_classify_batcher()
+    label, conf = batcher.submit(features.as_dict()).result()
+
+A lone session waits at most the batching window; under load a batch costs
+about as much as a single vector. The threaded orchestrator uses it; the
+asyncio mode runs every session on one thread, so there is nothing to gather
+and it keeps calling classify() directly. HONEYPOT_CLASSIFY_BATCH_MS=0 turns
+batching off (get_classify_batcher() returns None).
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .classifier import classify_batch
+
+BATCH_MS = float(os.environ.get("HONEYPOT_CLASSIFY_BATCH_MS", "2"))
+MAX_BATCH = int(os.environ.get("HONEYPOT_CLASSIFY_MAX_BATCH", "256"))
+
+
+class MicroBatcher:
+    def __init__(self, fn, max_wait=BATCH_MS / 1000.0, max_batch=MAX_BATCH):
+        # fn(list of items) -> list of results in the same order
+        self.fn = fn
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self._q = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_seen = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, item):
+        fut = Future()
+        self._q.put((item, fut))
+        return fut
+
+    def _gather(self):
+        batch = [self._q.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            left = deadline - time.monotonic()
+            try:
+                batch.append(self._q.get(timeout=left) if left > 0 else self._q.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._gather()
+            try:
+                results = self.fn([item for item, _ in batch])
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), result in zip(batch, results):
+                fut.set_result(result)
+            self.batches += 1
+            self.items += len(batch)
+            self.max_seen = max(self.max_seen, len(batch))
+
+    def stats(self):
+        return {"batches": self.batches, "items": self.items, "max_batch": self.max_seen,
+                "mean_batch": round(self.items / self.batches, 2) if self.batches else 0.0}
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_classify_batcher():
+    """Return the process-wide classify batcher, or None if batching is off."""
+    global _batcher
+    if BATCH_MS <= 0:
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(classify_batch).start()
+    return _batcher
@@ -1,9 +1,43 @@
 # src/model.py
-import joblib, os
+"""Model files and the process-wide model registry.
+
+The classifier used to joblib.load the model when it was imported, so every
+process that imported the orchestrator (report subprocesses, test scripts)
+paid for it and kept a private copy. Now nothing is loaded until the first
+classification asks get_registry().current() for it:
+
+  - the flat forest (src/forest.py) is memory-mapped, so pre-forked workers
+    and every other process using the same file share its pages; the sklearn
+    pickle is only unpickled when there is no flat forest for it;
+  - each load gets a version ID, a hash of the model files, and the
+    registry keeps the last few versions with their load times;
+  - reload() loads the new files first and then swaps the current Model in
+    one assignment. Callers that already took current() finish with the
+    model they started with, so no session sees a half-loaded one. A load
+    that fails keeps the old model.
+
+Reloads happen on SIGHUP (the orchestrator installs the handler) and, every
+HONEYPOT_MODEL_WATCH seconds (5, 0 to disable), when the model files'
+size or mtime changed. The watch only stats the files on the timer wheel;
+the reload itself runs on a separate thread.
+"""
+import hashlib
+import os
+import threading
+import time
 from pathlib import Path
 
-MODEL_PATH = Path(__file__).resolve().parent / "models" / "rf_honeypot.pkl"
-LABEL_PATH = Path(__file__).resolve().parent / "models" / "label_map.pkl"
+import joblib
+
+from .forest import FlatForest
+
+MODEL_DIR = Path(os.environ.get("HONEYPOT_MODEL_DIR") or Path(__file__).resolve().parent / "models")
+MODEL_PATH = MODEL_DIR / "rf_honeypot.pkl"
+LABEL_PATH = MODEL_DIR / "label_map.pkl"
+# flat arrays of the same forest (src/forest.py), written next to the pickle
+FOREST_PATH = MODEL_DIR / "rf_honeypot_flat.joblib"
+WATCH_INTERVAL = float(os.environ.get("HONEYPOT_MODEL_WATCH", "5"))
+HISTORY = 10
 
 def load_model():
     if MODEL_PATH.exists() and LABEL_PATH.exists():
@@ -11,3 +45,182 @@ def load_model():
         lbl = joblib.load(LABEL_PATH)
         return clf, {v:k for k,v in lbl.items()}  # invert
     return None, None
+
+def load_forest():
+    """Return (FlatForest, inverted label map), or (None, None) if the model is
+    missing or not a tree ensemble. Maps the flat file when it is at least as
+    new as the pickle, else flattens the pickled model and writes the flat
+    file, so this and every later load share one mapping."""
+    if not LABEL_PATH.exists():
+        return None, None
+    inv = {v:k for k,v in joblib.load(LABEL_PATH).items()}
+    if FOREST_PATH.exists() and (not MODEL_PATH.exists() or
+                                 os.path.getmtime(FOREST_PATH) >= os.path.getmtime(MODEL_PATH)):
+        return FlatForest.load(FOREST_PATH), inv
+    if MODEL_PATH.exists():
+        try:
+            forest = FlatForest.from_sklearn(joblib.load(MODEL_PATH))
+        except TypeError:
+            return None, None
+        try:
+            forest.save(FOREST_PATH)
+        except OSError:
+            return forest, inv  # read-only model dir: keep the private copy
+        return FlatForest.load(FOREST_PATH), inv
+    return None, None
+
+
+def _stamp():
+    """(name, size, mtime_ns) of the model files that exist; cheap change check."""
+    out = []
+    for p in (MODEL_PATH, LABEL_PATH, FOREST_PATH):
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        out.append((p.name, st.st_size, st.st_mtime_ns))
+    return tuple(out)
+
+
+def _without_forest(stamp):
+    return [entry for entry in stamp if entry[0] != FOREST_PATH.name]
+
+
+def _version_of(paths):
+    h = hashlib.sha256()
+    for p in paths:
+        with open(p, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()[:12] if paths else "rules"
+
+
+class Model:
+    """One loaded model. forest is the flat forest, clf the sklearn model when
+    it could not be flattened; both None means the classifier's fallback rules."""
+    __slots__ = ("version", "forest", "clf", "inv_label_map", "loaded_at")
+
+    def __init__(self, version, forest=None, clf=None, inv_label_map=None):
+        self.version = version
+        self.forest = forest
+        self.clf = clf
+        self.inv_label_map = inv_label_map or {}
+        self.loaded_at = time.time()
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._current = None
+        self._stamp = None
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.history = []      # [(version, loaded_at)], newest last
+        self.reloads = 0
+        self.errors = 0
+        self._reloading = threading.Lock()
+
+    def current(self):
+        """The model to classify with; loaded on first use."""
+        model = self._current
+        if model is None:
+            with self._lock:
+                if self._current is None:
+                    self._swap(self._load())
+                model = self._current
+        return model
+
+    def on_swap(self, callback):
+        """Call callback(model) whenever a different model becomes current."""
+        self._listeners.append(callback)
+
+    def _load(self):
+        stamp = _stamp()
+        forest, inv = load_forest()
+        after = _stamp()
+        if _without_forest(after) == _without_forest(stamp):
+            # only the flat file we just wrote changed; that is not a new model
+            stamp = after
+        clf = None
+        if forest is None:
+            clf, inv = load_model()
+        used = [p for p in (MODEL_PATH, LABEL_PATH, FOREST_PATH) if p.exists()] if inv else []
+        self._stamp = stamp
+        return Model(_version_of(used), forest, clf, inv)
+
+    def _swap(self, model):
+        previous = self._current
+        self._current = model
+        self.history = (self.history + [(model.version, model.loaded_at)])[-HISTORY:]
+        if previous is not None and previous.version != model.version:
+            for callback in self._listeners:
+                callback(model)
+
+    def reload(self):
+        """Load the model files again and make them current. Returns the new
+        version, or None if loading failed (the old model stays current)."""
+        with self._lock:
+            try:
+                model = self._load()
+            except Exception:
+                self.errors += 1
+                return None
+            self._swap(model)
+            self.reloads += 1
+            return model.version
+
+    def changed(self):
+        """True if the model files changed since the last load (a few stat calls)."""
+        return self._current is not None and _stamp() != self._stamp
+
+    def check(self):
+        """Reload if the files changed since the last load; returns the new version or None."""
+        if not self.changed():
+            return None
+        return self.reload()
+
+    def _reload_in_background(self):
+        if not self._reloading.acquire(blocking=False):
+            return None  # one reload at a time
+        def run():
+            try:
+                self.reload()
+            finally:
+                self._reloading.release()
+        thread = threading.Thread(target=run, name="model-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def watch(self, wheel, interval=WATCH_INTERVAL):
+        """Compare the files' stamps every interval seconds on the timer wheel.
+
+        Only the stat calls run on the wheel; a reload (unpickling, hashing
+        the files) goes to its own thread so session deadlines are not held up."""
+        if interval <= 0:
+            return
+
+        def tick():
+            try:
+                if self.changed():
+                    self._reload_in_background()
+            finally:
+                wheel.schedule(interval, tick)
+
+        wheel.schedule(interval, tick)
+
+    def stats(self):
+        model = self._current
+        return {"version": model.version if model else None, "reloads": self.reloads,
+                "errors": self.errors, "history": list(self.history)}
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
@@ -3,25 +3,37 @@
 # Listens on 127.0.0.1:2222, records sessions under data/sessions,
 # classifies events, captures payload placeholders, and enters high-engagement mode.
 
+import asyncio
 import socket
 import threading
 import time
-import json
+import random
 import re
 import os
-import subprocess
 import logging
-import sys
+import signal
 from pathlib import Path
 
 from .session_manager import new_session, append_event, close_session
+from . import events
 from .interaction_engine import banner_for, fake_response_for
-from .feature_extractor import extract_features
-from .classifier import classify
-from .policy_engine import decide_engagement
+from .feature_extractor import FeatureState
+from .line_framer import LineFramer
+from .tarpit import Tarpit, TARPIT_INTERVAL
+from .admission import AdmissionControl, SHED, STATS_INTERVAL, stats_path
+from .classifier import classify, classify_cached, memo as classify_memo
+from .micro_batcher import get_classify_batcher
+from .model import get_registry
+from .policy_engine import HIGH, PolicyEngine
 from .evidence_store import save_payload_to_session_dir, save_session_data  # saver
+from .payload_store import get_payload_store
+from .high_engagement import INACTIVITY_TIMEOUT, MAX_SESSION_SECONDS, shutdown_read
+from .timer_wheel import SessionDeadlines, get_timer_wheel
+from .export_worker import ExportWorker
 
 HOST, PORT = "127.0.0.1", 2222
+# listen() backlog; the old value of 5 overflowed during scan bursts
+BACKLOG = 1024
 URL_RE = re.compile(r'(https?://[^\s]+)', re.IGNORECASE)
 
 
@@ -30,30 +42,10 @@ def extract_url(text):
     return m.group(1) if m else None
 
 
-def append_struct_event(sdir, evdict):
-    """
-    Append a structured event to session meta.
-    We store it as a special text event with a JSON payload for compatibility:
-       {"ts": timestamp, "text": "[STRUCT_EVENT]={...json...}"}
-    """
-    if "ts" not in evdict:
-        evdict["ts"] = time.time()
-    # ensure values are JSON-serializable
-    try:
-        json.dumps(evdict)
-    except Exception:
-        # fallback: convert problematic values to string
-        for k, v in list(evdict.items()):
-            try:
-                json.dumps(v)
-            except Exception:
-                evdict[k] = str(v)
-    append_event(sdir, {"ts": evdict["ts"], "text": f"[STRUCT_EVENT]={json.dumps(evdict)}"})
-
-
-# --- report generator spawn helper ----------------------------------
+# --- logging / output locations ---------------------------------------
 BASE_DIR = Path(__file__).resolve().parents[1]
 LOGS_DIR = BASE_DIR / "logs"
+OUT_DIR = Path(os.environ.get("HONEYPOT_REPORT_DIR") or BASE_DIR / "out")
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
 logger = logging.getLogger("orchestrator")
@@ -63,80 +55,56 @@ if not logger.handlers:
     logger.addHandler(handler)
     logger.setLevel(logging.INFO)
 
-
-def _spawn_report_generator(input_path: str, out_dir: str, max_retries: int = 2):
-    """
-    Spawn generate_reports.py in background using the current Python interpreter.
-    Writes logs to out_dir/report_run_<timestamp>.log and avoids concurrent runs with a lock file.
-    Non-blocking: starts thread and returns immediately.
-    """
-    def _runner():
-        lockfile = Path(out_dir) / ".generate_reports.lock"
-        try:
-            # simple lock to prevent parallel runs
-            if lockfile.exists():
-                logger.info("generate_reports: lockfile exists, skipping new run.")
-                return
-            lockfile.write_text(str(time.time()))
-            timestamp = int(time.time())
-            logfile = Path(out_dir) / f"report_run_{timestamp}.log"
-            cmd = [
-                sys.executable,
-                str(BASE_DIR / "generate_reports.py"),
-                "--input", str(input_path),
-                "--outdir", str(out_dir)
-            ]
-            logger.info("Starting generate_reports: %s", " ".join(cmd))
-            attempt = 0
-            while attempt <= max_retries:
-                attempt += 1
-                try:
-                    # run synchronously but in background thread so orchestrator keeps working
-                    with open(logfile, "ab") as lf:
-                        proc = subprocess.Popen(cmd, stdout=lf, stderr=lf)
-                        ret = proc.wait()
-                    if ret == 0:
-                        logger.info("generate_reports completed successfully (attempt %d). log=%s", attempt, logfile)
-                        break
-                    else:
-                        logger.warning("generate_reports returned code %s on attempt %d. Will retry.", ret, attempt)
-                        time.sleep(2)
-                except Exception as e:
-                    logger.exception("Exception running generate_reports (attempt %d): %s", attempt, e)
-                    time.sleep(2)
-            else:
-                logger.error("generate_reports failed after %d attempts. Check %s", max_retries, logfile)
-        finally:
-            try:
-                if lockfile.exists():
-                    lockfile.unlink()
-            except Exception:
-                pass
-
-    # Launch background thread
-    t = threading.Thread(target=_runner, daemon=True)
-    t.start()
-    logger.info("generate_reports background thread started.")
-
 # ---------------------------------------------------------------------
 
 
 class Orchestrator:
-    def __init__(self, host=HOST, port=PORT):
+    def __init__(self, host=HOST, port=PORT, mode="thread", backlog=BACKLOG, reuse_port=False, export=True):
         self.host = host
         self.port = port
+        # "thread" (one thread per connection), "async" (asyncio streams) or
+        # "tarpit" (slow pre-banner drip to every client from one writer thread)
+        self.mode = mode.lower()
+        self.backlog = backlog
+        # pre-forked workers (src/prefork.py) share the port with SO_REUSEPORT and
+        # leave exporting to the supervisor
+        self.reuse_port = reuse_port
         self._stop = threading.Event()
+        self.exporter = ExportWorker(OUT_DIR) if export else None
+        # per-IP token buckets and session caps, checked before a session exists
+        self.admission = AdmissionControl()
+        # rules plus a load-aware budget for the high-engagement shell
+        self.policy = PolicyEngine()
+        self._shed_tarpit = None
 
     def initialize_components(self):
         # Initialize or warm up any components here if needed
+        if self.exporter is not None:
+            self.exporter.start()
+        get_timer_wheel().schedule(STATS_INTERVAL, self._dump_admission)
+        # the model loads on first use; pick up retrained files without a restart
+        get_registry().watch(get_timer_wheel())
+        if hasattr(signal, "SIGHUP") and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, self._reload_model)
         print("[INFO] Orchestrator components initialized.")
 
-    def handle_client(self, conn, addr):
+    def _reload_model(self, *_):
+        # off the signal handler: the main thread may be in the middle of a classification
+        def reload():
+            version = get_registry().reload()
+            if version is None:
+                logger.error("Model reload failed; keeping version %s", get_registry().stats()["version"])
+            else:
+                logger.info("Model version %s loaded", version)
+
+        threading.Thread(target=reload, name="model-reload", daemon=True).start()
+
+    def _open_session(self, addr):
         sid, sdir = new_session(addr[0], addr[1])
-        
+
         # Get instance name from environment if running in VM
         instance_name = os.environ.get('HONEYPOT_INSTANCE_NAME', 'default')
-        
+
         # Create session metadata
         session_meta = {
             "session_id": sid,
@@ -145,170 +113,367 @@ class Orchestrator:
             "start_ts": time.time(),
             "instance": instance_name
         }
-        
+
         # Save initial session data to both JSON and CSV
         save_session_data(sdir, session_meta)
-        
+
         print(f"[INFO] Session {sid} started for {addr[0]}:{addr[1]} on instance {instance_name}")
+        return sid, sdir
+
+    def _record(self, sdir, features, event):
+        append_event(sdir, event)
+        features.update(event)
+
+    def _classify(self, features):
+        # connection threads share model passes through the micro-batcher;
+        # the asyncio loop has no concurrent callers to batch with
+        if self.mode == "thread":
+            batcher = get_classify_batcher()
+            if batcher is not None:
+                # a memo hit is a dict lookup; only misses wait out the batch window
+                cached = classify_cached(features)
+                return cached if cached is not None else batcher.submit(features).result()
+        return classify(features)
+
+    def process_line(self, sdir, addr, text, features, novel=False):
+        """Run the per-line pipeline (log, classify, capture payloads).
+
+        `features` is the session's FeatureState; every event logged here is
+        fed to it so classification never has to re-read the session.
+        Returns the engagement. Shared by both server modes;
+        the caller decides how to answer on its own transport. A HIGH result
+        holds a slot of the policy's budget: the caller hands off and calls
+        self.policy.release() when the shell ends.
+        """
+        # log raw input
+        self._record(sdir, features, events.input_line(text))
+
+        label, conf = self._classify(features.as_dict())
+        low = text.lower()
+        # detect download attempts (wget/curl heuristics)
+        download = ("wget " in low) or ("curl " in low)
+        eng = self.policy.decide(label, conf, novel=novel, download=download)
+        try:
+            if download:
+                vector = "download"
+            elif "ssh " in low or "scp " in low:
+                vector = "ssh"
+            else:
+                vector = "command"
+            # one typed event where the legacy format logged a [STRUCT_EVENT] and a [CLASS] line
+            self._record(sdir, features, events.classification(label, conf, eng, vector))
+
+            # downloads are always captured; the shell handoff is up to the budget
+            if download:
+                url = extract_url(text) or text.strip()
+                try:
+                    payload_bytes = (url or "").encode("utf-8", errors="ignore")
+                    meta_payload = save_payload_to_session_dir(
+                        sdir, payload_bytes, name=f"payload_handoff_{int(time.time())}.bin"
+                    )
+                    self._record(sdir, features, events.payload_saved(meta_payload))
+                except Exception as e:
+                    self._record(sdir, features, events.error("PAYLOAD_SAVE_FAILED", e))
+
+            if eng == HIGH:
+                self._record(sdir, features, events.action("HANDOFF_TO_HIGH_ENGAGEMENT"))
+            return eng
+        except BaseException:
+            # no handoff will happen, so give the HIGH slot back
+            if eng == HIGH:
+                self.policy.release()
+            raise
+
+    def _close_session(self, sdir, framer=None):
+        try:
+            close_session(sdir, framer.stats() if framer is not None else None)
+        except Exception:
+            pass
+        get_payload_store().end_session(Path(sdir).name)
+        # CSV export and report build happen in the export worker, batched
+        # with every other session that closes within the same window
+        if self.exporter is None:
+            return
+        try:
+            self.exporter.notify_closed(sdir)
+        except Exception:
+            logger.exception("Error while queueing session %s for export", sdir)
+
+    # --- admission control ------------------------------------------------
+
+    def _dump_admission(self, again=True):
+        try:
+            self.admission.dump(stats_path(OUT_DIR))
+        except OSError:
+            logger.exception("Could not write admission stats")
+        if again and not self._stop.is_set():
+            get_timer_wheel().schedule(STATS_INTERVAL, self._dump_admission)
+
+    def _shed(self, conn, addr):
+        """Turn away a connection that admission control rejected, without a session."""
+        if SHED == "tarpit":
+            if self._shed_tarpit is None:
+                self._shed_tarpit = Tarpit(None, None)
+            try:
+                self._shed_tarpit.accept(conn, addr)
+                return
+            except OSError:
+                pass
+        try:
+            conn.setblocking(False)
+            conn.send(banner_for("ssh").encode())
+        except OSError:
+            pass
+        conn.close()
+
+    async def _shed_async(self, writer):
+        try:
+            writer.write(banner_for("ssh").encode() if SHED != "tarpit" else b"%x\r\n" % random.getrandbits(32))
+            await writer.drain()
+            while SHED == "tarpit":
+                await asyncio.sleep(random.uniform(0.5, 1.5) * TARPIT_INTERVAL)
+                writer.write(b"%x\r\n" % random.getrandbits(32))
+                await writer.drain()
+        except (OSError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    def _admit(self, conn, addr):
+        """Admit a connection, or shed it and return False."""
+        if self.admission.admit(addr[0]) is not None:
+            self._shed(conn, addr)
+            return False
+        return True
+
+    def _handle_admitted(self, conn, addr):
+        try:
+            self.handle_client(conn, addr)
+        finally:
+            self.admission.release(addr[0])
+
+    async def _handle_async_admitted(self, reader, writer):
+        ip = writer.get_extra_info("peername")[0]
+        if self.admission.admit(ip) is not None:
+            await self._shed_async(writer)
+            return
+        try:
+            await self.handle_client_async(reader, writer)
+        finally:
+            self.admission.release(ip)
+
+    # --- threaded mode ----------------------------------------------------
+
+    def handle_client(self, conn, addr):
+        sid, sdir = self._open_session(addr)
+        novel = self.policy.observe(addr[0])
+        features = FeatureState()
+        framer = LineFramer()
+        # same limits as the async loop, enforced by the timer wheel instead of a recv timeout
+        deadlines = SessionDeadlines(lambda reason: shutdown_read(conn), MAX_SESSION_SECONDS, INACTIVITY_TIMEOUT)
         try:
             # send service banner (may fail if client disconnects quickly)
             try:
-                conn.sendall(banner_for("ssh").encode())
+                banner = banner_for("ssh").encode()
+                conn.sendall(banner)
+                framer.sent(len(banner))
             except Exception:
                 pass
 
-            buffer = b""
-            conn.settimeout(1.0)
-
             while True:
                 try:
                     chunk = conn.recv(4096)
                 except OSError:
-                    # socket error or timeout; break if connection dead
+                    # socket error; break if connection dead
                     break
                 if not chunk:
+                    if deadlines.expired:
+                        append_event(sdir, events.high_engagement(deadlines.expired))
+                    break
+                deadlines.touch()
+                if not framer.push(chunk):
+                    append_event(sdir, events.error("CONN_BYTE_BUDGET", f"{framer.bytes_in} bytes received"))
                     break
-                buffer += chunk
-                # Wait until we have a newline to process a command
-                if b"\n" not in buffer:
-                    continue
 
-                parts = buffer.split(b"\n")
+                handed_off = False
                 # process all complete lines
-                for raw_cmd in parts[:-1]:
-                    try:
-                        text = raw_cmd.decode(errors="ignore").strip()
-                    except Exception:
-                        text = ""
-                    # log raw input
-                    append_event(sdir, {"ts": time.time(), "text": text})
+                while (raw_cmd := framer.pop_line()) is not None:
+                    text = raw_cmd.decode(errors="ignore").strip()
+                    eng = self.process_line(sdir, addr, text, features, novel)
 
-                    # read current meta to extract features
-                    try:
-                        with open(Path(sdir) / "meta.json", "r", encoding="utf-8") as f:
-                            meta = json.load(f)
-                    except Exception:
-                        meta = {"events": []}
-
-                    features = extract_features(meta.get("events", []))
-                    label, conf = classify(features)
-                    eng = decide_engagement(label, conf)
-
-                    # Create structured classification event
-                    low = text.lower()
-                    if "wget " in low or "curl " in low:
-                        vector = "download"
-                    elif "ssh " in low or "scp " in low:
-                        vector = "ssh"
-                    else:
-                        vector = "command"
-
-                    struct_class = {
-                        "type": "classification",
-                        "label": label,
-                        "confidence": float(conf),
-                        "vector": vector,
-                        "src_ip": addr[0],
-                        "src_port": addr[1],
-                        "engagement": eng,
-                        "summary": f"{label.upper()} ({vector}) — conf {float(conf):.2f}, ENG={eng}"
-                    }
-                    append_struct_event(sdir, struct_class)
-
-                    # keep legacy class event for compatibility
-                    append_event(sdir, {"ts": time.time(), "text": f"[CLASS]={label}|{conf}|ENG={eng}"})
-
-                    # detect download attempts (wget/curl heuristics)
-                    forced_handoff = ("wget " in low) or ("curl " in low)
-
-                    if forced_handoff:
-                        url = extract_url(text) or text.strip()
-                        try:
-                            payload_bytes = (url or "").encode("utf-8", errors="ignore")
-                            meta_payload = save_payload_to_session_dir(
-                                sdir, payload_bytes, name=f"payload_handoff_{int(time.time())}.bin"
-                            )
-                            # structured payload event
-                            struct_payload = {
-                                "type": "payload_saved",
-                                "file": meta_payload.get("file"),
-                                "path": meta_payload.get("path"),
-                                "sha256": meta_payload.get("sha256"),
-                                "size": meta_payload.get("size"),
-                                "saved_ts": meta_payload.get("saved_ts"),
-                                "src_ip": addr[0],
-                                "src_port": addr[1],
-                                "summary": "Payload saved from suspected download"
-                            }
-                            append_struct_event(sdir, struct_payload)
-                            # legacy payload event
-                            append_event(sdir, {"ts": time.time(), "text": f"[PAYLOAD_SAVED]={meta_payload}"})
-                        except Exception as e:
-                            append_event(sdir, {"ts": time.time(), "text": f"[ERROR]=PAYLOAD_SAVE_FAILED|{e}"})
-
-                    # If high engagement is required or forced by download, hand off to high engagement
-                    if eng == "HIGH" or forced_handoff:
-                        append_event(sdir, {"ts": time.time(), "text": "[ACTION]=HANDOFF_TO_HIGH_ENGAGEMENT"})
+                    # the policy granted high engagement (downloads rank first): hand off
+                    if eng == HIGH:
+                        deadlines.cancel()
                         try:
-                            # high_engagement.start_fake_shell should take (conn, sdir) and manage the connection until done
+                            # start_fake_shell manages the connection until done; it keeps
+                            # reading from the same framer so buffered input is not lost
                             from .high_engagement import start_fake_shell
-                            start_fake_shell(conn, sdir)
+                            start_fake_shell(conn, sdir, framer)
                         except Exception as he:
-                            append_event(sdir, {"ts": time.time(), "text": f"[ERROR]=HIGH_ENGAGEMENT_FAILED|{he}"})
-                        # After high engagement we break the main loop — connection handled by high_engagement
+                            append_event(sdir, events.error("HIGH_ENGAGEMENT_FAILED", he))
+                        finally:
+                            self.policy.release()
+                        handed_off = True
+                        break
+                    # send regular fake response
+                    resp = fake_response_for(text + "\n").encode()
+                    try:
+                        conn.sendall(resp)
+                        framer.sent(len(resp))
+                    except Exception:
+                        # if send fails, stop processing
+                        handed_off = True
                         break
-                    else:
-                        # send regular fake response
-                        resp = fake_response_for(text + "\n")
-                        try:
-                            conn.sendall(resp.encode())
-                        except Exception:
-                            # if send fails, stop processing
-                            break
 
-                # keep the remaining partial line (if any) in buffer
-                buffer = parts[-1]
+                # After high engagement we leave the main loop — connection handled by high_engagement
+                if handed_off:
+                    break
 
         except Exception as e:
-            append_event(sdir, {"ts": time.time(), "text": f"[ERROR]={e}"})
+            append_event(sdir, events.error("", e))
         finally:
-            try:
-                close_session(sdir)
-            except Exception:
-                pass
-            # Export sessions to CSV and spawn headless report generator
-            try:
-                from .export_sessions import sessions_to_csv
-                out_dir = BASE_DIR / "out"
-                out_dir.mkdir(parents=True, exist_ok=True)
-
-                # Export all session meta.json files to a single CSV
-                sessions_dir = BASE_DIR / "data" / "sessions"
-                sessions_csv = out_dir / "sessions_latest.csv"
-                if sessions_to_csv(sessions_dir, sessions_csv):
-                    logger.info("Exported sessions to CSV: %s", sessions_csv)
-                    _spawn_report_generator(str(sessions_csv), str(out_dir))
-                else:
-                    logger.warning("No session data found to export")
-            except Exception:
-                logger.exception("Error while attempting to export sessions and spawn report generator")
+            deadlines.cancel()
+            self._close_session(sdir, framer)
             try:
                 conn.close()
             except Exception:
                 pass
             print(f"[INFO] Session {sid} closed.")
 
-    def start(self):
-        self.initialize_components()
-        print(f"[INFO] Starting honeypot on {self.host}:{self.port}")
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            s.bind((self.host, self.port))
-            s.listen(5)
+    def _listen(self):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        s.bind((self.host, self.port))
+        s.listen(self.backlog)
+        return s
+
+    def _serve_threaded(self):
+        with self._listen() as s:
             try:
                 while not self._stop.is_set():
                     conn, addr = s.accept()
-                    threading.Thread(target=self.handle_client, args=(conn, addr), daemon=True).start()
+                    if not self._admit(conn, addr):
+                        continue
+                    threading.Thread(target=self._handle_admitted, args=(conn, addr), daemon=True).start()
             except KeyboardInterrupt:
                 print("[INFO] Stopping server...")
                 self._stop.set()
+
+    # --- tarpit mode ------------------------------------------------------
+
+    def _serve_tarpit(self):
+        # connections never get a thread; the tarpit's paced writer drips to all of them
+        tarpit = Tarpit(self._open_session, self._close_session,
+                        release=lambda addr: self.admission.release(addr[0]))
+        with self._listen() as s:
+            try:
+                tarpit.serve(s, self._stop, admit=self._admit)
+            except KeyboardInterrupt:
+                print("[INFO] Stopping server...")
+                self._stop.set()
+
+    # --- asyncio mode -----------------------------------------------------
+
+    async def handle_client_async(self, reader, writer):
+        # session files, event logging and payload writes go to the default
+        # executor: on the loop they would stall every other connection
+        addr = writer.get_extra_info("peername")[:2]
+        sid, sdir = await asyncio.to_thread(self._open_session, addr)
+        novel = self.policy.observe(addr[0])
+        features = FeatureState()
+        framer = LineFramer()
+        try:
+            try:
+                banner = banner_for("ssh").encode()
+                writer.write(banner)
+                await writer.drain()
+                framer.sent(len(banner))
+            except Exception:
+                pass
+
+            handed_off = False
+            while not handed_off:
+                try:
+                    chunk = await asyncio.wait_for(reader.read(4096), timeout=INACTIVITY_TIMEOUT)
+                except (OSError, asyncio.TimeoutError):
+                    break
+                if not chunk:
+                    break
+                if not framer.push(chunk):
+                    await asyncio.to_thread(append_event, sdir,
+                                            events.error("CONN_BYTE_BUDGET", f"{framer.bytes_in} bytes received"))
+                    break
+
+                while (raw_cmd := framer.pop_line()) is not None:
+                    text = raw_cmd.decode(errors="ignore").strip()
+                    eng = await asyncio.to_thread(self.process_line, sdir, addr, text, features, novel)
+
+                    if eng == HIGH:
+                        try:
+                            from .high_engagement import async_start_fake_shell
+                            await async_start_fake_shell(reader, writer, sdir, framer)
+                        except Exception as he:
+                            await asyncio.to_thread(append_event, sdir, events.error("HIGH_ENGAGEMENT_FAILED", he))
+                        finally:
+                            self.policy.release()
+                        handed_off = True
+                        break
+                    try:
+                        resp = fake_response_for(text + "\n").encode()
+                        writer.write(resp)
+                        await writer.drain()
+                        framer.sent(len(resp))
+                    except Exception:
+                        handed_off = True
+                        break
+
+        except Exception as e:
+            await asyncio.to_thread(append_event, sdir, events.error("", e))
+        finally:
+            await asyncio.to_thread(self._close_session, sdir, framer)
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+            print(f"[INFO] Session {sid} closed.")
+
+    async def serve_async(self):
+        server = await asyncio.start_server(
+            self._handle_async_admitted, self.host, self.port,
+            backlog=self.backlog, reuse_address=True, reuse_port=self.reuse_port or None,
+        )
+        async with server:
+            await server.serve_forever()
+
+    def _serve_async(self):
+        try:
+            asyncio.run(self.serve_async())
+        except KeyboardInterrupt:
+            print("[INFO] Stopping server...")
+            self._stop.set()
+
+    def start(self):
+        self.initialize_components()
+        print(f"[INFO] Starting honeypot on {self.host}:{self.port} ({self.mode} mode)")
+        try:
+            if self.mode == "async":
+                self._serve_async()
+            elif self.mode == "tarpit":
+                self._serve_tarpit()
+            else:
+                self._serve_threaded()
+        finally:
+            # export whatever closed during the last window
+            if self.exporter is not None:
+                self.exporter.stop()
+            self._stop.set()
+            self._dump_admission(again=False)
+            logger.info("Timer wheel: %s", get_timer_wheel().stats())
+            logger.info("Policy engine: %s", self.policy.stats())
+            logger.info("Classify cache: %s", classify_memo.stats())
+            logger.info("Model registry: %s", get_registry().stats())
+            if self.mode == "thread" and get_classify_batcher() is not None:
+                logger.info("Classify batcher: %s", get_classify_batcher().stats())
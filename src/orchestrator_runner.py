@@ -7,7 +7,18 @@ import sys
 def main():
     host = os.environ.get("HONEYPOT_HOST", "127.0.0.1")
     port = int(os.environ.get("HONEYPOT_PORT", "2222"))
-    orch = Orchestrator(host=host, port=port)
+    # HONEYPOT_MODE=async serves every connection from one asyncio event loop;
+    # HONEYPOT_MODE=tarpit only holds clients with a slow pre-banner drip
+    mode = os.environ.get("HONEYPOT_MODE", "thread")
+    # HONEYPOT_WORKERS=N pre-forks N orchestrators sharing the port (src/prefork.py)
+    workers = int(os.environ.get("HONEYPOT_WORKERS", "1"))
+    if workers > 1:
+        from .prefork import Supervisor, supported
+        if supported():
+            Supervisor(host, port, mode=mode, workers=workers).run()
+            return
+        print("[WARN] HONEYPOT_WORKERS needs os.fork and SO_REUSEPORT; running a single process")
+    orch = Orchestrator(host=host, port=port, mode=mode)
     orch.start()
 
 if __name__ == "__main__":
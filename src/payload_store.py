@@ -0,0 +1,392 @@
+# src/payload_store.py
+"""Content-addressed, deduplicated payload storage.
+
+Captured payloads are stored once, by SHA-256, under HONEYPOT_PAYLOAD_DIR
+(default data/payloads):
+
+  payloads/ab/cd/abcd...<sha256>   the bytes, written once
+  payloads/_refs.jsonl             append-only reference log
+
+Each capture appends one reference line {"sha256", "session_id", "file",
+"size", "ts"}; release() appends {"op": "release", ...}. The log is replayed
+into an in-memory index (sha256 -> size, refcount, first_seen) on first use,
+so seen() answers "have we had this payload before" without touching disk
+and a repeat payload costs one hash plus one log line instead of another
+file. gc() removes blobs whose refcount dropped to zero.
+
+Uploads of unknown size go through a PayloadSink (open_sink()): chunks are
+written to a temp file while SHA-256, size and a byte histogram (for
+entropy) are updated, and finalize() renames the file into place, so memory
+stays at one chunk whatever the payload size. Every payload is capped at
+MAX_PAYLOAD_BYTES; on top of that a session may store SESSION_QUOTA bytes
+and the store as a whole GLOBAL_QUOTA bytes of unique blobs (0 disables
+either quota). Bytes past a limit are counted but dropped, and the payload
+is marked truncated. add() hashes a payload before charging any quota, so
+one that is already stored is referenced whole even when the quotas are
+used up.
+
+scripts/migrate_payloads_cas.py moves the per-session .bin files written by
+older versions into the store.
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from .session_manager import encode_event
+from .storage_writer import get_writer
+
+PAYLOAD_DIR = Path(os.environ.get("HONEYPOT_PAYLOAD_DIR") or Path(__file__).resolve().parents[1] / "data" / "payloads")
+REFS_FILE = "_refs.jsonl"
+TMP_DIR = "_tmp"
+
+MAX_PAYLOAD_BYTES = int(os.environ.get("HONEYPOT_MAX_PAYLOAD_BYTES", str(5 * 1024 * 1024)))  # 5 MB
+SESSION_QUOTA = int(os.environ.get("HONEYPOT_SESSION_PAYLOAD_QUOTA", str(20 * 1024 * 1024)))
+GLOBAL_QUOTA = int(os.environ.get("HONEYPOT_PAYLOAD_QUOTA", str(10 * 1024 ** 3)))
+
+
+def blob_path(sha256, root=None):
+    """payloads/ab/cd/<sha256> for a hex digest."""
+    return Path(root or PAYLOAD_DIR) / sha256[:2] / sha256[2:4] / sha256
+
+
+def entropy(histogram, size):
+    """Shannon entropy in bits per byte for a byte-value histogram."""
+    if not size:
+        return 0.0
+    return -sum(c / size * math.log2(c / size) for c in histogram.values() if c)
+
+
+class PayloadSink:
+    """Streams one payload to a temp file, hashing as it goes.
+
+    write() as chunks arrive, then finalize() (or abort()). `commit` is called
+    with (temp path, sha256, size) and returns the metadata dict; it owns the
+    temp file from then on.
+    """
+
+    def __init__(self, tmp_path, commit, reserve, release, name, note=None):
+        self.name = name
+        self.note = note
+        self.size = 0          # bytes kept
+        self.received = 0      # bytes offered, including dropped ones
+        self.truncated = False
+        self._path = Path(tmp_path)
+        self._commit = commit
+        self._reserve = reserve
+        self._release = release
+        self._sha = hashlib.sha256()
+        self._hist = Counter()
+        self._f = None
+        self._done = False
+
+    def write(self, chunk):
+        self.received += len(chunk)
+        n = self._reserve(len(chunk), self.size) if chunk else 0
+        if n < len(chunk):
+            self.truncated = True
+            chunk = chunk[:n]
+        if not chunk:
+            return 0
+        if self._f is None:
+            self._f = open(self._path, "wb")
+        self._f.write(chunk)
+        self._sha.update(chunk)
+        self._hist.update(chunk)
+        self.size += n
+        return n
+
+    def finalize(self):
+        """Move the payload into the store; returns its metadata."""
+        if self._done:
+            raise ValueError("payload sink already finalized")
+        self._done = True
+        if self._f is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            self._f = open(self._path, "wb")
+        self._f.close()
+        meta = self._commit(self._path, self._sha.hexdigest(), self.size)
+        meta.update(entropy=round(entropy(self._hist, self.size), 4), truncated=self.truncated,
+                    received=self.received)
+        if self.note is not None:
+            meta["note"] = self.note
+        return meta
+
+    def abort(self):
+        if self._done:
+            return
+        self._done = True
+        if self._f is not None:
+            self._f.close()
+        self._path.unlink(missing_ok=True)
+        self._release(self.size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+
+
+class PayloadStore:
+    def __init__(self, root=None):
+        self.root = Path(root or PAYLOAD_DIR)
+        self._lock = threading.Lock()
+        self._index = None
+        self._hits = 0
+        self._writes = 0
+        self._total = 0          # bytes of unique blobs still referenced
+        self._reserved = 0       # bytes held by sinks not yet finalized
+        self._session_bytes = {}  # bytes stored per open session by this process
+        self._dropped = 0
+
+    # --- index -----------------------------------------------------------
+
+    def _load(self):
+        """Replay _refs.jsonl into {sha256: [size, refcount, first_seen]}."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        index = {}
+        p = self.root / REFS_FILE
+        if p.exists():
+            with open(p, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line
+                    entry = index.get(rec.get("sha256"))
+                    if rec.get("op") == "release":
+                        if entry is not None:
+                            entry[1] = max(0, entry[1] - 1)
+                    elif entry is None:
+                        index[rec.get("sha256")] = [rec.get("size"), 1, rec.get("ts")]
+                    else:
+                        entry[1] += 1
+        return index
+
+    def _idx(self):
+        if self._index is None:
+            self._index = self._load()
+            self._total = sum(e[0] or 0 for e in self._index.values() if e[1] > 0)
+        return self._index
+
+    # --- quotas ----------------------------------------------------------
+
+    def _reserve(self, session_id, n, already):
+        """How many of n more bytes a payload of `already` bytes may keep."""
+        with self._lock:
+            self._idx()
+            allowed = min(n, MAX_PAYLOAD_BYTES - already)
+            if SESSION_QUOTA:
+                allowed = min(allowed, SESSION_QUOTA - self._session_bytes.get(session_id, 0))
+            if GLOBAL_QUOTA:
+                allowed = min(allowed, GLOBAL_QUOTA - self._total - self._reserved)
+            allowed = max(0, allowed)
+            self._reserved += allowed
+            self._session_bytes[session_id] = self._session_bytes.get(session_id, 0) + allowed
+            self._dropped += n - allowed
+            return allowed
+
+    def _unreserve(self, session_id, n):
+        with self._lock:
+            self._reserved -= n
+            self._session_bytes[session_id] = self._session_bytes.get(session_id, 0) - n
+
+    def end_session(self, session_id):
+        """Forget a closed session's quota usage."""
+        with self._lock:
+            self._session_bytes.pop(session_id, None)
+
+    def _log(self, record):
+        line = encode_event(record)
+        writer = get_writer()
+        if writer is not None:
+            writer.append(self.root / REFS_FILE, line)
+        else:
+            with open(self.root / REFS_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def seen(self, sha256):
+        """{"size", "refs", "first_seen"} for a known payload, else None."""
+        with self._lock:
+            entry = self._idx().get(sha256)
+        if entry is None:
+            return None
+        return {"size": entry[0], "refs": entry[1], "first_seen": entry[2]}
+
+    # --- write side ------------------------------------------------------
+
+    def add(self, data, session_id, name):
+        """Store payload bytes (once) and record a reference from session_id.
+
+        Returns {file, path, sha256, size, saved_ts, seen_before, truncated};
+        `path` is the blob's location, shared by every session that captured
+        it. Bytes over the size cap are dropped; so are bytes over a quota,
+        but a payload that is already stored only costs a reference and is
+        kept whole however much quota is left.
+        """
+        received = len(data)
+        data = data[:MAX_PAYLOAD_BYTES]
+        sha = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._dropped += received - len(data)
+            if self._known(sha):
+                meta = self._commit_ref(sha, len(data), session_id, name, True, reserved=False)
+                meta["truncated"] = len(data) < received
+                return meta
+        # a new blob: only now does it count against the quotas
+        n = self._reserve(session_id, len(data), 0)
+        if n < len(data):
+            data = data[:n]
+            sha = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            seen_before = self._known(sha)
+            if not seen_before:
+                self._write_blob(blob_path(sha, self.root), data)
+            meta = self._commit_ref(sha, len(data), session_id, name, seen_before)
+        meta["truncated"] = len(data) < received
+        return meta
+
+    def _known(self, sha):
+        """True if a blob for sha is stored and referenced; the caller holds the lock."""
+        entry = self._idx().get(sha)
+        return (entry is not None and entry[1] > 0) or blob_path(sha, self.root).exists()
+
+    def _commit_ref(self, sha, size, session_id, name, seen_before, reserved=True):
+        """Index and log one reference; the caller holds the lock and has stored the blob.
+
+        reserved: size bytes were reserved for it and are settled here."""
+        now = time.time()
+        entry = self._idx().get(sha)
+        if entry is None:
+            self._index[sha] = [size, 1, now]
+            self._total += size
+        else:
+            if entry[1] == 0:
+                self._total += size
+            entry[1] += 1
+        if reserved:
+            self._reserved -= size
+        if seen_before:
+            self._hits += 1
+        self._log({"sha256": sha, "session_id": session_id, "file": name, "size": size, "ts": now})
+        return {"file": name, "path": str(blob_path(sha, self.root).resolve()), "sha256": sha, "size": size,
+                "saved_ts": now, "seen_before": seen_before}
+
+    def _write_blob(self, p, data):
+        p.parent.mkdir(parents=True, exist_ok=True)
+        self._writes += 1
+        writer = get_writer()
+        if writer is not None:
+            writer.write_file(p, bytes(data))
+            return
+        tmp = p.with_name(p.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, p)
+
+    def open_sink(self, session_id, name, note=None):
+        """A PayloadSink whose finalize() stores the payload here."""
+        def commit(tmp, sha, size):
+            p = blob_path(sha, self.root)
+            with self._lock:
+                entry = self._idx().get(sha)
+                seen_before = (entry is not None and entry[1] > 0) or p.exists()
+                if seen_before:
+                    tmp.unlink()
+                else:
+                    p.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(tmp, p)
+                    self._writes += 1
+                return self._commit_ref(sha, size, session_id, name, seen_before)
+
+        return PayloadSink(self.tmp_path(), commit, lambda n, already: self._reserve(session_id, n, already),
+                           lambda n: self._unreserve(session_id, n), name, note)
+
+    def tmp_path(self):
+        """A fresh temp file path inside the store (same filesystem as the blobs)."""
+        d = self.root / TMP_DIR
+        d.mkdir(parents=True, exist_ok=True)
+        return d / f"{uuid.uuid4().hex}.part"
+
+    def add_file(self, src, session_id, name=None, move=False):
+        """Add an existing file (hashed in chunks); with move=True it is renamed into place.
+
+        Used by the migration, which takes files as they are: no size cap or quota.
+        """
+        src = Path(src)
+        h = hashlib.sha256()
+        with open(src, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        sha, size = h.hexdigest(), src.stat().st_size
+        p = blob_path(sha, self.root)
+        with self._lock:
+            self._idx()
+            seen_before = p.exists()
+            if not seen_before:
+                p.parent.mkdir(parents=True, exist_ok=True)
+                if move:
+                    os.replace(src, p)
+                else:
+                    tmp = p.with_name(p.name + ".tmp")
+                    shutil.copyfile(src, tmp)
+                    os.replace(tmp, p)
+                self._writes += 1
+            elif move:
+                src.unlink()
+            self._reserved += size  # _commit_ref settles it
+            return self._commit_ref(sha, size, session_id, name or src.name, seen_before)
+
+    def release(self, sha256, session_id):
+        """Drop one reference (e.g. when a session is deleted)."""
+        with self._lock:
+            entry = self._idx().get(sha256)
+            if entry is None or entry[1] == 0:
+                return
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._total -= entry[0] or 0
+            self._log({"op": "release", "sha256": sha256, "session_id": session_id, "ts": time.time()})
+
+    def gc(self):
+        """Delete blobs nobody references any more; returns how many."""
+        n = 0
+        with self._lock:
+            for sha, entry in list(self._idx().items()):
+                if entry[1] == 0:
+                    try:
+                        blob_path(sha, self.root).unlink()
+                        n += 1
+                    except FileNotFoundError:
+                        pass
+                    del self._index[sha]
+        return n
+
+    def stats(self):
+        with self._lock:
+            index = self._idx()
+            return {"blobs": len(index), "refs": sum(e[1] for e in index.values()),
+                    "dedup_hits": self._hits, "blob_writes": self._writes, "stored_bytes": self._total,
+                    "reserved_bytes": self._reserved, "dropped_bytes": self._dropped}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_payload_store():
+    """Process-wide PayloadStore rooted at PAYLOAD_DIR."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PayloadStore()
+    return _store
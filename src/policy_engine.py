@@ -1,7 +1,221 @@
-def decide_engagement(label, conf):
-    # Enable Claude Sonnet 3.5 for all clients by always returning HIGH engagement
-    return "HIGH"
-    # Original policy commented out:
-    # if label == "exploit" and conf > 0.8: return "HIGH"
-    # if label == "bruteforce": return "MEDIUM"
-    # return "LOW"
+# src/policy_engine.py
+"""Engagement policy: which sessions get the interactive shell.
+
+decide_engagement() used to return "HIGH" for everyone, so every attacker got
+start_fake_shell with its paced output and payload handling however busy the
+sensor was. PolicyEngine decides per line from two things:
+
+  - the rules, which map (label, confidence, novel source, download attempt)
+    to the engagement a session should get and its priority (0-3);
+  - a HIGH budget. At most HONEYPOT_HIGH_BUDGET sessions are in the shell at
+    once. Priority p may only fill SHARES[p] of it, so low-priority sessions
+    leave room for high-priority ones. The budget shrinks when the process
+    gets busy (its CPU share or the storage writer's queue depth passes the
+    HONEYPOT_POLICY_* thresholds).
+
+A session that is refused HIGH is degraded to MEDIUM; while the process is
+overloaded MEDIUM becomes LOW. Both keep the plain line-by-line responses.
+
+Rules are tried in order and the first match wins:
+
+    {"label": "exploit", "min_conf": 0.8, "novel": true, "download": false,
+     "engagement": "HIGH", "priority": 3}
+
+Every key except engagement is optional; a missing label matches any label.
+HONEYPOT_POLICY_RULES names a JSON file with a list of rules to use instead
+of DEFAULT_RULES. The rules are compiled once into a table indexed by label,
+confidence bucket (CONF_BUCKETS per 1.0), novelty and download, so a decision
+is one lookup plus a budget check. Load is sampled at most once per
+HONEYPOT_POLICY_SAMPLE seconds.
+
+A granted HIGH holds a budget slot until release() is called.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .storage_writer import get_writer
+from . import sqlite_store
+
+LOW, MEDIUM, HIGH = "LOW", "MEDIUM", "HIGH"
+ENGAGEMENTS = (LOW, MEDIUM, HIGH)
+MAX_PRIORITY = 3
+# share of the HIGH budget each priority may fill
+SHARES = (0.5, 0.7, 0.9, 1.0)
+# load levels and how much of the budget is left at each
+NORMAL, BUSY, OVERLOADED = 0, 1, 2
+LEVEL_NAMES = ("normal", "busy", "overloaded")
+BUDGET_SCALE = (1.0, 0.5, 0.2)
+CONF_BUCKETS = 20
+
+HIGH_BUDGET = int(os.environ.get("HONEYPOT_HIGH_BUDGET", "256"))
+CPU_BUSY = float(os.environ.get("HONEYPOT_POLICY_CPU_BUSY", "0.7"))
+CPU_OVERLOAD = float(os.environ.get("HONEYPOT_POLICY_CPU_OVERLOAD", "0.9"))
+QUEUE_BUSY = int(os.environ.get("HONEYPOT_POLICY_QUEUE_BUSY", "1000"))
+QUEUE_OVERLOAD = int(os.environ.get("HONEYPOT_POLICY_QUEUE_OVERLOAD", "5000"))
+SAMPLE_INTERVAL = float(os.environ.get("HONEYPOT_POLICY_SAMPLE", "1.0"))
+SEEN_TABLE = int(os.environ.get("HONEYPOT_POLICY_SEEN", "65536"))
+RULES_PATH = os.environ.get("HONEYPOT_POLICY_RULES")
+
+# With no load every session still gets the shell, as before; the priorities
+# decide who keeps it when the budget runs short.
+DEFAULT_RULES = (
+    {"download": True, "engagement": HIGH, "priority": 3},
+    {"label": "exploit", "min_conf": 0.8, "engagement": HIGH, "priority": 3},
+    {"label": "exploit", "engagement": HIGH, "priority": 2},
+    {"novel": True, "engagement": HIGH, "priority": 2},
+    {"label": "bruteforce", "engagement": HIGH, "priority": 1},
+    {"engagement": HIGH, "priority": 0},
+)
+
+
+def load_rules(path=None):
+    path = path or RULES_PATH
+    if not path:
+        return DEFAULT_RULES
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _bucket(conf):
+    # round first so 0.8 * 20 does not land in bucket 15
+    return min(CONF_BUCKETS, max(0, int(round(float(conf) * CONF_BUCKETS, 6))))
+
+
+def _cell(bucket, novel, download):
+    return (bucket * 2 + bool(novel)) * 2 + bool(download)
+
+
+def _matches(rule, label, bucket, novel, download):
+    if rule.get("label", label) != label:
+        return False
+    if bucket < _bucket(rule.get("min_conf", 0.0)):
+        return False
+    if "novel" in rule and bool(rule["novel"]) != novel:
+        return False
+    if "download" in rule and bool(rule["download"]) != download:
+        return False
+    return True
+
+
+def compile_rules(rules):
+    """Return {label: row} with the first matching (engagement, priority) for
+    every cell; the None row serves labels no rule names."""
+    for rule in rules:
+        if rule.get("engagement") not in ENGAGEMENTS:
+            raise ValueError(f"rule {rule!r}: engagement must be one of {ENGAGEMENTS}")
+        if not 0 <= int(rule.get("priority", 0)) <= MAX_PRIORITY:
+            raise ValueError(f"rule {rule!r}: priority must be 0-{MAX_PRIORITY}")
+    labels = [None] + sorted({r["label"] for r in rules if "label" in r})
+    table = {}
+    for label in labels:
+        row = [(LOW, 0)] * _cell(CONF_BUCKETS + 1, False, False)
+        for bucket in range(CONF_BUCKETS + 1):
+            for novel in (False, True):
+                for download in (False, True):
+                    for rule in rules:
+                        if _matches(rule, label, bucket, novel, download):
+                            row[_cell(bucket, novel, download)] = (rule["engagement"], int(rule.get("priority", 0)))
+                            break
+        table[label] = row
+    return table
+
+
+def _writer_queue_depth():
+    depth = 0
+    for pending in (get_writer(), sqlite_store.get_store()):
+        if pending is not None:
+            depth += pending.stats()["queue_depth"]
+    return depth
+
+
+class PolicyEngine:
+    def __init__(self, rules=None, budget=None, probe=None, clock=time.monotonic, sample_interval=None):
+        self.table = compile_rules(load_rules() if rules is None else rules)
+        self.budget = HIGH_BUDGET if budget is None else budget
+        # probe() -> (cpu share since the last call, writer queue depth)
+        self.probe = probe or self._probe_process
+        self.clock = clock
+        self.sample_interval = SAMPLE_INTERVAL if sample_interval is None else sample_interval
+        # slots per (load level, priority)
+        self.limits = [[int(self.budget * scale * share) for share in SHARES] for scale in BUDGET_SCALE]
+        self.active_high = 0
+        self.granted = 0
+        self.degraded = 0
+        self.level = NORMAL
+        self.cpu = 0.0
+        self.queue_depth = 0
+        self._sampled = None
+        self._cpu_mark = (time.monotonic(), time.process_time())
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def observe(self, ip):
+        """Record a new session from ip; True if the source has not been seen before."""
+        with self._lock:
+            if ip in self._seen:
+                self._seen.move_to_end(ip)
+                return False
+            if len(self._seen) >= SEEN_TABLE:
+                self._seen.popitem(last=False)
+            self._seen[ip] = True
+            return True
+
+    def wanted(self, label, conf, novel=False, download=False):
+        """(engagement, priority) the rules give, before the budget is applied."""
+        row = self.table.get(label) or self.table[None]
+        return row[_cell(_bucket(conf), novel, download)]
+
+    def decide(self, label, conf, novel=False, download=False):
+        eng, priority = self.wanted(label, conf, novel, download)
+        level = self._load_level()
+        if eng == HIGH:
+            with self._lock:
+                if self.active_high < self.limits[level][priority]:
+                    self.active_high += 1
+                    self.granted += 1
+                    return HIGH
+                self.degraded += 1
+            eng = MEDIUM
+        if eng == MEDIUM and level == OVERLOADED:
+            eng = LOW
+        return eng
+
+    def release(self):
+        """Give back the slot of a session that got HIGH."""
+        with self._lock:
+            if self.active_high:
+                self.active_high -= 1
+
+    def _probe_process(self):
+        now, cpu = time.monotonic(), time.process_time()
+        wall = now - self._cpu_mark[0]
+        share = (cpu - self._cpu_mark[1]) / wall if wall > 0 else 0.0
+        self._cpu_mark = (now, cpu)
+        return share, _writer_queue_depth()
+
+    def _load_level(self):
+        now = self.clock()
+        if self._sampled is not None and now - self._sampled < self.sample_interval:
+            return self.level
+        with self._lock:
+            if self._sampled is not None and now - self._sampled < self.sample_interval:
+                return self.level
+            self._sampled = now
+            self.cpu, self.queue_depth = self.probe()
+            if self.cpu >= CPU_OVERLOAD or self.queue_depth >= QUEUE_OVERLOAD:
+                self.level = OVERLOADED
+            elif self.cpu >= CPU_BUSY or self.queue_depth >= QUEUE_BUSY:
+                self.level = BUSY
+            else:
+                self.level = NORMAL
+            return self.level
+
+    def stats(self):
+        with self._lock:
+            return {"active_high": self.active_high, "granted": self.granted, "degraded": self.degraded,
+                    "load": LEVEL_NAMES[self.level], "cpu": round(self.cpu, 2), "queue_depth": self.queue_depth,
+                    "high_budget": self.limits[self.level][MAX_PRIORITY]}
+
@@ -0,0 +1,248 @@
+# src/prefork.py
+"""Pre-forked orchestrator workers sharing one port (HONEYPOT_WORKERS=N).
+
+One orchestrator process runs classification, JSON encoding and hashing on
+a single core whatever its thread count. With HONEYPOT_WORKERS > 1 the
+runner starts a Supervisor instead: it imports everything a worker needs
+(the classifier model, the fake filesystem, the payload store's reference
+index), freezes those objects out of the garbage collector so their pages
+stay shared copy-on-write, and forks N workers. Each worker is an ordinary
+Orchestrator that binds the same port with SO_REUSEPORT, so the kernel
+spreads incoming connections across them. Workers that die are restarted
+with a backoff. The supervisor itself starts no threads, so forking a
+replacement is safe. SIGHUP to the supervisor is passed on to the workers,
+which reload the model (src/model.py).
+
+Storage stays safe across workers:
+  - session IDs are ULIDs with 80 random bits, unique across processes;
+  - every session lives in one worker, and the shared manifest, event and
+    payload reference logs are append-only (one write per line);
+  - workers do not export. One more child tails the manifest (or, with the
+    SQLite backend, the sessions table) for closed sessions and runs the only
+    ExportWorker, so sessions_latest.csv has a single writer;
+  - each worker gets an equal share of the payload store's remaining global
+    quota. Deduplication still works across workers, but `seen_before` only
+    knows about payloads that the same worker has already stored.
+
+Needs os.fork and SO_REUSEPORT (Linux, BSD, macOS); elsewhere the runner
+falls back to a single process. scripts/bench_prefork.py measures sessions/sec
+for different worker counts.
+"""
+import gc
+import os
+import random
+import signal
+import socket
+import sqlite3
+import threading
+import time
+
+from .orchestrator import Orchestrator, OUT_DIR, logger
+from .model import get_registry
+from .export_worker import ExportWorker
+from . import payload_store, sqlite_store
+from .session_manager import BASE, IndexTail, index_path, rebuild_index
+from .storage_writer import get_writer
+
+WORKERS = int(os.environ.get("HONEYPOT_WORKERS", "1"))
+RESTART_BACKOFF = 1.0      # first restart delay; doubles while a worker keeps crashing
+MAX_BACKOFF = 30.0
+STABLE_SECONDS = 10.0      # a worker that ran this long resets its backoff
+REAP_POLL = 0.2            # how often other children are reaped while a restart waits
+POLL_INTERVAL = 1.0        # how often the export child looks for closed sessions
+EXPORT_SLOT = "export"
+
+
+def supported():
+    return hasattr(os, "fork") and hasattr(socket, "SO_REUSEPORT")
+
+
+class Supervisor:
+    def __init__(self, host, port, mode="thread", workers=WORKERS, target=None, backoff=RESTART_BACKOFF):
+        self.host = host
+        self.port = port
+        self.mode = mode
+        self.workers = workers
+        # target(slot) runs in the forked child; the default serves connections
+        self.target = target or self._serve
+        self.backoff = backoff
+        self.children = {}     # pid -> slot
+        self.restarts = 0
+        self._started = {}
+        self._delay = {}
+        self._restart_at = {}  # slot -> monotonic time its replacement is due
+        self._stop = threading.Event()
+
+    # --- before the fork ---------------------------------------------------
+
+    def preload(self):
+        """Load shared read-only state once so every worker inherits it."""
+        # importing the orchestrator already loaded FAKE_FILES; the model is
+        # memory-mapped, so workers share its pages
+        get_registry().current()
+        if sqlite_store.backend() == "sqlite":
+            # create the schema before the export child starts polling it
+            sqlite_store.init_db().close()
+        elif not index_path().exists():
+            rebuild_index()
+        payload_store.get_payload_store()
+        gc.collect()
+        # keep the collector from touching (and so copying) the inherited objects
+        gc.freeze()
+
+    # --- workers -----------------------------------------------------------
+
+    def _spawn(self, slot):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, _raise_interrupt)
+                signal.signal(signal.SIGINT, _raise_interrupt)
+                # the worker's orchestrator installs its own reload handler
+                signal.signal(signal.SIGHUP, signal.SIG_IGN)
+                random.seed()
+                (self._export if slot == EXPORT_SLOT else self.target)(slot)
+            except KeyboardInterrupt:
+                pass
+            except BaseException:
+                logger.exception("Worker %s crashed", slot)
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = slot
+        self._started[slot] = time.monotonic()
+        return pid
+
+    def _serve(self, slot):
+        os.environ["HONEYPOT_WORKER"] = str(slot)
+        if payload_store.GLOBAL_QUOTA:
+            stored = payload_store.get_payload_store().stats()["stored_bytes"]
+            payload_store.GLOBAL_QUOTA = stored + max(0, payload_store.GLOBAL_QUOTA - stored) // self.workers
+        try:
+            Orchestrator(self.host, self.port, self.mode, reuse_port=True, export=False).start()
+        finally:
+            # os._exit skips atexit, so flush queued session writes here
+            for pending in (get_writer(), sqlite_store.get_store()):
+                if pending is not None:
+                    pending.stop()
+
+    def _reap(self, pid, status):
+        slot = self.children.pop(pid)
+        if self._stop.is_set():
+            return
+        ran = time.monotonic() - self._started.get(slot, 0)
+        delay = self.backoff if ran >= STABLE_SECONDS else min(self._delay.get(slot, self.backoff / 2) * 2, MAX_BACKOFF)
+        self._delay[slot] = delay
+        logger.warning("Worker %s (pid %d) exited with status %s after %.1fs; restarting in %.1fs",
+                       slot, pid, status, ran, delay)
+        # the main loop restarts it when due and keeps reaping the others meanwhile
+        self._restart_at[slot] = time.monotonic() + delay
+
+    def _restart_due(self):
+        now = time.monotonic()
+        for slot, when in list(self._restart_at.items()):
+            if when <= now:
+                del self._restart_at[slot]
+                self.restarts += 1
+                self._spawn(slot)
+
+    # --- export of closed sessions -------------------------------------------
+
+    def _export(self, slot):
+        exporter = ExportWorker(OUT_DIR).start()
+        try:
+            for sdir in self._closed_sessions():
+                exporter.notify_closed(sdir)
+        finally:
+            exporter.stop()
+
+    def _closed_sessions(self):
+        """Yield the directory handle of every session closed from now on."""
+        if sqlite_store.backend() == "sqlite":
+            conn = None
+            since = time.time()
+            while True:
+                time.sleep(POLL_INTERVAL)
+                try:
+                    if conn is None:
+                        if not sqlite_store.DB_PATH.exists():
+                            continue  # no session written yet
+                        conn = sqlite_store.connect()
+                    closed = sqlite_store.closed_since(conn, since)
+                except sqlite3.OperationalError:
+                    continue  # schema not created yet
+                for rel, end_ts in closed:
+                    since = max(since, end_ts)
+                    yield BASE / rel
+        tail = IndexTail(BASE)
+        # sessions closed before this start were exported by the previous run
+        try:
+            tail.offset = index_path().stat().st_size
+        except OSError:
+            pass
+        while True:
+            time.sleep(POLL_INTERVAL)
+            for summary in tail.poll():
+                if summary.get("status") == "closed" and summary.get("dir"):
+                    yield BASE / summary["dir"]
+
+    # --- main loop -----------------------------------------------------------
+
+    def _forward_hup(self, *_):
+        for pid, slot in list(self.children.items()):
+            if slot != EXPORT_SLOT:
+                try:
+                    os.kill(pid, signal.SIGHUP)
+                except OSError:
+                    pass
+
+    def stop(self, *_):
+        self._stop.set()
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    def run(self, export=True):
+        self.preload()
+        for slot in range(self.workers):
+            self._spawn(slot)
+        if export:
+            self._spawn(EXPORT_SLOT)
+        print(f"[INFO] Started {self.workers} workers on {self.host}:{self.port} ({self.mode} mode)")
+        previous = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                previous[signum] = signal.signal(signum, self.stop)
+            previous[signal.SIGHUP] = signal.signal(signal.SIGHUP, self._forward_hup)
+        try:
+            while self.children or (self._restart_at and not self._stop.is_set()):
+                if self._stop.is_set() or not self._restart_at:
+                    # no restart pending: block until a child exits
+                    try:
+                        pid, status = os.wait()
+                    except ChildProcessError:
+                        break
+                else:
+                    self._restart_due()
+                    try:
+                        pid, status = os.waitpid(-1, os.WNOHANG)
+                    except ChildProcessError:
+                        pid = 0
+                    if not pid:
+                        if self._restart_at:
+                            left = min(self._restart_at.values()) - time.monotonic()
+                            self._stop.wait(min(max(0.0, left), REAP_POLL))
+                        continue
+                if pid in self.children:
+                    self._reap(pid, status)
+        finally:
+            self.stop()
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
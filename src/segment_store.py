@@ -0,0 +1,280 @@
+# src/segment_store.py
+"""Columnar Parquet segments for closed sessions, partitioned by day.
+
+Compaction turns closed sessions into two hive-partitioned Parquet tables
+under HONEYPOT_SEGMENT_DIR (default data/segments):
+
+  sessions/day=YYYY-MM-DD/part-*.parquet   one typed row per session
+  events/day=YYYY-MM-DD/part-*.parquet     one row per event (long form: type + text)
+
+Timestamps are int64 epoch milliseconds (UTC); `day` is the session's UTC
+start day. Readers pass the columns they need and a day window, so e.g. a
+30-day dashboard view opens only the last 30 partitions and only reads the
+projected column chunks.
+
+compact_new() follows the session manifest (data/sessions/_index.jsonl) from
+the byte offset saved in <segment dir>/_state.json and compacts the sessions
+closed since then. The export worker calls it after each batch when
+HONEYPOT_SEGMENTS=1; `python -m src.segment_store compact` does the same by
+hand (the first run backfills everything already closed). pyarrow is
+optional: without it available() is False and callers keep using the
+JSON/CSV paths.
+"""
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = ds = pq = None
+
+from .events import decode_all, text_of
+from .session_manager import BASE, load_session, read_index
+
+SEGMENT_DIR = Path(os.environ.get("HONEYPOT_SEGMENT_DIR") or Path(__file__).resolve().parents[1] / "data" / "segments")
+# once a day has this many part files they are merged into one
+MAX_PARTS_PER_DAY = int(os.environ.get("HONEYPOT_SEGMENT_MAX_PARTS", "32"))
+
+if pa is not None:
+    SESSIONS_SCHEMA = pa.schema([
+        ("session_id", pa.string()),
+        ("start_ts", pa.int64()),
+        ("end_ts", pa.int64()),
+        ("src_ip", pa.string()),
+        ("src_port", pa.int32()),
+        ("dst_port", pa.int32()),
+        ("attack_type", pa.string()),
+        ("instance", pa.string()),
+        ("success", pa.int8()),
+        ("event_count", pa.int32()),
+        ("bytes_in", pa.int64()),
+        ("bytes_out", pa.int64()),
+        ("username", pa.string()),
+        ("password", pa.string()),
+        ("transcript", pa.string()),
+    ])
+    EVENTS_SCHEMA = pa.schema([
+        ("session_id", pa.string()),
+        ("seq", pa.int32()),
+        ("ts", pa.int64()),
+        ("type", pa.string()),
+        ("text", pa.string()),
+    ])
+    _PARTITIONING = ds.partitioning(pa.schema([("day", pa.string())]), flavor="hive")
+    SCHEMAS = {"sessions": SESSIONS_SCHEMA, "events": EVENTS_SCHEMA}
+
+
+def available(segment_dir=None):
+    """True if pyarrow is installed and segments have been written to segment_dir."""
+    return pa is not None and (Path(segment_dir or SEGMENT_DIR) / "sessions").exists()
+
+
+def enabled():
+    return pa is not None and os.environ.get("HONEYPOT_SEGMENTS", "0").lower() in ("1", "true", "yes")
+
+
+def _ms(ts):
+    return int(float(ts) * 1000) if ts is not None else None
+
+
+def _day(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _int(v, default=None):
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return default
+
+
+def session_rows(meta):
+    """(session row, event rows) for one legacy meta dict."""
+    from .export_sessions import session_info
+    info = session_info(meta)
+    events = [e for e in meta.get("events", []) if isinstance(e, dict)]
+    times = [e["ts"] for e in events if isinstance(e.get("ts"), (int, float))]
+    start = _ms(meta.get("start_ts") or (min(times) if times else None)) or 0
+    end = _ms(max(times)) if times and meta.get("end_time") else None
+    sid = info["session_id"]
+    row = {
+        "session_id": sid,
+        "start_ts": start,
+        "end_ts": end,
+        "src_ip": info["src_ip"],
+        "src_port": _int(info["src_port"]),
+        "dst_port": _int(meta.get("dst_port", info["dst_port"])),
+        "attack_type": info["attack_type"],
+        "instance": meta.get("instance", "default"),
+        "success": _int(info["success"], 0),
+        "event_count": len(events),
+        "bytes_in": _int(info["bytes_in"], 0),
+        "bytes_out": _int(info["bytes_out"], 0),
+        "username": info["username"],
+        "password": info["password"],
+        "transcript": info["transcript"],
+    }
+    # typed form (legacy duplicates dropped) plus the one-line text for display/search
+    event_rows = [{"session_id": sid, "seq": i, "ts": _ms(e.get("ts")), "type": e["type"], "text": text_of(e)}
+                  for i, e in enumerate(decode_all(events))]
+    return row, event_rows
+
+
+def _write_part(segment_dir, table, day, rows):
+    part_dir = Path(segment_dir) / table / f"day={day}"
+    part_dir.mkdir(parents=True, exist_ok=True)
+    name = f"part-{int(time.time() * 1000)}-{os.getpid()}-{len(list(part_dir.glob('part-*.parquet')))}.parquet"
+    # dot-prefixed temp files are ignored by dataset discovery
+    tmp = part_dir / f".{name}.tmp"
+    pq.write_table(pa.Table.from_pylist(rows, schema=SCHEMAS[table]), tmp, compression="zstd")
+    os.replace(tmp, part_dir / name)
+    return part_dir
+
+
+def merge_parts(part_dir, table):
+    """Rewrite a day's part files as one file (keeps the file count per day bounded)."""
+    parts = sorted(Path(part_dir).glob("part-*.parquet"))
+    if len(parts) < 2:
+        return
+    merged = pa.concat_tables([pq.read_table(p, schema=SCHEMAS[table]) for p in parts])
+    name = f"part-{int(time.time() * 1000)}-{os.getpid()}-merged.parquet"
+    tmp = Path(part_dir) / f".{name}.tmp"
+    pq.write_table(merged, tmp, compression="zstd")
+    os.replace(tmp, Path(part_dir) / name)
+    for p in parts:
+        p.unlink()
+
+
+def compact(session_dirs, segment_dir=None, require_closed=True):
+    """Append the sessions in session_dirs to the segment tables.
+
+    With require_closed, sessions without an end_time (still open) are
+    skipped. Returns the number of sessions written. Each call writes at most
+    one part file per day and table.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required for the Parquet segment store")
+    segment_dir = Path(segment_dir or SEGMENT_DIR)
+    by_day = {}
+    for sdir in session_dirs:
+        try:
+            meta = load_session(sdir)
+        except (OSError, ValueError):
+            continue
+        if not isinstance(meta, dict) or (require_closed and not meta.get("end_time")):
+            continue
+        row, event_rows = session_rows(meta)
+        day = by_day.setdefault(_day(row["start_ts"]), {"sessions": [], "events": []})
+        day["sessions"].append(row)
+        day["events"].extend(event_rows)
+    n = 0
+    for day, tables in by_day.items():
+        for table, rows in tables.items():
+            if rows:
+                part_dir = _write_part(segment_dir, table, day, rows)
+                if len(list(part_dir.glob("part-*.parquet"))) >= MAX_PARTS_PER_DAY:
+                    merge_parts(part_dir, table)
+        n += len(tables["sessions"])
+    return n
+
+
+def _load_state(segment_dir):
+    try:
+        with open(Path(segment_dir) / "_state.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(segment_dir, state):
+    p = Path(segment_dir) / "_state.json"
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(".state.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, p)
+
+
+def compact_new(sessions_dir=None, segment_dir=None):
+    """Compact sessions closed in the manifest since the last call; returns how many.
+
+    A crash between writing the parts and saving the offset means the next
+    call writes those sessions again; readers that care can drop duplicate
+    session_ids.
+    """
+    sessions_dir = Path(sessions_dir or BASE)
+    segment_dir = Path(segment_dir or SEGMENT_DIR)
+    state = _load_state(segment_dir)
+    records, offset = read_index(sessions_dir, state.get("index_offset", 0))
+    closed = [sessions_dir / r.get("dir", r["session_id"]) for r in records
+              if r.get("status") == "closed" and r.get("session_id")]
+    n = compact(dict.fromkeys(closed), segment_dir, require_closed=False) if closed else 0
+    state.update(index_offset=offset, sessions=state.get("sessions", 0) + n, last_run_ts=time.time())
+    _save_state(segment_dir, state)
+    return n
+
+
+# ---------------------
+# Readers
+# ---------------------
+
+def day_filter(days=None, since=None, until=None):
+    """Partition filter on `day`: the last `days` UTC days, or an explicit since/until (YYYY-MM-DD)."""
+    if days is not None:
+        since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    flt = None
+    if since is not None:
+        flt = ds.field("day") >= since
+    if until is not None:
+        upper = ds.field("day") <= until
+        flt = upper if flt is None else flt & upper
+    return flt
+
+
+def read_table(table, columns=None, days=None, since=None, until=None, filter=None, segment_dir=None):
+    """Read a segment table as a pyarrow.Table.
+
+    Only the partitions inside the day window are opened and only `columns`
+    are decoded; `filter` is an extra pyarrow.dataset expression.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required for the Parquet segment store")
+    path = Path(segment_dir or SEGMENT_DIR) / table
+    if not path.exists():
+        return SCHEMAS[table].empty_table().select(columns or SCHEMAS[table].names)
+    dataset = ds.dataset(str(path), format="parquet", partitioning=_PARTITIONING)
+    flt = day_filter(days, since, until)
+    if filter is not None:
+        flt = filter if flt is None else flt & filter
+    return dataset.to_table(columns=columns, filter=flt)
+
+
+def sessions_frame(columns=None, days=None, since=None, until=None, segment_dir=None):
+    """Sessions as a DataFrame with a datetime `timestamp` column (from start_ts)."""
+    cols = None if columns is None else list(dict.fromkeys(list(columns) + ["start_ts"]))
+    df = read_table("sessions", cols, days, since, until, segment_dir=segment_dir).to_pandas()
+    df["timestamp"] = pd.to_datetime(df["start_ts"], unit="ms", utc=True).dt.tz_localize(None)
+    return df
+
+
+def events_frame(columns=None, days=None, since=None, until=None, session_ids=None, segment_dir=None):
+    flt = ds.field("session_id").isin(list(session_ids)) if session_ids is not None else None
+    return read_table("events", columns, days, since, until, flt, segment_dir).to_pandas()
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Compact closed sessions into day-partitioned Parquet segments.")
+    ap.add_argument("command", choices=["compact"])
+    ap.add_argument("--sessions-dir", default=None, help="sessions tree (default: data/sessions)")
+    ap.add_argument("--segment-dir", default=None)
+    args = ap.parse_args()
+    n = compact_new(args.sessions_dir, args.segment_dir)
+    print(f"Compacted {n} closed sessions into {args.segment_dir or SEGMENT_DIR}")
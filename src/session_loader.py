@@ -0,0 +1,202 @@
+# src/session_loader.py
+"""Parallel, column-oriented session loading shared by exporters and dashboards.
+
+load_columns() spreads session directories across a ProcessPoolExecutor in
+chunks; each worker turns its chunk into {column: [values]} with a row
+function, and the parent concatenates the column lists. The result can be
+handed to pd.DataFrame in one step instead of building one DataFrame per row.
+
+Row functions live in this module (or other importable src modules) so they
+can be pickled by reference under the spawn start method used on Windows.
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+
+from .events import EventType, decode_all, text_of
+from .session_manager import load_session
+
+# below this many sessions the pool's start-up cost outweighs the win
+MIN_PARALLEL = int(os.environ.get("HONEYPOT_LOADER_MIN_PARALLEL", "2000"))
+CHUNK_SIZE = 512
+
+SOURCE_COLUMN = "__source__"
+
+
+def _rows_to_columns(rows):
+    columns = {}
+    for n, row in enumerate(rows):
+        for k in row:
+            if k not in columns:
+                columns[k] = [None] * n
+        for k, col in columns.items():
+            col.append(row.get(k))
+    return columns
+
+
+def _parse_chunk(row_fn, session_dirs, with_source):
+    rows, errors = [], []
+    for sdir in session_dirs:
+        try:
+            out = row_fn(Path(sdir))
+        except Exception as e:
+            errors.append((str(sdir), str(e)))
+            continue
+        if out is None:
+            continue
+        for row in (out if isinstance(out, list) else [out]):
+            if with_source:
+                row[SOURCE_COLUMN] = Path(sdir).name
+            rows.append(row)
+    return _rows_to_columns(rows), len(rows), errors
+
+
+def _merge(parts):
+    merged, total = {}, 0
+    for columns, n, _ in parts:
+        for k in columns:
+            if k not in merged:
+                merged[k] = [None] * total
+        for k, col in merged.items():
+            col.extend(columns.get(k, [None] * n))
+        total += n
+    return merged
+
+
+def load_columns(session_dirs, row_fn, max_workers=None, chunk_size=CHUNK_SIZE,
+                 errors=None, with_source=False):
+    """Apply row_fn to every session dir and return a dict of column lists.
+
+    row_fn(sdir) returns a row dict, a list of row dicts, or None to skip.
+    Failures are skipped and, if `errors` is a list, recorded as (dir, message).
+    with_source=True adds a SOURCE_COLUMN holding each row's directory name.
+    """
+    session_dirs = [str(d) for d in session_dirs]
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers <= 1 or len(session_dirs) < MIN_PARALLEL:
+        parts = [_parse_chunk(row_fn, session_dirs, with_source)]
+    else:
+        chunks = [session_dirs[i:i + chunk_size] for i in range(0, len(session_dirs), chunk_size)]
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            parts = list(pool.map(_parse_chunk, repeat(row_fn), chunks, repeat(with_source)))
+    if errors is not None:
+        for _, _, errs in parts:
+            errors.extend(errs)
+    return _merge(parts)
+
+
+# ---------------------
+# Row functions
+# ---------------------
+
+def export_row(sdir):
+    """Row for out/sessions_latest.csv (see export_sessions)."""
+    from .export_sessions import extract_session_info
+    return extract_session_info(Path(sdir) / "meta.json")
+
+
+def extract_attack_type_from_meta(events_list):
+    """Attack type from the session's first classification event."""
+    if not isinstance(events_list, list):
+        return 'unknown'
+
+    for event in decode_all(events_list):
+        if event["type"] == EventType.CLASSIFICATION:
+            # [CLASS]=recon|0.6|ENG=HIGH and typed events both land here
+            m = re.match(r'[a-z_]+', str(event.get("label", "")).lower())
+            if m:
+                return m.group(0)
+    return 'unknown'
+
+
+def format_events_summary(events_list):
+    """Format events as readable summary lines."""
+    if not isinstance(events_list, list):
+        return 'No events'
+
+    summaries = []
+    for event in decode_all(events_list):
+        # Keep actionable events (attacker input), skip structural ones
+        if event["type"] == EventType.INPUT:
+            text = event.get("line", "").strip()
+        elif event["type"] == EventType.SHELL_CMD:
+            text = f"🔴 CMD: {event.get('cmd', '')}".strip()
+        else:
+            continue
+        if text:
+            summaries.append(text[:60])
+
+    return ' | '.join(summaries[:3]) if summaries else 'Connection events only'
+
+
+def _vm_row(obj):
+    events = obj.get('events', [])
+    # Normalize VM meta structure to standard honeypot schema
+    return {
+        'session_id': obj.get('session_id', ''),
+        'src_ip': obj.get('src_ip', '127.0.0.1'),
+        'src_port': obj.get('src_port', None),
+        'timestamp': obj.get('end_time') or obj.get('start_ts'),
+        'events': format_events_summary(events),  # Human-readable summary
+        'dst_port': 2222,  # VM honeypot default port
+        'instance': obj.get('instance', 'default'),
+        'attack_type': extract_attack_type_from_meta(events),  # Extract from [CLASS]=
+    }
+
+
+def vm_session_row(sdir):
+    """Dashboard row(s) used by app_auto.load_vm_sessions."""
+    if not (Path(sdir) / "meta.json").exists():
+        return None
+    obj = load_session(sdir)
+    if isinstance(obj, dict):
+        return _vm_row(obj)
+    if isinstance(obj, list):
+        # If it's a list of objects, normalize each
+        return [_vm_row(item) for item in obj if isinstance(item, dict)]
+    return None
+
+
+AGGREGATE_SKIP = {EventType.CLASSIFICATION, EventType.PAYLOAD_SAVED, EventType.ACTION, EventType.HIGH_ENGAGEMENT}
+
+
+def aggregate_row(sdir):
+    """Row for output/honeypot_sessions.csv (see scripts/aggregate.py)."""
+    import pandas as pd
+    if not (Path(sdir) / "meta.json").exists():
+        return None
+    m = load_session(sdir)
+
+    # Extract and normalize fields
+    session_id = m.get("session_id", "unknown")
+    src_ip = m.get("src_ip", "127.0.0.1")
+    src_port = int(m.get("src_port", 0)) if m.get("src_port") else None
+
+    # Get timestamp from end_time or first event
+    timestamp = m.get("end_time") or m.get("start_ts")
+    if isinstance(timestamp, (int, float)):
+        # Unix timestamp
+        timestamp = pd.Timestamp.fromtimestamp(timestamp).isoformat()
+
+    # Format events as readable summary
+    events_list = m.get("events", [])
+    events_text = " | ".join([
+        text[:60]
+        for text in (text_of(e) for e in decode_all(events_list) if e["type"] not in AGGREGATE_SKIP)
+        if text
+    ])[:500] if events_list else "No events"
+
+    return {
+        "session_id": session_id,
+        "src_ip": src_ip,
+        "src_port": src_port,
+        "timestamp": timestamp,
+        "events": events_text,
+        "dst_port": int(m.get("dst_port", 2222)),
+        "instance": m.get("instance", "default"),
+        "attack_type": extract_attack_type_from_meta(events_list),
+        "src_country": m.get("src_country", "LOCAL"),
+    }
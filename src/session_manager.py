@@ -1,22 +1,416 @@
-import json, time
+import json, time, os, threading
 from pathlib import Path
+from .storage_writer import get_writer
+from .sqlite_store import get_store
 
-BASE = Path(__file__).resolve().parents[1] / "data" / "sessions"
+# HONEYPOT_OUTPUT_DIR lets multi-instance deployments (and benchmarks) point
+# each orchestrator at its own sessions tree.
+BASE = Path(os.environ.get("HONEYPOT_OUTPUT_DIR") or Path(__file__).resolve().parents[1] / "data" / "sessions")
 BASE.mkdir(parents=True, exist_ok=True)
 
+# Session layout: meta.json is a small header (session_id, src_ip, end_time...)
+# and events.jsonl is the append-only event log, one JSON object per line.
+# Older sessions keep their events inline in meta.json; load_session reads both.
+META_FILE = "meta.json"
+EVENTS_FILE = "events.jsonl"
+
+# Flush the event log every N events (1 = every event is on disk immediately).
+EVENT_FLUSH_EVERY = int(os.environ.get("HONEYPOT_EVENT_FLUSH_EVERY", "1"))
+
+# Manifest: BASE/_index.jsonl gets an "open" record from new_session and a
+# "closed" record from close_session, so readers can list (or tail) sessions
+# without walking the tree. Records for one session_id are merged in order.
+INDEX_FILE = "_index.jsonl"
+INSTANCE = os.environ.get("HONEYPOT_INSTANCE_NAME", "default")
+
+# Session IDs are "S-" + a ULID (48-bit ms timestamp + 80 random bits in
+# Crockford base32): unique across processes and hosts, and they sort by start
+# time. Directories are sharded by UTC hour: BASE/YYYY/MM/DD/HH/S-<ulid>.
+# Flat BASE/S-<epoch> directories from older versions are still read; see
+# scripts/migrate_session_layout.py to move them into shards.
+SHARD_FORMAT = "%Y/%m/%d/%H"
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_RAND_BITS = 80
+_id_lock = threading.Lock()
+_last_id = [0, 0]  # ms, random part of the previous ID from this process
+
+
+def new_session_id(now=None):
+    """Return a new "S-<ulid>" ID; IDs from one process are strictly increasing."""
+    ms = int((time.time() if now is None else now) * 1000)
+    with _id_lock:
+        last_ms, last_rand = _last_id
+        if ms <= last_ms:
+            # same (or earlier, after a clock step) millisecond: bump the random part
+            ms, rand = last_ms, last_rand + 1
+            if rand >> _RAND_BITS:
+                ms, rand = ms + 1, 0
+        else:
+            rand = int.from_bytes(os.urandom(_RAND_BITS // 8), "big")
+        _last_id[:] = [ms, rand]
+    value = (ms << _RAND_BITS) | rand
+    chars = []
+    for _ in range(26):
+        chars.append(_CROCKFORD[value & 31])
+        value >>= 5
+    return "S-" + "".join(reversed(chars))
+
+
+def shard_for(ts):
+    """Relative shard directory ("YYYY/MM/DD/HH", UTC) for a start timestamp."""
+    return time.strftime(SHARD_FORMAT, time.gmtime(ts))
+
+
+def find_session_dirs(base=None):
+    """Walk base for session directories in both the flat and the sharded layout.
+
+    This is the slow path (one directory walk); normal readers use session_dirs().
+    """
+    base = Path(base or BASE)
+    for pattern in (f"*/{META_FILE}", f"[0-9][0-9][0-9][0-9]/*/*/*/*/{META_FILE}"):
+        for meta_file in base.glob(pattern):
+            yield meta_file.parent
+
+
+def _rel_dir(sdir, base=None):
+    try:
+        return Path(sdir).relative_to(base or BASE).as_posix()
+    except ValueError:
+        return Path(sdir).name
+
+
+def encode_event(event):
+    return json.dumps(event, separators=(",", ":"))
+
+
+class EventLog:
+    """Append-only writer for one session's events.jsonl."""
+
+    def __init__(self, path, flush_every=EVENT_FLUSH_EVERY):
+        self.path = Path(path)
+        self.flush_every = max(1, flush_every)
+        self.count = 0
+        self._pending = 0
+        self._f = open(self.path, "a", encoding="utf-8")
+
+    def append(self, event):
+        self.append_line(encode_event(event))
+
+    def append_line(self, line):
+        # one write() per event; a crash can only ever tear the last line
+        self._f.write(line + "\n")
+        self.count += 1
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self._f.flush()
+        self._pending = 0
+
+    def close(self):
+        if not self._f.closed:
+            self._f.flush()
+            self._f.close()
+
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def _event_log(sdir):
+    key = str(sdir)
+    with _logs_lock:
+        log = _logs.get(key)
+        if log is None:
+            log = _logs[key] = EventLog(Path(sdir) / EVENTS_FILE)
+        return log
+
+
+def _write_header(sdir, meta):
+    p = Path(sdir) / META_FILE
+    tmp = p.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, p)
+
+
+def _read_json(p):
+    with open(p, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _stamp_end_time(sdir, end_time, stats=None):
+    p = Path(sdir) / META_FILE
+    if p.exists():
+        meta = _read_json(p)
+        meta["end_time"] = end_time
+        meta.update(stats or {})
+        _write_header(sdir, meta)
+
+
+# ---------------------
+# Manifest index
+# ---------------------
+
+_index_lock = threading.Lock()
+_index_ready = set()
+# per-session [event count, events.jsonl bytes] for the "closed" record
+_event_stats = {}
+
+
+def index_path(base=None):
+    return Path(base or BASE) / INDEX_FILE
+
+
+def _ensure_index(base):
+    """Backfill the manifest from disk the first time this process writes to it."""
+    key = str(base)
+    if key in _index_ready:
+        return
+    if not index_path(base).exists():
+        rebuild_index(base)
+    _index_ready.add(key)
+
+
+def _index_append(record):
+    line = encode_event(record)
+    writer = get_writer()
+    with _index_lock:
+        _ensure_index(BASE)
+        if writer is not None:
+            writer.append(index_path(), line)
+        else:
+            with open(index_path(), "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def _scan_record(sdir, base):
+    """Manifest records for a session already on disk (used by rebuild_index)."""
+    meta = load_session(sdir)
+    rel = _rel_dir(sdir, base)
+    if not isinstance(meta, dict):
+        # old list-shaped exports: index the directory, readers parse it as before
+        return [{"session_id": sdir.name, "dir": rel, "status": "open",
+                 "start_ts": (sdir / META_FILE).stat().st_mtime}]
+    events = meta.get("events", [])
+    p = sdir / EVENTS_FILE
+    start_ts = events[0].get("ts") if events and isinstance(events[0], dict) else None
+    opened = {"session_id": meta.get("session_id", sdir.name), "dir": rel, "status": "open",
+              "start_ts": start_ts or (sdir / META_FILE).stat().st_mtime,
+              "src_ip": meta.get("src_ip"), "src_port": meta.get("src_port"),
+              "instance": meta.get("instance", INSTANCE)}
+    if "end_time" not in meta:
+        return [opened]
+    closed = {"session_id": opened["session_id"], "dir": rel, "status": "closed",
+              "end_time": meta["end_time"], "events": len(events),
+              "events_bytes": p.stat().st_size if p.exists() else 0}
+    return [opened, closed]
+
+
+def rebuild_index(base=None):
+    """Regenerate the manifest from the session directories under base.
+
+    Only needed once for trees written before the manifest existed (or after
+    sessions were copied in by hand); run it while no orchestrator is writing.
+    Returns the number of sessions indexed.
+    """
+    base = Path(base or BASE)
+    records = []
+    for sdir in find_session_dirs(base):
+        try:
+            recs = _scan_record(sdir, base)
+        except (OSError, ValueError):
+            continue
+        records.append(recs)
+    records.sort(key=lambda recs: recs[0]["start_ts"] or 0)
+    p = index_path(base)
+    tmp = p.with_suffix(".jsonl.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for recs in records:
+            for r in recs:
+                f.write(encode_event(r) + "\n")
+    os.replace(tmp, p)
+    return len(records)
+
+
+def read_index(base=None, offset=0, limit=None):
+    """Return (records, next_offset) from the manifest starting at byte offset.
+
+    Only complete lines are returned, so next_offset can be passed back in to
+    page through the file (with limit) or to pick up just the new entries.
+    """
+    records = []
+    try:
+        f = open(index_path(base), "rb")
+    except FileNotFoundError:
+        return records, offset
+    with f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n") or (limit is not None and len(records) >= limit):
+                break
+            offset += len(raw)
+            try:
+                records.append(json.loads(raw))
+            except ValueError:
+                continue
+    return records, offset
+
+
+class IndexTail:
+    """Folds the manifest into {session_id: summary}, reading only new entries per poll()."""
+
+    def __init__(self, base=None):
+        self.base = Path(base or BASE)
+        self.offset = 0
+        self.sessions = {}
+        self._lock = threading.Lock()
+
+    def poll(self, limit=None):
+        """Read entries appended since the last poll; returns the summaries they touched."""
+        with self._lock:
+            records, self.offset = read_index(self.base, self.offset, limit)
+            touched = []
+            for r in records:
+                sid = r.get("session_id")
+                if not sid:
+                    continue
+                summary = self.sessions.setdefault(sid, {})
+                summary.update(r)
+                touched.append(summary)
+            return touched
+
+    def session_dirs(self, newest_first=False):
+        dirs = [self.base / s.get("dir", sid) for sid, s in self.sessions.items()]
+        return dirs[::-1] if newest_first else dirs
+
+
+def list_sessions(base=None):
+    """Session summaries in start order, from the manifest.
+
+    Trees without a manifest fall back to a directory scan (mtime order) that
+    only yields session_id/dir; run scripts/rebuild_session_index.py to index them.
+    """
+    base = Path(base or BASE)
+    if not index_path(base).exists():
+        dirs = sorted(find_session_dirs(base), key=lambda d: d.stat().st_mtime)
+        return [{"session_id": d.name, "dir": _rel_dir(d, base)} for d in dirs]
+    tail = IndexTail(base)
+    tail.poll()
+    return list(tail.sessions.values())
+
+
+def session_dirs(base=None, newest_first=False):
+    """Session directories in start order (newest first if asked), without globbing."""
+    base = Path(base or BASE)
+    dirs = [base / s.get("dir", s["session_id"]) for s in list_sessions(base)]
+    return dirs[::-1] if newest_first else dirs
+
+
+# With HONEYPOT_STORAGE_WRITER=1 the writes below are queued to the shared
+# StorageWriter thread; otherwise they happen synchronously in the caller.
+# With HONEYPOT_STORAGE_BACKEND=sqlite they go to the SQLite store instead
+# and no session directory is created (sdir is only a handle: its name is
+# the session_id).
+
 def new_session(src_ip, src_port):
-    sid = f"S-{int(time.time())}"
-    sdir = BASE / sid; sdir.mkdir(exist_ok=True)
-    meta = {"session_id": sid, "src_ip": src_ip, "src_port": src_port, "events": []}
-    with open(sdir / "meta.json", "w") as f: json.dump(meta, f, indent=2)
+    now = time.time()
+    sid = new_session_id(now)
+    rel = f"{shard_for(now)}/{sid}"
+    sdir = BASE / rel
+    _event_stats[str(sdir)] = [0, 0]
+    store = get_store()
+    if store is not None:
+        store.open_session(sid, rel, src_ip, src_port, INSTANCE, now)
+        return sid, sdir
+    with _index_lock:
+        _ensure_index(BASE)  # backfill before this session's dir exists
+    sdir.mkdir(parents=True)
+    header = {"session_id": sid, "src_ip": src_ip, "src_port": src_port}
+    writer = get_writer()
+    if writer is not None:
+        writer.write_file(sdir / META_FILE, json.dumps(header, indent=2))
+    else:
+        _write_header(sdir, header)
+        _event_log(sdir)
+    _index_append({"session_id": sid, "dir": rel, "status": "open", "start_ts": now,
+                   "src_ip": src_ip, "src_port": src_port, "instance": INSTANCE})
     return sid, sdir
 
 def append_event(sdir, event):
-    p = Path(sdir) / "meta.json"
-    meta = json.load(open(p)) if p.exists() else {"events": []}
-    meta.setdefault("events", []).append(event)
-    json.dump(meta, open(p, "w"), indent=2)
-
-def close_session(sdir):
-    p = Path(sdir) / "meta.json"
-    if p.exists(): meta = json.load(open(p)); meta["end_time"] = time.ctime(); json.dump(meta, open(p, "w"), indent=2)
+    store = get_store()
+    if store is not None:
+        store.append_event(Path(sdir).name, event)
+        stats = _event_stats.get(str(sdir))
+        if stats is not None:
+            stats[0] += 1
+        return
+    line = encode_event(event)
+    writer = get_writer()
+    if writer is not None:
+        writer.append(Path(sdir) / EVENTS_FILE, line)
+    else:
+        _event_log(sdir).append_line(line)
+    # only the session's own connection thread appends, so no lock needed
+    stats = _event_stats.get(str(sdir))
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += len(line) + 1
+
+def close_session(sdir, stats=None):
+    """Mark a session closed; `stats` (e.g. LineFramer.stats()) is merged into its header."""
+    end_time = time.ctime()
+    count, nbytes = _event_stats.pop(str(sdir), (None, None))
+    store = get_store()
+    if store is not None:
+        store.close_session(Path(sdir).name, time.time(), end_time, count)
+        return
+    _index_append({"session_id": Path(sdir).name, "dir": _rel_dir(sdir), "status": "closed",
+                   "end_time": end_time, "events": count, "events_bytes": nbytes})
+    writer = get_writer()
+    if writer is not None:
+        writer.close_file(Path(sdir) / EVENTS_FILE)
+        writer.call(_stamp_end_time, sdir, end_time, stats)
+        return
+    with _logs_lock:
+        log = _logs.pop(str(sdir), None)
+    if log is not None:
+        log.close()
+    _stamp_end_time(sdir, end_time, stats)
+
+
+def read_events(sdir):
+    """Return the events recorded in sdir/events.jsonl (skips a torn last line)."""
+    p = Path(sdir) / EVENTS_FILE
+    events = []
+    if not p.exists():
+        return events
+    with open(p, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+    return events
+
+
+def load_session(sdir):
+    """Load a session in either layout and return the legacy meta dict.
+
+    Inline "events" from an old meta.json come first, followed by anything in
+    events.jsonl, so callers always see a single {"events": [...]} list.
+    Non-dict meta.json content (old list-shaped exports) is returned unchanged.
+    """
+    sdir = Path(sdir)
+    p = sdir / META_FILE
+    meta = _read_json(p) if p.exists() else {}
+    if not isinstance(meta, dict):
+        return meta
+    events = list(meta.get("events", []))
+    events.extend(read_events(sdir))
+    meta["events"] = events
+    return meta
@@ -0,0 +1,393 @@
+# src/sqlite_store.py
+"""Optional SQLite (WAL) backend for sessions, events and payloads.
+
+With HONEYPOT_STORAGE_BACKEND=sqlite, session_manager and evidence_store write
+everything to one database (HONEYPOT_SQLITE_PATH, default data/honeypot.db)
+instead of a directory per session:
+
+  sessions  one row per session (src_ip, start/end, attack_type, event_count)
+  events    one row per logged event (session_id, ts, type, text); for typed
+            events (src.events) `text` holds the JSON of the type's fields
+  payloads  captured payload bytes plus their metadata
+
+Writes go through one SqliteStore thread that commits queued statements in
+batches (up to `batch` statements or `flush_ms` milliseconds per
+transaction), the same group-commit scheme as storage_writer. If a batch
+fails, it is retried one statement per transaction, so one bad row only loses
+itself and not the other sessions' events committed with it. WAL mode lets
+the dashboard and exporters read while the orchestrator writes; they open
+their own connections with connect() and use the query helpers below.
+
+scripts/import_sessions_sqlite.py loads an existing JSON tree, and
+scripts/bench_sqlite_store.py compares throughput with the file layout.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .events import EventType, decode, fields
+
+logger = logging.getLogger("orchestrator")
+
+DB_PATH = Path(os.environ.get("HONEYPOT_SQLITE_PATH") or Path(__file__).resolve().parents[1] / "data" / "honeypot.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id  TEXT PRIMARY KEY,
+    dir         TEXT,
+    src_ip      TEXT,
+    src_port    INTEGER,
+    instance    TEXT,
+    start_ts    REAL,
+    end_ts      REAL,
+    end_time    TEXT,
+    attack_type TEXT,
+    event_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS events (
+    id          INTEGER PRIMARY KEY,
+    session_id  TEXT NOT NULL,
+    ts          REAL,
+    type        TEXT,
+    text        TEXT
+);
+CREATE TABLE IF NOT EXISTS payloads (
+    id          INTEGER PRIMARY KEY,
+    session_id  TEXT NOT NULL,
+    file        TEXT,
+    sha256      TEXT,
+    size        INTEGER,
+    saved_ts    REAL,
+    data        BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_src_ip ON sessions(src_ip);
+CREATE INDEX IF NOT EXISTS idx_sessions_start_ts ON sessions(start_ts);
+CREATE INDEX IF NOT EXISTS idx_sessions_attack_type ON sessions(attack_type);
+CREATE INDEX IF NOT EXISTS idx_events_session ON events(session_id, id);
+CREATE INDEX IF NOT EXISTS idx_payloads_sha256 ON payloads(sha256);
+"""
+
+SESSION_COLUMNS = ("dir", "src_ip", "src_port", "instance", "start_ts", "end_ts", "end_time",
+                   "attack_type", "event_count")
+
+_INSERT_EVENT = "INSERT INTO events(session_id, ts, type, text) VALUES (?, ?, ?, ?)"
+_UPSERT_SESSION = (
+    "INSERT INTO sessions(session_id, dir, src_ip, src_port, instance, start_ts) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(session_id) DO UPDATE SET dir=excluded.dir, src_ip=excluded.src_ip, "
+    "src_port=excluded.src_port, instance=excluded.instance, start_ts=excluded.start_ts"
+)
+_SET_ATTACK_TYPE = "UPDATE sessions SET attack_type = ? WHERE session_id = ? AND attack_type IS NULL"
+_CLOSE_SESSION = "UPDATE sessions SET end_ts = ?, end_time = ?, event_count = COALESCE(?, event_count) WHERE session_id = ?"
+_INSERT_PAYLOAD = "INSERT INTO payloads(session_id, file, sha256, size, saved_ts, data) VALUES (?, ?, ?, ?, ?, ?)"
+
+_BARRIER = object()
+
+
+def attack_type_of(event):
+    """Label of a classification event (typed or "[CLASS]=recon|0.6|ENG=HIGH"), or None."""
+    ev = decode(event)
+    if ev is None or ev["type"] != EventType.CLASSIFICATION:
+        return None
+    return str(ev.get("label") or "").lower() or None
+
+
+def _event_params(session_id, event):
+    """INSERT parameters for one event: typed events keep their fields as JSON."""
+    if "type" in event:
+        return (session_id, event.get("ts"), event["type"], json.dumps(fields(event), separators=(",", ":")))
+    return (session_id, event.get("ts"), None, str(event.get("text", "")))
+
+
+def _event_row(ts, kind, text):
+    """Inverse of _event_params: the stored event dict."""
+    if kind is None:
+        return {"ts": ts, "text": text}
+    return {"ts": ts, "type": kind, **json.loads(text or "{}")}
+
+
+def init_db(path=None):
+    """Open a read/write connection, creating the schema and enabling WAL."""
+    path = path or DB_PATH
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # NORMAL is durable across application crashes in WAL mode; only an OS
+    # crash can lose the last few transactions
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    # databases created before typed events have no events.type column
+    if "type" not in {row[1] for row in conn.execute("PRAGMA table_info(events)")}:
+        conn.execute("ALTER TABLE events ADD COLUMN type TEXT")
+    conn.commit()
+    return conn
+
+
+def connect(path=None):
+    """Read-only connection for dashboards and exporters."""
+    path = path or DB_PATH
+    conn = sqlite3.connect(f"file:{Path(path).as_posix()}?mode=ro", uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class SqliteStore:
+    def __init__(self, path=None, batch=512, flush_ms=20, max_queue=10000):
+        self.path = Path(path or DB_PATH)
+        self.batch = batch
+        self.flush_ms = flush_ms
+        self._q = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._classified = set()
+        self._lock = threading.Lock()
+        self._statements = 0
+        self._transactions = 0
+        self._errors = 0
+        self._commit_ms_max = 0.0
+
+    # --- producer side -------------------------------------------------
+
+    def start(self):
+        if self._thread is None:
+            self._conn = init_db(self.path)
+            self._thread = threading.Thread(target=self._run, name="sqlite-store", daemon=True)
+            self._thread.start()
+        return self
+
+    def _put(self, sql, params):
+        self._q.put((sql, params))
+
+    def open_session(self, session_id, dir, src_ip, src_port, instance, start_ts):
+        self._put(_UPSERT_SESSION, (session_id, dir, src_ip, src_port, instance, start_ts))
+
+    def update_session(self, session_id, fields):
+        """Set known session columns from a meta dict (see evidence_store.save_session_data)."""
+        cols = [c for c in SESSION_COLUMNS if c in fields]
+        if cols:
+            sql = f"UPDATE sessions SET {', '.join(c + ' = ?' for c in cols)} WHERE session_id = ?"
+            self._put(sql, tuple(fields[c] for c in cols) + (session_id,))
+
+    def append_event(self, session_id, event):
+        self._put(_INSERT_EVENT, _event_params(session_id, event))
+        # the dashboard's attack_type is the session's first classification label
+        if session_id not in self._classified:
+            label = attack_type_of(event)
+            if label:
+                self._classified.add(session_id)
+                self._put(_SET_ATTACK_TYPE, (label, session_id))
+
+    def close_session(self, session_id, end_ts, end_time, event_count=None):
+        self._classified.discard(session_id)
+        self._put(_CLOSE_SESSION, (end_ts, end_time, event_count, session_id))
+
+    def save_payload(self, session_id, meta, data):
+        self._put(_INSERT_PAYLOAD, (session_id, meta.get("file"), meta.get("sha256"), meta.get("size"),
+                                    meta.get("saved_ts"), sqlite3.Binary(data)))
+
+    def payload_uri(self, sha256):
+        """Stand-in for a payload's file path; the bytes live in the payloads table."""
+        return f"sqlite:{self.path.as_posix()}#payloads/{sha256}"
+
+    def flush(self, timeout=None):
+        """Block until everything queued before this call is committed."""
+        done = threading.Event()
+        self._q.put((_BARRIER, done))
+        return done.wait(timeout)
+
+    def stop(self, timeout=5.0):
+        if self._thread is not None and self._thread.is_alive():
+            self.flush(timeout)
+            self._q.put(None)
+            self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._q.qsize(),
+                "statements": self._statements,
+                "transactions": self._transactions,
+                "errors": self._errors,
+                "commit_ms_max": round(self._commit_ms_max, 3),
+            }
+
+    # --- writer thread -------------------------------------------------
+
+    def _run(self):
+        try:
+            while True:
+                item = self._q.get()
+                if item is None:
+                    return
+                batch = [item]
+                deadline = time.monotonic() + self.flush_ms / 1000.0
+                stop = False
+                while len(batch) < self.batch and batch[-1][0] is not _BARRIER:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        nxt = self._q.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if nxt is None:
+                        stop = True
+                        break
+                    batch.append(nxt)
+                self._commit(batch)
+                if stop:
+                    return
+        finally:
+            self._conn.close()
+
+    def _commit(self, batch):
+        t0 = time.perf_counter()
+        barriers = [params for sql, params in batch if sql is _BARRIER]
+        statements = [item for item in batch if item[0] is not _BARRIER]
+        n = len(statements)
+        try:
+            with self._conn:
+                # runs of the same statement go through executemany
+                run_sql, run = None, []
+                for sql, params in statements:
+                    if sql != run_sql and run:
+                        self._conn.executemany(run_sql, run)
+                        run = []
+                    run_sql = sql
+                    run.append(params)
+                if run:
+                    self._conn.executemany(run_sql, run)
+        except sqlite3.Error as e:
+            logger.warning("SQLite batch of %d statements failed (%s); retrying one at a time", n, e)
+            self._commit_each(statements)
+        elapsed = (time.perf_counter() - t0) * 1000.0
+        with self._lock:
+            self._statements += n
+            self._transactions += 1
+            self._commit_ms_max = max(self._commit_ms_max, elapsed)
+        for done in barriers:
+            done.set()
+
+    def _commit_each(self, statements):
+        for sql, params in statements:
+            try:
+                with self._conn:
+                    self._conn.execute(sql, params)
+            except sqlite3.Error as e:
+                logger.error("SQLite statement dropped (%s): %s", e, sql.split("(")[0].strip())
+                with self._lock:
+                    self._errors += 1
+
+
+def import_session(conn, meta, dir=None, payloads=()):
+    """Insert one legacy meta dict (with its events) on a read/write connection.
+
+    payloads is an iterable of (meta dict, bytes). The caller commits; used by
+    scripts/import_sessions_sqlite.py, which commits in batches.
+    """
+    sid = meta.get("session_id") or Path(dir).name
+    events = [e for e in meta.get("events", []) if isinstance(e, dict)]
+    start_ts = meta.get("start_ts") or (events[0].get("ts") if events else None)
+    conn.execute(_UPSERT_SESSION, (sid, dir, meta.get("src_ip"), meta.get("src_port"),
+                                   meta.get("instance"), start_ts))
+    conn.execute("DELETE FROM events WHERE session_id = ?", (sid,))
+    conn.executemany(_INSERT_EVENT, [_event_params(sid, e) for e in events])
+    label = next((t for t in map(attack_type_of, events) if t), None)
+    end_ts = events[-1].get("ts") if events and meta.get("end_time") else None
+    conn.execute("UPDATE sessions SET attack_type = ?, end_ts = ?, end_time = ?, event_count = ? WHERE session_id = ?",
+                 (label, end_ts, meta.get("end_time"), len(events), sid))
+    conn.execute("DELETE FROM payloads WHERE session_id = ?", (sid,))
+    for pmeta, data in payloads:
+        conn.execute(_INSERT_PAYLOAD, (sid, pmeta.get("file"), pmeta.get("sha256"), pmeta.get("size"),
+                                       pmeta.get("saved_ts"), sqlite3.Binary(data)))
+    return sid
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def backend():
+    return os.environ.get("HONEYPOT_STORAGE_BACKEND", "files").lower()
+
+
+def get_store():
+    """Return the process-wide store if HONEYPOT_STORAGE_BACKEND=sqlite, else None."""
+    global _store
+    if _store is not None:
+        return _store
+    if backend() != "sqlite":
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = SqliteStore(
+                batch=int(os.environ.get("HONEYPOT_SQLITE_BATCH", "512")),
+                flush_ms=float(os.environ.get("HONEYPOT_SQLITE_FLUSH_MS", "20")),
+            ).start()
+            atexit.register(_store.stop)
+    return _store
+
+
+# ---------------------
+# Queries (read side)
+# ---------------------
+
+def load_session(conn, session_id):
+    """Return one session in the legacy meta dict shape ({..., "events": [...]})."""
+    row = conn.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+    if row is None:
+        return None
+    meta = {k: row[k] for k in row.keys() if row[k] is not None}
+    meta["events"] = [_event_row(*r) for r in conn.execute(
+        "SELECT ts, type, text FROM events WHERE session_id = ? ORDER BY id", (session_id,))]
+    return meta
+
+
+def session_ids(conn, since=None):
+    """Session IDs in start order, optionally only those started at/after `since`."""
+    if since is None:
+        cur = conn.execute("SELECT session_id FROM sessions ORDER BY start_ts")
+    else:
+        cur = conn.execute("SELECT session_id FROM sessions WHERE start_ts >= ? ORDER BY start_ts", (since,))
+    return [r[0] for r in cur]
+
+
+def closed_since(conn, since=0.0):
+    """[(dir, end_ts)] for sessions closed after `since`, oldest first."""
+    return conn.execute("SELECT dir, end_ts FROM sessions WHERE end_ts > ? ORDER BY end_ts",
+                        (since,)).fetchall()
+
+
+def top_ips(conn, limit=10, since=None):
+    """[(src_ip, sessions)] for the busiest sources."""
+    where, args = ("WHERE start_ts >= ?", (since,)) if since is not None else ("", ())
+    return [tuple(r) for r in conn.execute(
+        f"SELECT src_ip, COUNT(*) AS n FROM sessions {where} GROUP BY src_ip ORDER BY n DESC LIMIT ?",
+        args + (limit,))]
+
+
+def attacks_by_hour(conn, since=None):
+    """[(hour 'YYYY-MM-DD HH:00' UTC, attack_type, sessions)] in time order."""
+    where, args = ("WHERE start_ts >= ?", (since,)) if since is not None else ("", ())
+    return [tuple(r) for r in conn.execute(
+        "SELECT strftime('%Y-%m-%d %H:00', start_ts, 'unixepoch') AS hour, "
+        "COALESCE(attack_type, 'unknown') AS attack_type, COUNT(*) AS n "
+        f"FROM sessions {where} GROUP BY hour, attack_type ORDER BY hour", args)]
+
+
+# columns app_auto.load_vm_sessions expects; `events` is a short count summary
+# here since building text summaries would mean reading every event row
+DASHBOARD_QUERY = """
+SELECT session_id, src_ip, src_port,
+       COALESCE(end_time, datetime(start_ts, 'unixepoch')) AS timestamp,
+       event_count || ' events' AS events,
+       2222 AS dst_port,
+       COALESCE(instance, 'default') AS instance,
+       COALESCE(attack_type, 'unknown') AS attack_type
+FROM sessions ORDER BY start_ts
+"""
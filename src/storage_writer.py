@@ -0,0 +1,260 @@
+# src/storage_writer.py
+"""Single background writer for all session storage (group commit).
+
+Connection threads hand their writes to one StorageWriter through a bounded
+queue instead of opening files themselves. The writer drains the queue in
+batches -- up to `batch_events` items or `flush_ms` milliseconds, whichever
+comes first -- concatenates event lines per file so each touched events.jsonl
+gets one write() per batch, and applies the configured fsync policy:
+
+  never     leave durability to the OS page cache (default)
+  batch     fsync every file touched by a batch before the next batch
+  interval  fsync touched files at most once every `fsync_interval` seconds
+
+Ordering is preserved: whole-file writes and callables run in queue order,
+with pending event lines flushed before them.
+
+Enable for the orchestrator with HONEYPOT_STORAGE_WRITER=1; see
+scripts/bench_storage_writer.py for throughput numbers.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+_APPEND, _WRITE_FILE, _CLOSE, _CALL, _BARRIER = range(5)
+
+FSYNC_POLICIES = ("never", "batch", "interval")
+
+
+class StorageWriter:
+    def __init__(self, max_queue=10000, batch_events=512, flush_ms=20, fsync="never", fsync_interval=1.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.batch_events = batch_events
+        self.flush_ms = flush_ms
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._q = queue.Queue(maxsize=max_queue)
+        self._files = {}
+        self._unsynced = set()
+        self._last_fsync = time.monotonic()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._events_written = 0
+        self._files_written = 0
+        self._batches = 0
+        self._errors = 0
+        self._max_depth = 0
+        self._flush_ms_last = 0.0
+        self._flush_ms_max = 0.0
+        self._flush_ms_total = 0.0
+
+    # --- producer side -------------------------------------------------
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="storage-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def _put(self, item):
+        # blocks when the queue is full: back-pressure instead of unbounded memory
+        self._q.put(item)
+        depth = self._q.qsize()
+        if depth > self._max_depth:
+            self._max_depth = depth
+
+    def append(self, path, line):
+        """Queue one text line (without newline) for append to path."""
+        self._put((_APPEND, str(path), line + "\n"))
+
+    def write_file(self, path, data):
+        """Queue an atomic whole-file write (bytes or str)."""
+        self._put((_WRITE_FILE, str(path), data))
+
+    def close_file(self, path):
+        """Flush and close the handle held for path (e.g. when a session ends)."""
+        self._put((_CLOSE, str(path), None))
+
+    def call(self, fn, *args):
+        """Run fn(*args) on the writer thread, in order with other writes."""
+        self._put((_CALL, fn, args))
+
+    def flush(self, timeout=None):
+        """Block until everything queued before this call has been written."""
+        done = threading.Event()
+        self._put((_BARRIER, done, None))
+        return done.wait(timeout)
+
+    def stop(self, timeout=5.0):
+        if self._thread is not None and self._thread.is_alive():
+            self.flush(timeout)
+            self._put(None)
+            self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        with self._lock:
+            batches = self._batches
+            return {
+                "queue_depth": self._q.qsize(),
+                "queue_depth_max": self._max_depth,
+                "events_written": self._events_written,
+                "files_written": self._files_written,
+                "batches": batches,
+                "errors": self._errors,
+                "flush_ms_last": round(self._flush_ms_last, 3),
+                "flush_ms_max": round(self._flush_ms_max, 3),
+                "flush_ms_avg": round(self._flush_ms_total / batches, 3) if batches else 0.0,
+                "open_files": len(self._files),
+            }
+
+    # --- writer thread -------------------------------------------------
+
+    def _run(self):
+        while True:
+            item = self._q.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_ms / 1000.0
+            while len(batch) < self.batch_events:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = self._q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._commit(batch)
+                    self._close_all()
+                    return
+                batch.append(nxt)
+                if nxt[0] == _BARRIER:
+                    break
+            self._commit(batch)
+        self._close_all()
+
+    def _commit(self, batch):
+        t0 = time.perf_counter()
+        pending = {}
+        events = 0
+        files = 0
+        for kind, target, arg in batch:
+            if kind == _APPEND:
+                pending.setdefault(target, []).append(arg)
+                events += 1
+                continue
+            self._write_pending(pending)
+            pending = {}
+            try:
+                if kind == _WRITE_FILE:
+                    self._write_whole(target, arg)
+                    files += 1
+                elif kind == _CLOSE:
+                    f = self._files.pop(target, None)
+                    if f is not None:
+                        if self.fsync != "never":
+                            self._sync(f)
+                        f.close()
+                    self._unsynced.discard(target)
+                elif kind == _CALL:
+                    target(*arg)
+                elif kind == _BARRIER:
+                    self._maybe_fsync(force=self.fsync != "never")
+                    target.set()
+            except Exception:
+                with self._lock:
+                    self._errors += 1
+        self._write_pending(pending)
+        self._maybe_fsync()
+        elapsed = (time.perf_counter() - t0) * 1000.0
+        with self._lock:
+            self._batches += 1
+            self._events_written += events
+            self._files_written += files
+            self._flush_ms_last = elapsed
+            self._flush_ms_total += elapsed
+            if elapsed > self._flush_ms_max:
+                self._flush_ms_max = elapsed
+
+    def _write_pending(self, pending):
+        for path, lines in pending.items():
+            try:
+                f = self._files.get(path)
+                if f is None:
+                    f = self._files[path] = open(path, "a", encoding="utf-8")
+                f.write("".join(lines))
+                f.flush()
+                self._unsynced.add(path)
+            except Exception:
+                with self._lock:
+                    self._errors += 1
+
+    def _write_whole(self, path, data):
+        p = Path(path)
+        tmp = p.with_name(p.name + ".tmp")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with open(tmp, "wb") as f:
+            f.write(data)
+            if self.fsync != "never":
+                self._sync(f)
+        os.replace(tmp, p)
+
+    @staticmethod
+    def _sync(f):
+        f.flush()
+        os.fsync(f.fileno())
+
+    def _maybe_fsync(self, force=False):
+        if self.fsync == "never" or not self._unsynced:
+            return
+        now = time.monotonic()
+        if not force and self.fsync == "interval" and now - self._last_fsync < self.fsync_interval:
+            return
+        for path in list(self._unsynced):
+            f = self._files.get(path)
+            if f is not None:
+                try:
+                    self._sync(f)
+                except OSError:
+                    with self._lock:
+                        self._errors += 1
+        self._unsynced.clear()
+        self._last_fsync = now
+
+    def _close_all(self):
+        for f in self._files.values():
+            try:
+                f.close()
+            except OSError:
+                pass
+        self._files.clear()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Return the process-wide writer if HONEYPOT_STORAGE_WRITER is enabled, else None."""
+    global _writer
+    if _writer is not None:
+        return _writer
+    if os.environ.get("HONEYPOT_STORAGE_WRITER", "0").lower() not in ("1", "true", "yes"):
+        return None
+    with _writer_lock:
+        if _writer is None:
+            _writer = StorageWriter(
+                max_queue=int(os.environ.get("HONEYPOT_WRITER_QUEUE", "10000")),
+                batch_events=int(os.environ.get("HONEYPOT_WRITER_BATCH", "512")),
+                flush_ms=float(os.environ.get("HONEYPOT_WRITER_FLUSH_MS", "20")),
+                fsync=os.environ.get("HONEYPOT_WRITER_FSYNC", "never"),
+            ).start()
+            atexit.register(_writer.stop)
+    return _writer
@@ -0,0 +1,338 @@
+# src/tarpit.py
+"""Paced output for slowed-down attackers, drained from one thread.
+
+The fake shell used to pace its output with time.sleep between chunks on the
+connection's own thread, so every engaged attacker held a thread that was
+asleep most of the time. PacedWriter keeps a heap of per-connection output
+streams ordered by when their next chunk is due; one writer thread pops the
+due streams, sends a chunk without blocking and pushes them back:
+
+    writer = get_paced_writer()
+    writer.write(conn, b"root@fakehost:~# ", delay=0.3)  # returns immediately
+    ...
+    writer.close(conn)  # wait for queued output, then forget the stream
+
+Chunks for one connection go out in order; `delay` is counted from the moment
+the previous chunk was sent. A stream can also have a `source` callable that
+is asked for the next (delay, data) whenever its queue runs dry -- returning
+None ends the stream and calls `on_close`. Sources and on_close run after the
+writer releases its lock, since they may log to disk.
+
+Tarpit (HONEYPOT_MODE=tarpit) uses that to drip a random line every
+HONEYPOT_TARPIT_INTERVAL seconds to each connection before the SSH banner, the
+way endlessh does; clients wait for the banner indefinitely. No thread or
+coroutine exists per connection, only a socket and a heap entry, so one
+process holds tens of thousands of them (HONEYPOT_TARPIT_MAX_CLIENTS).
+"""
+import heapq
+import itertools
+import os
+import random
+import socket
+import threading
+import time
+from collections import deque
+
+from . import events
+from .line_framer import LineFramer
+from .session_manager import append_event
+
+TARPIT_INTERVAL = float(os.environ.get("HONEYPOT_TARPIT_INTERVAL", "10"))
+TARPIT_MAX_CLIENTS = int(os.environ.get("HONEYPOT_TARPIT_MAX_CLIENTS", "20000"))
+# retry delay when the peer's receive window is full
+RETRY_DELAY = 0.25
+CLOSE_TIMEOUT = 30.0
+_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0)
+
+
+def _nonblocking(sock):
+    # without MSG_DONTWAIT (Windows) the writer's socket itself must not block;
+    # where the flag exists leave it alone: a dup shares O_NONBLOCK with the
+    # connection thread's blocking socket
+    if not _DONTWAIT:
+        sock.setblocking(False)
+    return sock
+
+
+class _Stream:
+    __slots__ = ("sock", "chunks", "source", "on_close", "scheduled", "failed", "sent")
+
+    def __init__(self, sock, source=None, on_close=None):
+        self.sock = sock
+        self.chunks = deque()   # [delay, data] pairs; the head is the next to send
+        self.source = source
+        self.on_close = on_close
+        self.scheduled = False  # has an entry in the heap
+        self.failed = False
+        self.sent = 0
+
+
+class PacedWriter:
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._streams = {}
+        self._thread = None
+        self.max_lag = 0.0
+        self.sent_bytes = 0
+
+    # --- producer side ----------------------------------------------------
+
+    def open(self, sock, source=None, on_close=None, key=None):
+        """Register a stream for sock. The writer sends on it with MSG_DONTWAIT
+        (or makes it non-blocking where that flag is missing), so sock must not
+        have a timeout (pass a dup() of sockets that do)."""
+        st = _Stream(_nonblocking(sock), source, on_close)
+        with self._cond:
+            self._streams[key if key is not None else sock] = st
+            if source is not None:
+                self._schedule(st, time.monotonic())
+        self._ensure_thread()
+        return st
+
+    def write(self, key, data, delay=0.0):
+        """Queue data on the stream for key; returns False if the peer is gone."""
+        with self._cond:
+            st = self._streams.get(key)
+            if st is None:
+                st = _Stream(_nonblocking(key.dup()))
+                self._streams[key] = st
+            if st.failed:
+                return False
+            if isinstance(data, str):
+                data = data.encode(errors="ignore")
+            st.chunks.append([delay, data])
+            if not st.scheduled:
+                self._schedule(st, time.monotonic() + delay)
+        self._ensure_thread()
+        return True
+
+    def failed(self, key):
+        st = self._streams.get(key)
+        return st is not None and st.failed
+
+    def close(self, key, timeout=CLOSE_TIMEOUT):
+        """Wait up to timeout for the queued output of key, then drop the stream."""
+        end = time.monotonic() + timeout
+        with self._cond:
+            st = self._streams.get(key)
+            while st is not None and st.scheduled and not st.failed:
+                left = end - time.monotonic()
+                if left <= 0:
+                    break
+                self._cond.wait(left)
+            st = self._streams.pop(key, None)
+        if st is not None and st.sock is not key:
+            try:
+                st.sock.close()
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._cond:
+            return {"streams": len(self._streams), "scheduled": len(self._heap),
+                    "sent_bytes": self.sent_bytes, "max_lag_ms": round(self.max_lag * 1000, 1)}
+
+    # --- writer thread ----------------------------------------------------
+
+    def _schedule(self, st, due):
+        st.scheduled = True
+        heapq.heappush(self._heap, (due, next(self._seq), st))
+        if self._heap[0][2] is st:
+            self._cond.notify_all()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._cond:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="paced-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            finished, dry = [], []
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                now = time.monotonic()
+                while self._heap and self._heap[0][0] <= now:
+                    due, _, st = heapq.heappop(self._heap)
+                    self.max_lag = max(self.max_lag, now - due)
+                    alive = self._service(st, now)
+                    if alive is None:
+                        dry.append(st)
+                    elif not alive:
+                        finished.append(st)
+                self._cond.notify_all()
+            if dry:
+                # one session's source (the tarpit logs to disk) must not hold up the rest
+                refills = []
+                for st in dry:
+                    try:
+                        refills.append((st, st.source(st)))
+                    except Exception:
+                        refills.append((st, None))
+                with self._cond:
+                    for st, nxt in refills:
+                        if nxt is None:
+                            st.scheduled = False
+                            finished.append(st)
+                        else:
+                            st.chunks.append(list(nxt))
+                            self._schedule(st, now + nxt[0])
+                    self._cond.notify_all()
+            for st in finished:
+                if st.on_close is not None:
+                    try:
+                        st.on_close(st)
+                    except Exception:
+                        pass
+
+    def _service(self, st, now):
+        """Send st's next chunk and reschedule it. Returns False when the stream
+        ended, None when its source has to be asked for more (by the caller,
+        outside the lock; the stream stays marked scheduled meanwhile)."""
+        st.scheduled = False
+        if st.failed:
+            return st.source is None
+        if st.chunks:
+            head = st.chunks[0]
+            data = head[1]
+            if data:
+                try:
+                    n = st.sock.send(data, _DONTWAIT)
+                except (BlockingIOError, InterruptedError):
+                    n = 0
+                except OSError:
+                    st.failed = True
+                    st.chunks.clear()
+                    return st.source is None
+                st.sent += n
+                self.sent_bytes += n
+                if n < len(data):
+                    head[0], head[1] = 0.0, data[n:]
+                    self._schedule(st, now + RETRY_DELAY)
+                    return True
+            st.chunks.popleft()
+        if st.chunks:
+            self._schedule(st, now + st.chunks[0][0])
+        elif st.source is not None:
+            st.scheduled = True
+            return None
+        return True
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_paced_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = PacedWriter()
+    return _writer
+
+
+class Tarpit:
+    """Hold connections with a slow pre-banner drip, all on the paced writer.
+
+    open_session(addr) -> (sid, sdir) and close_session(sdir, framer) are the
+    orchestrator's session hooks; input is drained into a LineFramer so
+    bytes_in/bytes_out and the byte budget work as in the other modes.
+    Without hooks (connections shed by admission control) nothing is recorded.
+    release(addr), if given, is called once for every connection handed to
+    accept() when the tarpit is done with it, including ones it turned away.
+    """
+
+    def __init__(self, open_session, close_session, interval=None, max_clients=None, writer=None,
+                 release=None):
+        self.open_session = open_session
+        self.close_session = close_session
+        self.release = release
+        self.interval = TARPIT_INTERVAL if interval is None else interval
+        self.max_clients = TARPIT_MAX_CLIENTS if max_clients is None else max_clients
+        self.writer = writer or PacedWriter()
+        self.clients = 0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def _release(self, addr):
+        if self.release is not None:
+            self.release(addr)
+
+    def accept(self, conn, addr):
+        with self._lock:
+            full = self.clients >= self.max_clients
+            if not full:
+                self.clients += 1
+                self.total += 1
+        if full:
+            conn.close()
+            self._release(addr)
+            return
+        sdir = None
+        try:
+            conn.setblocking(False)  # only the writer thread touches it from here on
+            if self.open_session is not None:
+                sid, sdir = self.open_session(addr)
+                append_event(sdir, events.action("TARPIT"))
+        except Exception:
+            with self._lock:
+                self.clients -= 1
+            self._release(addr)
+            raise
+        framer = LineFramer()
+        first = [True]
+
+        def drip(st):
+            # drain whatever the client sent; b"" means it hung up
+            while True:
+                try:
+                    chunk = conn.recv(4096, _DONTWAIT)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError:
+                    return None
+                if not chunk or not framer.push(chunk):
+                    return None
+                while (line := framer.pop_line()) is not None:
+                    if sdir is not None:
+                        append_event(sdir, events.input_line(line.decode(errors="ignore").strip()))
+            framer.bytes_out = st.sent
+            line = b"%x\r\n" % random.getrandbits(32)
+            if first[0]:
+                first[0] = False
+                return 0.0, line
+            return random.uniform(0.5, 1.5) * self.interval, line
+
+        def done(st):
+            framer.bytes_out = st.sent
+            with self._lock:
+                self.clients -= 1
+            self.writer.close(conn, timeout=0)
+            try:
+                conn.close()
+            except OSError:
+                pass
+            try:
+                if sdir is not None:
+                    self.close_session(sdir, framer)
+            finally:
+                self._release(addr)
+
+        self.writer.open(conn, source=drip, on_close=done)
+
+    def serve(self, sock, stop, admit=None):
+        """Accept connections until stop is set. admit(conn, addr), if given,
+        returns False for connections the caller has already turned away."""
+        while not stop.is_set():
+            conn, addr = sock.accept()
+            if admit is not None and not admit(conn, addr):
+                continue
+            try:
+                self.accept(conn, addr)
+            except Exception:
+                conn.close()
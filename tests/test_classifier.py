@@ -10,4 +10,57 @@ def test_classify_exploit_pattern():
 def test_classify_bruteforce_pattern():
     features = {"wget": 0, "num_commands": 10, "failed_login": 5}
     label, conf = classify(features)
-    assert label == "bruteforce"
\ No newline at end of file
+    assert label == "bruteforce"
+def test_classify_batch_matches_classify():
+    import numpy as np
+    from src.classifier import FEATURES, classify_batch
+    vectors = [{"wget": w, "failed_login": f, "num_commands": n}
+               for w in (0, 1) for f in (0, 2, 5) for n in (1, 3, 10)]
+    expected = [classify(v) for v in vectors]
+    assert classify_batch(vectors) == expected
+    rows = np.array([[v[name] for name in FEATURES] for v in vectors])
+    assert classify_batch(rows) == expected
+
+def test_memo_counts_hits_per_model_version():
+    import src.classifier as c
+    from src.model import get_registry
+    before = c.memo.stats()
+    vector = {"wget": 0, "num_commands": 7, "failed_login": 1}
+    first = classify(vector)
+    assert classify(dict(vector)) == first
+    assert c.classify_batch([vector, vector]) == [first, first]
+    stats = c.memo.stats()
+    assert stats["misses"] - before["misses"] == 1 and stats["hits"] - before["hits"] == 3
+    assert c.memo.get((get_registry().current().version, (0, 1, 7))) == first
+
+
+def test_memo_is_bounded():
+    from src.classifier import LRUMemo
+    memo = LRUMemo(size=2)
+    for key in "abc":
+        memo.put(key, key.upper())
+    assert memo.get("a") is None and memo.get("c") == "C"
+    assert memo.stats()["entries"] == 2
+
+
+def test_thread_mode_answers_memo_hits_without_the_batcher(monkeypatch):
+    from src import orchestrator
+
+    class Batcher:
+        submitted = []
+
+        def submit(self, features):
+            from concurrent.futures import Future
+            self.submitted.append(features)
+            fut = Future()
+            fut.set_result(classify(features))
+            return fut
+
+    batcher = Batcher()
+    monkeypatch.setattr(orchestrator, "get_classify_batcher", lambda: batcher)
+    orch = orchestrator.Orchestrator(mode="thread", export=False)
+    vector = {"wget": 0, "num_commands": 13, "failed_login": 2}
+    first = orch._classify(vector)
+    assert batcher.submitted == [vector]
+    assert orch._classify(dict(vector)) == first
+    assert batcher.submitted == [vector]  # the hit never reached the batcher
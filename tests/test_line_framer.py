@@ -0,0 +1,39 @@
+# tests/test_line_framer.py
+from src.line_framer import LineFramer
+
+
+def test_lines_split_across_chunks():
+    framer = LineFramer(max_line=64, budget=0)
+    assert framer.lines(b"una") == []
+    assert framer.lines(b"me -a\nid\r\nw") == [b"uname -a", b"id\r"]
+    assert framer.lines(b"hoami\n") == [b"whoami"]
+    assert framer.pending() == 0
+
+
+def test_long_lines_are_cut_and_the_rest_discarded():
+    framer = LineFramer(max_line=8, budget=0)
+    # a long line that is still arriving is cut once, its tail skipped up to the newline
+    assert framer.lines(b"A" * 20) == [b"A" * 8]
+    assert framer.lines(b"A" * 20) == []
+    assert framer.lines(b"AAA\nls\n") == [b"ls"]
+    # a complete long line in one chunk
+    assert framer.lines(b"B" * 12 + b"\npwd\n") == [b"B" * 8, b"pwd"]
+    stats = framer.stats()
+    assert stats["truncated_lines"] == 2 and stats["dropped_bytes"] == 12 + 20 + 3 + 4
+
+
+def test_budget_and_byte_counts():
+    framer = LineFramer(budget=10)
+    assert framer.push(b"echo hi\n")
+    assert not framer.push(b"more\n") and framer.exhausted
+    framer.sent(17)
+    assert framer.stats()["bytes_in"] == 13 and framer.stats()["bytes_out"] == 17
+
+
+def test_take_and_unread_for_uploads():
+    framer = LineFramer(budget=0)
+    framer.push(b"cat > x\nraw\x00bytes")
+    assert framer.pop_line() == b"cat > x"
+    assert framer.take() == b"raw\x00bytes"
+    framer.unread(b"ls\n")
+    assert framer.pop_line() == b"ls" and framer.stats()["bytes_in"] == len(b"cat > x\nraw\x00bytes")
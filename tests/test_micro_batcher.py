@@ -0,0 +1,46 @@
+# tests/test_micro_batcher.py
+import threading
+
+import pytest
+
+from src.micro_batcher import MicroBatcher
+
+
+def test_concurrent_submissions_share_batches():
+    sizes = []
+
+    def double(items):
+        sizes.append(len(items))
+        return [2 * x for x in items]
+
+    batcher = MicroBatcher(double, max_wait=0.05, max_batch=8).start()
+    results = {}
+    start = threading.Event()
+
+    def session(i):
+        start.wait()
+        results[i] = batcher.submit(i).result(timeout=5)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    start.set()
+    for t in threads:
+        t.join()
+    assert results == {i: 2 * i for i in range(20)}
+    assert sum(sizes) == 20 and max(sizes) <= 8 and len(sizes) < 20
+    assert batcher.stats()["items"] == 20
+
+
+def test_errors_reach_every_caller():
+    def fail(items):
+        raise ValueError("model missing")
+
+    batcher = MicroBatcher(fail, max_wait=0.01).start()
+    futures = [batcher.submit(i) for i in range(3)]
+    for fut in futures:
+        with pytest.raises(ValueError):
+            fut.result(timeout=5)
+    # the batcher thread survives a failing batch
+    batcher.fn = lambda items: items
+    assert batcher.submit("x").result(timeout=5) == "x"
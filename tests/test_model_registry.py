@@ -0,0 +1,96 @@
+# tests/test_model_registry.py
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from src import model
+from src.forest import FlatForest
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(model, "MODEL_PATH", tmp_path / "rf_honeypot.pkl")
+    monkeypatch.setattr(model, "LABEL_PATH", tmp_path / "label_map.pkl")
+    monkeypatch.setattr(model, "FOREST_PATH", tmp_path / "rf_honeypot_flat.joblib")
+    return tmp_path
+
+
+def _train(seed):
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 10, (200, 3))
+    y = rng.integers(0, 3, 200)
+    return RandomForestClassifier(n_estimators=5, random_state=seed).fit(X, y)
+
+
+def test_lazy_load_maps_the_flat_forest(model_dir):
+    clf = _train(0)
+    joblib.dump(clf, model.MODEL_PATH)
+    joblib.dump({"recon": 0, "bruteforce": 1, "exploit": 2}, model.LABEL_PATH)
+    registry = model.ModelRegistry()
+    assert registry.stats()["version"] is None  # nothing loaded yet
+    first = registry.current()
+    assert first.forest is not None and first.inv_label_map[2] == "exploit"
+    # the pickle had no flat file: it was written, and mapped rather than kept private
+    assert model.FOREST_PATH.exists() and isinstance(first.forest.value.base, np.memmap)
+    assert registry.check() is None  # writing the flat file is not a model change
+
+    FlatForest.from_sklearn(_train(3)).save(model.FOREST_PATH)
+    assert registry.check() is not None
+    mapped = registry.current()
+    assert isinstance(mapped.forest.value.base, np.memmap)
+    assert mapped.version != first.version
+
+
+def test_watch_only_stats_on_the_wheel(model_dir, monkeypatch):
+    joblib.dump(_train(4), model.MODEL_PATH)
+    joblib.dump({"recon": 0, "bruteforce": 1, "exploit": 2}, model.LABEL_PATH)
+    registry = model.ModelRegistry()
+    old = registry.current()
+
+    class Wheel:
+        scheduled = []
+
+        def schedule(self, delay, callback):
+            self.scheduled.append(callback)
+
+    wheel = Wheel()
+    registry.watch(wheel, interval=1)
+    workers = []
+    real = registry._reload_in_background
+    monkeypatch.setattr(registry, "_reload_in_background", lambda: workers.append(real()))
+
+    wheel.scheduled.pop()()
+    assert workers == [] and len(wheel.scheduled) == 1  # unchanged: nothing to do
+
+    joblib.dump(_train(5), model.MODEL_PATH)
+    os.utime(model.MODEL_PATH, ns=(1, 10 ** 18))
+    wheel.scheduled.pop()()
+    # the tick only started the reload; it runs on its own thread
+    assert workers[0].name == "model-reload" and len(wheel.scheduled) == 1
+    workers[0].join(10)
+    assert registry.current().version != old.version and registry.stats()["reloads"] == 1
+
+
+def test_reload_swaps_atomically_and_keeps_model_on_failure(model_dir):
+    joblib.dump(_train(1), model.MODEL_PATH)
+    joblib.dump({"recon": 0, "bruteforce": 1, "exploit": 2}, model.LABEL_PATH)
+    registry = model.ModelRegistry()
+    swapped = []
+    registry.on_swap(swapped.append)
+    old = registry.current()
+    assert registry.check() is None and swapped == []
+
+    joblib.dump(_train(2), model.MODEL_PATH)
+    os.utime(model.MODEL_PATH, ns=(1, 10 ** 18))  # new mtime even on coarse clocks
+    new_version = registry.check()
+    assert new_version not in (None, old.version)
+    assert swapped[0].version == new_version == registry.current().version
+    # a session still holding the old model can finish with it
+    assert old.forest.predict_one([1, 2, 3])[1] > 0
+
+    model.LABEL_PATH.write_bytes(b"not a pickle")
+    assert registry.reload() is None
+    assert registry.current().version == new_version and registry.stats()["errors"] == 1
@@ -0,0 +1,97 @@
+# tests/test_payload_store.py
+from src import evidence_store, payload_store
+from src.payload_store import PayloadStore, blob_path
+
+
+def test_repeat_payloads_are_stored_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(payload_store, "_store", PayloadStore(tmp_path / "payloads"))
+    metas = [evidence_store.save_payload_to_session_dir(tmp_path / "sessions" / f"S-{i}", b"#!/bin/sh\nexit 0\n",
+                                                        name=f"payload_{i}.bin") for i in range(3)]
+    assert [m["seen_before"] for m in metas] == [False, True, True]
+    assert len({m["path"] for m in metas}) == 1
+    blob = blob_path(metas[0]["sha256"], tmp_path / "payloads")
+    assert metas[0]["path"] == str(blob.resolve()) and blob.read_bytes() == b"#!/bin/sh\nexit 0\n"
+    assert not (tmp_path / "sessions").exists()  # nothing copied into session dirs
+
+    # the reference log is replayed by a fresh store
+    again = PayloadStore(tmp_path / "payloads")
+    assert again.seen(metas[0]["sha256"])["refs"] == 3
+    assert again.seen("0" * 64) is None
+    for i in range(3):
+        again.release(metas[0]["sha256"], f"S-{i}")
+    assert again.gc() == 1 and not blob.exists()
+
+
+def test_add_file_moves_and_dedups(tmp_path):
+    store = PayloadStore(tmp_path / "payloads")
+    a, b = tmp_path / "a.bin", tmp_path / "b.bin"
+    a.write_bytes(b"MZ" * 1000)
+    b.write_bytes(b"MZ" * 1000)
+    first = store.add_file(a, "S-a", move=True)
+    second = store.add_file(b, "S-b", move=True)
+    assert not first["seen_before"] and second["seen_before"]
+    assert not a.exists() and not b.exists()
+    assert store.stats()["blobs"] == 1 and store.stats()["refs"] == 2
+
+
+def test_sink_streams_with_quotas(tmp_path, monkeypatch):
+    monkeypatch.setattr(payload_store, "MAX_PAYLOAD_BYTES", 10_000)
+    monkeypatch.setattr(payload_store, "SESSION_QUOTA", 12_000)
+    store = PayloadStore(tmp_path / "payloads")
+
+    sink = store.open_sink("S-1", "upload.bin", note="upload:/tmp/x")
+    for _ in range(6):
+        sink.write(bytes(range(256)) * 8)  # 2048-byte chunks, uniform byte values
+    meta = sink.finalize()
+    assert meta["size"] == 10_000 and meta["received"] == 12_288 and meta["truncated"]
+    assert meta["entropy"] > 7.9 and meta["note"] == "upload:/tmp/x"
+    assert blob_path(meta["sha256"], tmp_path / "payloads").stat().st_size == 10_000
+
+    # S-1 has 2000 bytes of session quota left; S-2 is not limited by it
+    again = store.add(b"A" * 5000, "S-1", "p.bin")
+    assert again["size"] == 2000 and again["truncated"]
+    assert store.add(b"A" * 5000, "S-2", "p.bin")["size"] == 5000
+    assert not list((tmp_path / "payloads" / "_tmp").iterdir())
+    assert store.stats()["reserved_bytes"] == 0
+
+    # closing a session drops its counter
+    store.end_session("S-1")
+    store.end_session("S-2")
+    assert store._session_bytes == {}
+
+
+def test_empty_upload_is_saved(tmp_path):
+    store = PayloadStore(tmp_path / "payloads")
+    meta = store.open_sink("S-1", "upload.bin").finalize()  # Ctrl-D before any data
+    assert meta["size"] == 0 and not meta["seen_before"]
+    assert store.stats()["refs"] == 1
+
+
+def test_upload_feed_stops_at_ctrl_d(tmp_path, monkeypatch):
+    from src import high_engagement
+    monkeypatch.setattr(payload_store, "_store", PayloadStore(tmp_path / "payloads"))
+    logged = []
+    monkeypatch.setattr(high_engagement, "append_event", lambda sdir, ev: logged.append(ev))
+    assert high_engagement.upload_target("cat > /tmp/run.sh") == "/tmp/run.sh"
+    assert high_engagement.upload_target("cat /etc/passwd") is None
+
+    up = high_engagement.Upload(tmp_path / "S-1", "/tmp/run.sh")
+    assert up.feed(b"#!/bin/sh\n") is None
+    assert up.feed(b"echo hi\n\x04ls\n") == b"ls\n"
+    up.finish()
+    assert logged[-1]["type"] == "payload_saved" and logged[-1]["file"] == "run.sh"
+    assert logged[-1]["size"] == len(b"#!/bin/sh\necho hi\n")
+
+
+def test_known_payloads_are_referenced_whole_after_the_quota_is_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(payload_store, "GLOBAL_QUOTA", 6_000)
+    monkeypatch.setattr(payload_store, "SESSION_QUOTA", 5_000)
+    store = PayloadStore(tmp_path / "payloads")
+    first = store.add(b"B" * 5000, "S-1", "a.bin")
+    assert store.add(b"C" * 5000, "S-2", "b.bin")["size"] == 1000  # global quota used up
+
+    for sid in ("S-1", "S-2"):
+        again = store.add(b"B" * 5000, sid, "a.bin")
+        assert again["sha256"] == first["sha256"] and again["size"] == 5000
+        assert again["seen_before"] and not again["truncated"]
+    assert store.stats()["reserved_bytes"] == 0 and store.stats()["blobs"] == 2
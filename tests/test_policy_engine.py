@@ -0,0 +1,55 @@
+# tests/test_policy_engine.py
+from src.policy_engine import HIGH, LOW, MEDIUM, PolicyEngine, compile_rules
+
+RULES = [
+    {"label": "exploit", "min_conf": 0.8, "engagement": HIGH, "priority": 3},
+    {"download": True, "engagement": HIGH, "priority": 2},
+    {"label": "bruteforce", "engagement": MEDIUM},
+    {"novel": True, "engagement": HIGH, "priority": 0},
+    {"engagement": LOW},
+]
+
+
+def engine(load=(0.0, 0), budget=10):
+    return PolicyEngine(rules=RULES, budget=budget, probe=lambda: load, sample_interval=0)
+
+
+def test_rules_compile_to_first_match():
+    table = compile_rules(RULES)
+    assert set(table) == {None, "exploit", "bruteforce"}
+    pe = engine()
+    assert pe.wanted("exploit", 0.8) == (HIGH, 3)
+    assert pe.wanted("exploit", 0.79) == (LOW, 0)
+    assert pe.wanted("exploit", 0.5, download=True) == (HIGH, 2)
+    assert pe.wanted("bruteforce", 0.99, novel=True) == (MEDIUM, 0)
+    assert pe.wanted("recon", 0.6, novel=True) == (HIGH, 0)  # label no rule names
+    assert pe.wanted("recon", 0.6) == (LOW, 0)
+
+
+def test_high_budget_is_shared_by_priority():
+    pe = engine(budget=10)
+    # priority 0 may fill half of the budget, priority 3 all of it
+    assert [pe.decide("recon", 0.5, novel=True) for _ in range(6)] == [HIGH] * 5 + [MEDIUM]
+    assert [pe.decide("exploit", 0.9) for _ in range(6)] == [HIGH] * 5 + [MEDIUM]
+    assert pe.stats()["active_high"] == 10 and pe.stats()["degraded"] == 2
+    pe.release()
+    assert pe.decide("recon", 0.5, novel=True) == MEDIUM
+    assert pe.decide("exploit", 0.9) == HIGH
+
+
+def test_load_shrinks_budget_and_degrades():
+    load = [(0.75, 0)]
+    pe = PolicyEngine(rules=RULES, budget=10, probe=lambda: load[0], sample_interval=0)
+    assert [pe.decide("exploit", 0.9) for _ in range(6)] == [HIGH] * 5 + [MEDIUM]
+    assert pe.stats()["load"] == "busy"
+    load[0] = (0.1, 10000)  # writer queue backed up
+    assert pe.decide("exploit", 0.9) == LOW
+    assert pe.decide("bruteforce", 0.9) == LOW
+    assert pe.stats()["load"] == "overloaded"
+
+
+def test_novel_sources_are_remembered():
+    pe = engine()
+    assert pe.observe("192.0.2.1") is True
+    assert pe.observe("192.0.2.1") is False
+    assert pe.observe("192.0.2.2") is True
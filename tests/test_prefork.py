@@ -0,0 +1,96 @@
+# tests/test_prefork.py
+import json
+import logging
+import os
+import threading
+import time
+
+import pytest
+
+from src import prefork, session_manager
+from src.orchestrator import Orchestrator
+from src.prefork import Supervisor
+
+pytestmark = pytest.mark.skipif(not prefork.supported(), reason="needs os.fork and SO_REUSEPORT")
+
+
+def test_workers_can_share_the_port():
+    first = Orchestrator("127.0.0.1", 0, reuse_port=True, export=False)._listen()
+    port = first.getsockname()[1]
+    second = Orchestrator("127.0.0.1", port, reuse_port=True, export=False)._listen()
+    assert second.getsockname()[1] == port
+    first.close(), second.close()
+
+
+def test_supervisor_restarts_crashed_workers(monkeypatch):
+    monkeypatch.setattr(Supervisor, "preload", lambda self: None)
+    monkeypatch.setattr(prefork, "logger", logging.getLogger("test_prefork"))
+    sup = Supervisor("127.0.0.1", 0, workers=2, target=lambda slot: os._exit(3), backoff=0.05)
+    threading.Timer(1.0, sup.stop).start()
+    sup.run(export=False)
+    assert sup.restarts >= 4 and not sup.children
+
+
+def test_export_child_sees_sessions_closed_after_start(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_manager, "BASE", tmp_path)
+    monkeypatch.setattr(prefork, "BASE", tmp_path)
+    monkeypatch.setattr(prefork, "POLL_INTERVAL", 0.01)
+    index = tmp_path / "_index.jsonl"
+    index.write_text(json.dumps({"session_id": "S-old", "dir": "a/S-old", "status": "closed"}) + "\n")
+
+    def worker_writes():
+        with open(index, "a") as f:
+            f.write(json.dumps({"session_id": "S-new", "dir": "b/S-new", "status": "open"}) + "\n")
+            f.write(json.dumps({"session_id": "S-new", "status": "closed", "dir": "b/S-new"}) + "\n")
+
+    closed = Supervisor("127.0.0.1", 0)._closed_sessions()
+    threading.Timer(0.1, worker_writes).start()
+    assert next(closed) == tmp_path / "b" / "S-new"
+
+
+def test_a_backing_off_worker_does_not_hold_up_reaping_the_others(monkeypatch):
+    monkeypatch.setattr(Supervisor, "preload", lambda self: None)
+    monkeypatch.setattr(prefork, "logger", logging.getLogger("test_prefork"))
+    monkeypatch.setattr(prefork, "REAP_POLL", 0.02)
+
+    def target(slot):
+        time.sleep(0.1 * slot)
+        os._exit(3)
+
+    sup = Supervisor("127.0.0.1", 0, workers=2, target=target, backoff=0.6)
+    reaped = []
+    real_reap = sup._reap
+    start = time.monotonic()
+
+    def reap(pid, status):
+        reaped.append((sup.children[pid], time.monotonic() - start))
+        real_reap(pid, status)
+
+    sup._reap = reap
+    threading.Timer(1.0, sup.stop).start()
+    sup.run(export=False)
+    first = {slot: t for slot, t in reversed(reaped)}
+    # slot 1 died while slot 0 was waiting out its 0.6 s backoff
+    assert first[1] < 0.45
+    assert sup.restarts >= 2 and not sup.children
+
+
+def test_export_child_waits_for_the_sqlite_database(tmp_path, monkeypatch):
+    from src import sqlite_store
+    monkeypatch.setenv("HONEYPOT_STORAGE_BACKEND", "sqlite")
+    db = tmp_path / "honeypot.db"
+    monkeypatch.setattr(sqlite_store, "DB_PATH", db)
+    monkeypatch.setattr(prefork, "BASE", tmp_path)
+    monkeypatch.setattr(prefork, "POLL_INTERVAL", 0.01)
+
+    def first_worker_writes():
+        conn = sqlite_store.init_db(db)  # not DB_PATH: the timer may outlive a failed test
+        conn.execute("INSERT INTO sessions (session_id, dir, end_ts) VALUES ('S-1', 'a/S-1', ?)",
+                     (time.time() + 1,))
+        conn.commit()
+        conn.close()
+
+    # fresh deployment: no database file until a worker writes one
+    closed = Supervisor("127.0.0.1", 0)._closed_sessions()
+    threading.Timer(0.1, first_worker_writes).start()
+    assert next(closed) == tmp_path / "a" / "S-1"
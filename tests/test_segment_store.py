@@ -0,0 +1,39 @@
+# tests/test_segment_store.py
+import json
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from src import segment_store, session_manager
+
+
+def _closed_session(base, name, ts, ip, label):
+    sdir = base / name
+    sdir.mkdir(parents=True)
+    meta = {"session_id": name, "src_ip": ip, "src_port": 4000, "end_time": "x", "events": [
+        {"ts": ts, "text": "uname -a"},
+        {"ts": ts + 1, "text": f"[CLASS]={label}|0.9|ENG=LOW"},
+    ]}
+    (sdir / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+    return sdir
+
+
+def test_compact_new_partitions_by_day_and_prunes(tmp_path):
+    sessions, segments = tmp_path / "sessions", tmp_path / "segments"
+    _closed_session(sessions, "S-a", 1700000000, "10.0.0.1", "recon")    # 2023-11-14
+    _closed_session(sessions, "S-b", 1700100000, "10.0.0.2", "exploit")  # 2023-11-16
+    session_manager.rebuild_index(sessions)
+
+    assert segment_store.compact_new(sessions, segments) == 2
+    assert segment_store.compact_new(sessions, segments) == 0  # nothing new in the manifest
+    assert sorted(p.name for p in (segments / "sessions").iterdir()) == ["day=2023-11-14", "day=2023-11-16"]
+
+    table = segment_store.read_table("sessions", ["src_ip", "attack_type"], since="2023-11-15", segment_dir=segments)
+    assert table.column_names == ["src_ip", "attack_type"]
+    assert table.to_pylist() == [{"src_ip": "10.0.0.2", "attack_type": "exploit"}]
+
+    df = segment_store.sessions_frame(["session_id"], segment_dir=segments)
+    assert str(df["timestamp"].dtype).startswith("datetime64")
+    events = segment_store.events_frame(["session_id", "text"], session_ids=["S-a"], segment_dir=segments)
+    assert events["text"].tolist() == ["uname -a", "[CLASS]=recon|0.9|ENG=LOW"]
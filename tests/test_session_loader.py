@@ -0,0 +1,43 @@
+# tests/test_session_loader.py
+import json
+from src import session_loader
+from src.session_loader import load_columns, vm_session_row
+
+
+def _make_sessions(root, n):
+    dirs = []
+    for i in range(n):
+        sdir = root / f"S-{i:04d}"
+        sdir.mkdir()
+        (sdir / "meta.json").write_text(json.dumps({"session_id": sdir.name, "src_ip": f"10.0.0.{i}"}), encoding="utf-8")
+        (sdir / "events.jsonl").write_text(
+            json.dumps({"ts": 1, "text": "ATTACKER_CMD: uname -a"}) + "\n"
+            + json.dumps({"ts": 2, "text": "[CLASS]=recon|0.6|ENG=HIGH"}) + "\n",
+            encoding="utf-8")
+        dirs.append(sdir)
+    return dirs
+
+
+def test_parallel_load_matches_serial(tmp_path, monkeypatch):
+    dirs = _make_sessions(tmp_path, 25)
+    (tmp_path / "broken").mkdir()
+    (tmp_path / "broken" / "meta.json").write_text("{not json", encoding="utf-8")
+    dirs.append(tmp_path / "broken")
+
+    serial_errors = []
+    serial = load_columns(dirs, vm_session_row, max_workers=1, errors=serial_errors)
+
+    monkeypatch.setattr(session_loader, "MIN_PARALLEL", 0)
+    parallel_errors = []
+    parallel = load_columns(dirs, vm_session_row, max_workers=2, chunk_size=4, errors=parallel_errors)
+
+    assert parallel == serial
+    assert serial["session_id"] == [d.name for d in dirs[:-1]]
+    assert set(serial["attack_type"]) == {"recon"}
+    assert len(parallel_errors) == len(serial_errors) == 1
+
+
+def test_columns_are_padded_when_rows_differ(tmp_path):
+    rows = iter([{"a": 1}, {"a": 2, "b": "x"}, None])
+    cols = load_columns([tmp_path] * 3, lambda _: next(rows), max_workers=1)
+    assert cols == {"a": [1, 2], "b": [None, "x"]}
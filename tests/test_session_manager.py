@@ -0,0 +1,71 @@
+# tests/test_session_manager.py
+import json
+from src import session_manager
+
+
+def test_events_are_appended_to_jsonl(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_manager, "BASE", tmp_path)
+    sid, sdir = session_manager.new_session("10.0.0.1", 4444)
+    session_manager.append_event(sdir, {"ts": 1, "text": "uname -a"})
+    session_manager.append_event(sdir, {"ts": 2, "text": "whoami"})
+    session_manager.close_session(sdir)
+
+    lines = (sdir / "events.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2
+    header = json.loads((sdir / "meta.json").read_text(encoding="utf-8"))
+    assert "events" not in header
+    assert "end_time" in header
+
+    meta = session_manager.load_session(sdir)
+    assert meta["session_id"] == sid
+    assert [e["text"] for e in meta["events"]] == ["uname -a", "whoami"]
+
+
+def test_load_session_reads_legacy_layout_and_skips_torn_line(tmp_path):
+    legacy = {"session_id": "S-1", "src_ip": "1.2.3.4", "events": [{"ts": 1, "text": "ls"}]}
+    (tmp_path / "meta.json").write_text(json.dumps(legacy), encoding="utf-8")
+    (tmp_path / "events.jsonl").write_text('{"ts": 2, "text": "id"}\n{"ts": 3, "te', encoding="utf-8")
+
+    meta = session_manager.load_session(tmp_path)
+    assert [e["text"] for e in meta["events"]] == ["ls", "id"]
+
+
+def test_manifest_tracks_open_and_close(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_manager, "BASE", tmp_path)
+    # a session from before the manifest existed gets backfilled
+    old = tmp_path / "S-1"
+    old.mkdir()
+    (old / "meta.json").write_text(json.dumps({"session_id": "S-1", "src_ip": "1.1.1.1", "end_time": "x",
+                                               "events": [{"ts": 5, "text": "ls"}]}), encoding="utf-8")
+
+    tail = session_manager.IndexTail(tmp_path)
+    sid, sdir = session_manager.new_session("10.0.0.2", 5555)
+    assert {s["session_id"] for s in tail.poll()} == {"S-1", sid}
+    assert tail.sessions[sid]["status"] == "open"
+
+    session_manager.append_event(sdir, {"ts": 1, "text": "id"})
+    session_manager.close_session(sdir)
+    touched = tail.poll()
+    assert [s["session_id"] for s in touched] == [sid]
+    assert touched[0]["status"] == "closed"
+    assert touched[0]["events"] == 1
+    assert touched[0]["events_bytes"] == (sdir / "events.jsonl").stat().st_size
+    assert tail.poll() == []
+
+    assert session_manager.session_dirs(tmp_path) == [old, sdir]
+    records, offset = session_manager.read_index(tmp_path, limit=1)
+    assert len(records) == 1 and offset > 0
+
+
+def test_session_ids_are_unique_sorted_and_sharded(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_manager, "BASE", tmp_path)
+    ids = [session_manager.new_session_id(now=1700000000.0) for _ in range(1000)]
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    assert session_manager.new_session_id(now=1700000001.0) > ids[-1]
+
+    # two sessions opened in the same second get separate directories
+    (sid_a, dir_a), (sid_b, dir_b) = session_manager.new_session("1.1.1.1", 1), session_manager.new_session("1.1.1.1", 2)
+    assert sid_a != sid_b and dir_a != dir_b
+    assert dir_a.parent.relative_to(tmp_path).as_posix().count("/") == 3  # YYYY/MM/DD/HH
+    assert session_manager.session_dirs(tmp_path) == [dir_a, dir_b]
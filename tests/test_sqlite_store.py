@@ -0,0 +1,61 @@
+# tests/test_sqlite_store.py
+import logging
+
+import pandas as pd
+from src import evidence_store, export_sessions, session_manager, sqlite_store
+
+
+def test_sqlite_backend_round_trip(tmp_path, monkeypatch):
+    db = tmp_path / "honeypot.db"
+    monkeypatch.setenv("HONEYPOT_STORAGE_BACKEND", "sqlite")
+    monkeypatch.setattr(session_manager, "BASE", tmp_path / "sessions")
+    monkeypatch.setattr(sqlite_store, "DB_PATH", db)
+    store = sqlite_store.SqliteStore(db, flush_ms=1).start()
+    monkeypatch.setattr(sqlite_store, "_store", store)
+
+    sids = []
+    for ip, label in (("10.0.0.1", "recon"), ("10.0.0.1", "exploit"), ("10.0.0.2", "recon")):
+        sid, sdir = session_manager.new_session(ip, 2222)
+        session_manager.append_event(sdir, {"ts": 1700000000.0, "text": "uname -a"})
+        session_manager.append_event(sdir, {"ts": 1700000001.0, "text": f"[CLASS]={label}|0.8|ENG=LOW"})
+        meta = evidence_store.save_payload_to_session_dir(sdir, b"MZ\x90", name="p.bin")
+        session_manager.close_session(sdir)
+        sids.append(sid)
+    store.stop()
+    assert not (tmp_path / "sessions").exists()  # no per-session files
+    assert meta["path"].endswith(meta["sha256"])
+
+    conn = sqlite_store.connect(db)
+    assert sqlite_store.top_ips(conn, limit=1) == [("10.0.0.1", 2)]
+    assert sum(n for _, _, n in sqlite_store.attacks_by_hour(conn)) == 3
+    loaded = sqlite_store.load_session(conn, sids[1])
+    assert loaded["attack_type"] == "exploit" and loaded["event_count"] == 2
+    assert [e["text"] for e in loaded["events"]][0] == "uname -a"
+    assert conn.execute("SELECT COUNT(*) FROM payloads").fetchone()[0] == 3
+    conn.close()
+
+    out = tmp_path / "sessions.csv"
+    # no CSV yet: the first update exports every session, later ones just their batch
+    assert export_sessions.update_sessions_csv([tmp_path / sids[0]], out) == 3
+    assert export_sessions.update_sessions_csv([tmp_path / sids[0]], out) == 1
+    assert export_sessions.sessions_to_csv(tmp_path, out)
+    assert sorted(pd.read_csv(out)["session_id"]) == sorted(sids)
+
+
+def test_a_failing_statement_does_not_drop_the_rest_of_its_batch(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(sqlite_store, "logger", logging.getLogger("test_sqlite_store"))
+    db = tmp_path / "honeypot.db"
+    store = sqlite_store.SqliteStore(db, flush_ms=200).start()
+    for i in range(3):
+        store.open_session(f"S-{i}", None, "10.0.0.1", 2222, "default", 1700000000.0)
+        store.append_event(f"S-{i}", {"ts": 1700000000.0, "text": "uname -a"})
+        if i == 1:
+            store._put("INSERT INTO no_such_table VALUES (?)", (i,))
+    assert store.flush(5)  # barriers queued after the bad statement still release
+    store.stop()
+    conn = sqlite_store.connect(db)
+    assert conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 3
+    assert conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 3
+    conn.close()
+    assert store.stats()["errors"] == 1
+    assert "no_such_table" in caplog.text
@@ -0,0 +1,35 @@
+# tests/test_storage_writer.py
+import json
+from src.storage_writer import StorageWriter
+
+
+def test_writer_batches_events_across_sessions(tmp_path):
+    w = StorageWriter(batch_events=64, flush_ms=50, fsync="batch").start()
+    paths = [tmp_path / f"s{i}.jsonl" for i in range(3)]
+    for n in range(20):
+        for p in paths:
+            w.append(p, json.dumps({"n": n}))
+    w.write_file(tmp_path / "payload.bin", b"\x00\x01")
+    assert w.flush(timeout=5)
+
+    for p in paths:
+        lines = p.read_text(encoding="utf-8").splitlines()
+        assert [json.loads(l)["n"] for l in lines] == list(range(20))
+    assert (tmp_path / "payload.bin").read_bytes() == b"\x00\x01"
+
+    stats = w.stats()
+    assert stats["events_written"] == 60
+    assert stats["files_written"] == 1
+    assert stats["batches"] < 60
+    assert stats["queue_depth"] == 0
+    w.stop()
+
+
+def test_calls_run_in_queue_order(tmp_path):
+    w = StorageWriter().start()
+    p = tmp_path / "events.jsonl"
+    seen = []
+    w.append(p, "first")
+    w.call(lambda: seen.append(p.read_text(encoding="utf-8")))
+    w.stop()
+    assert seen == ["first\n"]
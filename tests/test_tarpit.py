@@ -0,0 +1,129 @@
+# tests/test_tarpit.py
+import socket
+import time
+
+from src import tarpit
+from src.tarpit import PacedWriter, Tarpit
+
+
+def recv_until(sock, n, timeout=5.0):
+    sock.settimeout(timeout)
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def test_paced_writes_keep_order_without_blocking():
+    a, b = socket.socketpair()
+    writer = PacedWriter()
+    t0 = time.monotonic()
+    for i in range(5):
+        assert writer.write(a, b"%d;" % i, delay=0.05)
+    assert time.monotonic() - t0 < 0.05  # queued, not slept
+    writer.close(a)
+    assert time.monotonic() - t0 >= 0.25
+    assert recv_until(b, 10) == b"0;1;2;3;4;"
+    assert writer.stats()["streams"] == 0 and writer.stats()["sent_bytes"] == 10
+    a.close(), b.close()
+
+
+def test_write_reports_a_closed_peer():
+    a, b = socket.socketpair()
+    b.close()
+    writer = PacedWriter()
+    writer.write(a, b"x")
+    deadline = time.monotonic() + 5
+    while writer.write(a, b"x") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writer.failed(a)
+    writer.close(a)
+    a.close()
+
+
+def test_tarpit_drips_and_records_the_session(monkeypatch):
+    logged, closed = [], []
+    monkeypatch.setattr(tarpit, "append_event", lambda sdir, ev: logged.append(ev))
+    pit = Tarpit(lambda addr: ("S-1", "sdir"), lambda sdir, framer: closed.append(framer.stats()),
+                 interval=0.02)
+    server, client = socket.socketpair()
+    pit.accept(server, ("198.51.100.7", 40000))
+    lines = recv_until(client, 40).split(b"\r\n")
+    assert len(lines) >= 3 and all(int(x, 16) >= 0 for x in lines[:2])
+    client.sendall(b"uname -a\n")
+    time.sleep(0.1)
+    client.close()
+    deadline = time.monotonic() + 5
+    while not closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert closed and closed[0]["bytes_in"] == 9 and closed[0]["bytes_out"] >= 40
+    assert [e["type"] for e in logged] == ["action", "input"]
+    assert pit.clients == 0 and pit.total == 1
+
+
+def test_sources_run_without_the_writer_lock():
+    import threading
+    a, b = socket.socketpair()
+    writer = PacedWriter()
+    unblocked = []
+
+    def source(st):
+        # another thread must be able to use the writer while a source runs
+        t = threading.Thread(target=writer.stats)
+        t.start()
+        t.join(2)
+        unblocked.append(not t.is_alive())
+        return (0.01, b"x") if len(unblocked) < 3 else None
+
+    done = threading.Event()
+    writer.open(a, source=source, on_close=lambda st: done.set())
+    assert done.wait(5)
+    assert unblocked == [True, True, True] and recv_until(b, 2) == b"xx"
+    writer.close(a)
+    a.close(), b.close()
+
+
+def test_a_silent_client_does_not_stall_the_others_without_msg_dontwait(monkeypatch):
+    monkeypatch.setattr(tarpit, "_DONTWAIT", 0)  # as on Windows
+    monkeypatch.setattr(tarpit, "append_event", lambda sdir, ev: None)
+    pit = Tarpit(None, None, interval=0.02)
+    pairs = [socket.socketpair() for _ in range(2)]
+    for i, (server, _) in enumerate(pairs):
+        pit.accept(server, ("198.51.100.7", 40000 + i))
+    # neither client ever sends a byte
+    for _, client in pairs:
+        assert len(recv_until(client, 30, timeout=2).split(b"\r\n")) >= 3
+    for _, client in pairs:
+        client.close()
+
+
+def test_tarpit_mode_goes_through_admission_control(monkeypatch):
+    import threading
+    from src import orchestrator
+    from src.admission import PER_IP, AdmissionControl
+    monkeypatch.setattr(tarpit, "append_event", lambda sdir, ev: None)
+    monkeypatch.setattr(orchestrator, "SHED", "banner")
+    monkeypatch.setattr(tarpit, "TARPIT_INTERVAL", 0.02)
+    orch = orchestrator.Orchestrator("127.0.0.1", 0, mode="tarpit", export=False)
+    orch.admission = AdmissionControl(per_ip=1)
+    closed = []
+    orch._open_session = lambda addr: ("S-1", "sdir")
+    orch._close_session = lambda sdir, framer: closed.append(sdir)
+    listener = orch._listen()
+    orch._listen = lambda: listener
+    threading.Thread(target=orch._serve_tarpit, daemon=True).start()
+
+    first = socket.create_connection(listener.getsockname())
+    assert recv_until(first, 4)  # dripping
+    second = socket.create_connection(listener.getsockname())
+    # over the per-IP cap: shed without a session
+    assert recv_until(second, 4096) == orchestrator.banner_for("ssh").encode()
+    assert orch.admission.stats()["rejected"][PER_IP] == 1
+    first.close(), second.close()
+    deadline = time.monotonic() + 5
+    while orch.admission.active and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert closed == ["sdir"] and orch.admission.active == 0
@@ -0,0 +1,71 @@
+# tests/test_timer_wheel.py
+import threading
+
+from src.timer_wheel import SessionDeadlines, TimerWheel
+
+
+def make_wheel(clock):
+    # 4/4/4 slots: level 0 covers 4 ticks, level 1 16, level 2 64
+    return TimerWheel(tick=1.0, slots=(4, 4, 4), clock=lambda: clock[0])
+
+
+def run(wheel, clock, upto):
+    fired = []
+    while clock[0] < upto:
+        clock[0] += 1
+        for t in wheel.advance(int(clock[0])):
+            fired.append(int(clock[0]))
+            t.callback()
+    return fired
+
+
+def test_timers_fire_on_their_tick_across_levels():
+    clock = [100.0]
+    wheel = make_wheel(clock)
+    hits = []
+    for delay in (1, 3, 5, 17, 40, 90):
+        wheel.schedule(delay, lambda d=delay: hits.append((d, clock[0] - 100)))
+    wheel.schedule(7, lambda: hits.append("cancelled")).cancel()
+    run(wheel, clock, 200)
+    assert hits == [(1, 1), (3, 3), (5, 5), (17, 17), (40, 40), (90, 90)]
+    assert wheel.stats()["pending"] == 0
+
+
+def test_every_delay_within_the_horizon_fires_on_its_tick():
+    for start in (0.0, 1.0, 3.0, 15.0, 100.0):
+        clock = [start]
+        wheel = make_wheel(clock)
+        hits = []
+        for delay in range(1, 64):
+            wheel.schedule(delay, lambda d=delay: hits.append((d, clock[0] - start)))
+        run(wheel, clock, start + 130)
+        assert hits == [(d, d) for d in range(1, 64)], start
+
+
+def test_inactivity_rearms_until_the_session_goes_quiet():
+    clock = [0.0]
+    wheel = make_wheel(clock)
+    reasons = []
+    deadlines = SessionDeadlines(reasons.append, lifetime=50, idle=10, wheel=wheel)
+    run(wheel, clock, 6)
+    deadlines.touch()
+    assert run(wheel, clock, 15) == [10] and reasons == []  # fired early, re-armed for 6 more
+    run(wheel, clock, 16)
+    assert reasons == ["INACTIVITY_CLOSING"] and deadlines.expired == "INACTIVITY_CLOSING"
+    run(wheel, clock, 60)
+    assert reasons == ["INACTIVITY_CLOSING"]  # lifetime timer was cancelled
+
+    busy = SessionDeadlines(reasons.append, lifetime=20, idle=10, wheel=wheel)
+    for _ in range(4):
+        run(wheel, clock, clock[0] + 5)
+        busy.touch()
+    assert reasons[-1] == "TIMEOUT_CLOSING"
+
+
+def test_driver_thread_reports_fire_lag():
+    wheel = TimerWheel(tick=0.01).start()
+    done = threading.Event()
+    wheel.schedule(0.05, done.set)
+    assert done.wait(5)
+    stats = wheel.stats()
+    assert stats["fired"] == 1 and 0 <= stats["lag_ms_max"] < 1000
